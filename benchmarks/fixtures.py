@@ -0,0 +1,192 @@
+import json
+import random
+import socketserver
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# count of list items rendered by every page
+ITEMS = 50
+# count of images of image pages
+IMAGES = 20
+# size in pixels of generated images
+IMAGE_SIZE = 128
+# delay in seconds of XHR responses
+XHR_DELAY = 0.3
+# items appended by every scroll of infinite scroll pages
+SCROLL_BATCH = 10
+
+PAGE_TYPES = ['static', 'list', 'xhr', 'images', 'scroll']
+
+LAYOUT = '''<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title>
+<style>li.item {{ height: 60px; }}</style></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>'''
+
+
+def png(width, height, seed=0):
+    """
+    generate a PNG of random pixels, hardly compressible like photos
+    :param width:
+    :param height:
+    :param seed:
+    :return:
+    """
+    rand = random.Random(seed)
+    rows = b''.join(b'\x00' + bytes(rand.getrandbits(8) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) + \
+        chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def items_html(count, offset=0):
+    return ''.join(f'<li class="item">item {offset + i}</li>' for i in range(count))
+
+
+def static_page(index):
+    return LAYOUT.format(title=f'static {index}', body=f'<ul id="items">{items_html(ITEMS)}</ul>')
+
+
+def list_page(index):
+    return LAYOUT.format(title=f'list {index}', body=f'''<ul id="items"></ul>
+<script>
+setTimeout(() => {{
+    const list = document.getElementById('items');
+    for (let i = 0; i < {ITEMS}; i++) {{
+        const item = document.createElement('li');
+        item.className = 'item';
+        item.textContent = 'item ' + i;
+        list.appendChild(item);
+    }}
+}}, 50);
+</script>''')
+
+
+def xhr_page(index):
+    return LAYOUT.format(title=f'xhr {index}', body=f'''<ul id="items"></ul>
+<script>
+fetch('/api/items/{index}').then(response => response.json()).then(items => {{
+    document.getElementById('items').innerHTML =
+        items.map(item => '<li class="item">' + item + '</li>').join('');
+}});
+</script>''')
+
+
+def images_page(index):
+    images = ''.join(f'<img src="/image/{index}-{i}.png" width="{IMAGE_SIZE}">' for i in range(IMAGES))
+    return LAYOUT.format(title=f'images {index}', body=f'{images}<ul id="items">{items_html(ITEMS)}</ul>')
+
+
+def scroll_page(index):
+    return LAYOUT.format(title=f'scroll {index}', body=f'''<ul id="items">{items_html(SCROLL_BATCH)}</ul>
+<script>
+let loading = false;
+window.addEventListener('scroll', () => {{
+    const list = document.getElementById('items');
+    if (loading || list.children.length >= {ITEMS} ||
+        window.innerHeight + window.scrollY < document.body.offsetHeight - 100) {{
+        return;
+    }}
+    loading = true;
+    setTimeout(() => {{
+        list.insertAdjacentHTML('beforeend', Array.from(
+            {{length: {SCROLL_BATCH}}}, (_, i) => '<li class="item">item ' + (list.children.length + i) + '</li>'
+        ).join(''));
+        loading = false;
+    }}, 100);
+}});
+</script>''')
+
+
+PAGES = {
+    'static': static_page,
+    'list': list_page,
+    'xhr': xhr_page,
+    'images': images_page,
+    'scroll': scroll_page,
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serve synthetic pages, like `/static/1`, `/xhr/1` and their resources
+    """
+
+    images = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type='text/html; charset=utf-8', status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path).path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] in PAGES:
+            self._send(PAGES[parts[0]](parts[1]).encode())
+        elif len(parts) == 3 and parts[:2] == ['api', 'items']:
+            time.sleep(XHR_DELAY)
+            self._send(json.dumps([f'item {i}' for i in range(ITEMS)]).encode(),
+                       'application/json')
+        elif len(parts) == 2 and parts[0] == 'image':
+            seed = zlib.crc32(parts[1].encode()) % 8
+            if seed not in self.images:
+                self.images[seed] = png(IMAGE_SIZE, IMAGE_SIZE, seed)
+            self._send(self.images[seed], 'image/png')
+        else:
+            self._send(b'not found', 'text/plain', 404)
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FixtureServer(object):
+    """
+    Local HTTP server of synthetic pages running in a background thread
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        """
+        :param host:
+        :param port: 0 means a free port
+        """
+        self._server = ThreadingServer((host, port), FixtureHandler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
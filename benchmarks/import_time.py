@@ -0,0 +1,69 @@
+"""
+Benchmark time of importing gerapy_pyppeteer, every import runs in a new process and
+Scrapy, which any spider imports anyway, is measured alone as baseline, for example:
+
+    python -m benchmarks.import_time --runs 20
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# modules imported by a new process, timed from the start of importing
+MODULES = ['scrapy', 'scrapy.http', 'gerapy_pyppeteer', 'gerapy_pyppeteer.downloadermiddlewares']
+
+SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+__import__({module!r})
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'pyppeteer': 'pyppeteer' in sys.modules,
+    'reactor': 'twisted.internet.reactor' in sys.modules,
+}}))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='benchmark time of importing gerapy_pyppeteer')
+    parser.add_argument('--runs', type=int, default=10, help='count of processes of every module')
+    parser.add_argument('--output', help='save results to a json file')
+    return parser.parse_args()
+
+
+def measure(module, runs):
+    """
+    import module in new processes
+    :param module: module name
+    :param runs: count of processes
+    :return: result
+    """
+    samples, result = [], {}
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT.format(module=module)])
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        samples.append(result['seconds'])
+    return {
+        'module': module,
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'pyppeteer': result['pyppeteer'],
+        'reactor': result['reactor'],
+    }
+
+
+def main():
+    args = parse_args()
+    results = [measure(module, args.runs) for module in MODULES]
+    print(f'{"module":<40} {"median":>8} {"min":>8} {"pyppeteer":>10} {"reactor":>8}')
+    for result in results:
+        print(f'{result["module"]:<40} {result["median"]:>8.3f} {result["min"]:>8.3f} '
+              f'{str(result["pyppeteer"]):>10} {str(result["reactor"]):>8}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
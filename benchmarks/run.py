@@ -0,0 +1,265 @@
+"""
+Benchmark rendering fixture pages through PyppeteerMiddleware across configurations,
+every configuration runs in its own process against a local fixture server, for example:
+
+    python -m benchmarks.run --pages 10 --pool on,off --interception off,on --engine fetch,page --concurrency 1,4,8
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.fixtures import PAGE_TYPES, FixtureServer
+
+TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+COLUMNS = [
+    ('pool', '{}'),
+    ('interception', '{}'),
+    ('engine', '{}'),
+    ('concurrency', '{}'),
+    ('pages', '{}'),
+    ('incomplete', '{}'),
+    ('pages_per_sec', '{:.2f}'),
+    ('p50', '{:.3f}'),
+    ('p95', '{:.3f}'),
+    ('peak_rss_mb', '{:.0f}'),
+    ('browser_cpu_per_page', '{:.3f}'),
+    ('python_cpu_per_page', '{:.3f}'),
+]
+
+
+def descendants(root):
+    """
+    get resident memory in bytes and CPU seconds of live descendants of process,
+    CPU of their exited children is included
+    :param root: process id
+    :return: dict of process id and (rss, cpu)
+    """
+    parents, info = {}, {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        pid = int(entry)
+        parents.setdefault(int(fields[1]), []).append(pid)
+        info[pid] = int(fields[21]) * PAGE_SIZE, sum(int(field) for field in fields[11:15]) / TICKS
+    result, stack = {}, list(parents.get(root, []))
+    while stack:
+        pid = stack.pop()
+        result[pid] = info[pid]
+        stack.extend(parents.get(pid, []))
+    return result
+
+
+class Sampler(object):
+    """
+    Sample memory and CPU of browsers launched by this process in background
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_rss = 0
+        self.cpu = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        processes = descendants(os.getpid()).values()
+        self.peak_rss = max(self.peak_rss, sum(rss for rss, _ in processes))
+        # exited browsers are counted in children usage
+        exited = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.cpu = max(self.cpu, exited.ru_utime + exited.ru_stime + sum(cpu for _, cpu in processes))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.sample()
+
+
+def run_config(config, pages, page_types, extra_settings):
+    """
+    crawl fixture pages with a configuration in this process
+    :param config: dict of pool, interception, engine and concurrency
+    :param pages: count of pages of every type
+    :param page_types: types of fixture pages
+    :param extra_settings: other settings
+    :return: result
+    """
+    from scrapy.crawler import CrawlerProcess
+    from benchmarks.spider import BenchmarkSpider
+
+    settings = {
+        'DOWNLOADER_MIDDLEWARES': {
+            'gerapy_pyppeteer.downloadermiddlewares.PyppeteerMiddleware': 543,
+        },
+        'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
+        'CONCURRENT_REQUESTS': config['concurrency'],
+        'CONCURRENT_REQUESTS_PER_DOMAIN': config['concurrency'],
+        'GERAPY_PYPPETEER_BROWSER_POOL': config['pool'],
+        'GERAPY_ENABLE_REQUEST_INTERCEPTION': config['interception'],
+        'GERAPY_PYPPETEER_INTERCEPTION_ENGINE': config['engine'],
+        'ROBOTSTXT_OBEY': False,
+        'TELNETCONSOLE_ENABLED': False,
+        'LOG_LEVEL': 'ERROR',
+    }
+    settings.update(extra_settings)
+    python_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    with FixtureServer() as server:
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(BenchmarkSpider)
+        process.crawl(crawler, base_url=server.url, pages=pages, page_types=page_types)
+        sampler = Sampler().start()
+        started = time.monotonic()
+        process.start()
+        elapsed = time.monotonic() - started
+        sampler.stop()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats.get_stats()
+    rendered = stats.get('item_scraped_count', 0)
+    return dict(
+        config,
+        pages=rendered,
+        incomplete=crawler.spider.incomplete,
+        errors=stats.get('log_count/ERROR', 0),
+        elapsed=elapsed,
+        pages_per_sec=rendered / elapsed if elapsed else 0,
+        p50=stats.get('pyppeteer/timing/total/p50', 0),
+        p95=stats.get('pyppeteer/timing/total/p95', 0),
+        peak_rss_mb=sampler.peak_rss / 1024 / 1024,
+        browser_cpu_per_page=sampler.cpu / rendered if rendered else 0,
+        python_cpu_per_page=(usage.ru_utime + usage.ru_stime - python_cpu.ru_utime - python_cpu.ru_stime)
+        / rendered if rendered else 0,
+    )
+
+
+def run_worker(config, args):
+    """
+    run a configuration in a new process, a Twisted reactor can not be restarted
+    :param config:
+    :param args:
+    :return: result
+    """
+    command = [sys.executable, '-m', 'benchmarks.run', '--worker', json.dumps(config),
+               '--pages', str(args.pages), '--page-types', ','.join(args.page_types)]
+    for setting in args.set:
+        command += ['--set', setting]
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def print_table(results):
+    rows = [[name for name, _ in COLUMNS]]
+    for result in results:
+        rows.append([template.format(result[name]) for name, template in COLUMNS])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    for row in rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def compare(results, baseline, tolerance):
+    """
+    find configurations slower than baseline beyond tolerance
+    :param results:
+    :param baseline: results of a previous run
+    :param tolerance: ratio of allowed decrease of pages per second
+    :return: regressions
+    """
+    keys = ('pool', 'interception', 'engine', 'concurrency')
+    previous = {tuple(result.get(key) for key in keys): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(tuple(result.get(key) for key in keys))
+        if base and result['pages_per_sec'] < base['pages_per_sec'] * (1 - tolerance):
+            regressions.append((result, base))
+    return regressions
+
+
+def switches(value):
+    return [item.strip().lower() in ('on', 'true', '1') for item in value.split(',')]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark GerapyPyppeteer with local fixture pages')
+    parser.add_argument('--pages', type=int, default=10, help='count of pages of every type')
+    parser.add_argument('--page-types', type=lambda value: value.split(','), default=PAGE_TYPES,
+                        help=f'types of fixture pages, default {",".join(PAGE_TYPES)}')
+    parser.add_argument('--pool', type=switches, default=[True, False], help='browser pool, like on,off')
+    parser.add_argument('--interception', type=switches, default=[False, True],
+                        help='request interception, like off,on')
+    parser.add_argument('--engine', type=lambda value: value.split(','), default=['fetch', 'page'],
+                        help='engines of request interception, like fetch,page')
+    parser.add_argument('--concurrency', type=lambda value: [int(item) for item in value.split(',')],
+                        default=[1, 4], help='concurrent requests, like 1,4,8')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='other setting, value is parsed as JSON if possible')
+    parser.add_argument('--output', help='path of JSON file to save results')
+    parser.add_argument('--baseline', help='path of JSON file of previous results to compare')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='ratio of allowed decrease of pages per second from baseline')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def parse_settings(items):
+    settings = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        try:
+            settings[name] = json.loads(value)
+        except ValueError:
+            settings[name] = value
+    return settings
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        result = run_config(json.loads(args.worker), args.pages, args.page_types, parse_settings(args.set))
+        print(json.dumps(result))
+        return
+    results = []
+    for pool, interception, engine, concurrency in itertools.product(
+            args.pool, args.interception, args.engine, args.concurrency):
+        # engine makes no difference without interception
+        if not interception and engine != args.engine[0]:
+            continue
+        config = {'pool': pool, 'interception': interception, 'engine': engine, 'concurrency': concurrency}
+        print(f'running {config}', file=sys.stderr)
+        results.append(run_worker(config, args))
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for result, base in regressions:
+            print(f'regression of pool={result["pool"]} interception={result["interception"]} '
+                  f'engine={result["engine"]} concurrency={result["concurrency"]}: {result["pages_per_sec"]:.2f} pages/sec, '
+                  f'baseline {base["pages_per_sec"]:.2f}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+
+from scrapy import Spider
+
+from benchmarks.fixtures import ITEMS, PAGE_TYPES
+from gerapy_pyppeteer import PyppeteerRequest
+
+SCROLL_SCRIPT = '''() => {
+    window.scrollTo(0, document.body.scrollHeight);
+    return document.querySelectorAll('li.item').length;
+}'''
+
+
+async def scroll_to_end(page):
+    """
+    scroll infinite scroll page until all items are loaded
+    :param page:
+    :return: count of loaded items
+    """
+    count = 0
+    for _ in range(20):
+        count = await page.evaluate(SCROLL_SCRIPT)
+        if count >= ITEMS:
+            break
+        await asyncio.sleep(0.15)
+    return count
+
+
+class BenchmarkSpider(Spider):
+    """
+    Render every type of fixture pages, count rendered items of every page
+    """
+
+    name = 'benchmark'
+
+    def __init__(self, base_url, pages=10, page_types=None, *args, **kwargs):
+        """
+        :param base_url: url of fixture server
+        :param pages: count of pages of every type
+        :param page_types: types of fixture pages, all types by default
+        """
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+        self.pages = int(pages)
+        self.page_types = page_types or PAGE_TYPES
+        self.incomplete = 0
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for index in range(self.pages):
+            for page_type in self.page_types:
+                url = f'{self.base_url}/{page_type}/{index}'
+                if page_type == 'scroll':
+                    yield PyppeteerRequest(url, callback=self.parse, actions=scroll_to_end,
+                                           cb_kwargs={'page_type': page_type}, dont_filter=True)
+                elif page_type in ('list', 'xhr'):
+                    yield PyppeteerRequest(url, callback=self.parse, wait_for='li.item',
+                                           cb_kwargs={'page_type': page_type}, dont_filter=True)
+                else:
+                    yield PyppeteerRequest(url, callback=self.parse,
+                                           cb_kwargs={'page_type': page_type}, dont_filter=True)
+
+    def parse(self, response, page_type):
+        count = len(response.css('li.item'))
+        if count < ITEMS:
+            self.incomplete += 1
+        yield {'url': response.url, 'type': page_type, 'items': count}
@@ -0,0 +1,392 @@
+import logging
+import re
+import urllib.parse
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# tokens of urls and patterns used to index rules
+TOKEN = re.compile(r'[a-z0-9%]+')
+HOST = re.compile(r'^[a-z0-9_-]+(\.[a-z0-9_-]+)+$')
+HOSTS_FILE_ADDRESSES = ('0.0.0.0', '127.0.0.1', '::1', '::')
+
+# EasyList resource types to pyppeteer resource types
+RESOURCE_TYPES = {
+    'script': ['script'],
+    'image': ['image'],
+    'stylesheet': ['stylesheet'],
+    'font': ['font'],
+    'media': ['media'],
+    'object': ['other'],
+    'xmlhttprequest': ['xhr', 'fetch'],
+    'subdocument': ['document'],
+    'websocket': ['websocket'],
+    'ping': ['other'],
+    'other': ['other', 'texttrack', 'eventsource', 'manifest'],
+}
+IGNORED_OPTIONS = ('match-case', 'important')
+
+
+def base_domain(host):
+    """
+    get base domain of host, approximated by the last two labels
+    :param host:
+    :return:
+    """
+    return '.'.join(host.rsplit('.', 2)[-2:]) if host else host
+
+
+def pattern_to_regex(pattern):
+    """
+    translate EasyList url pattern to regex
+    :param pattern: url pattern, like `||example.com^*/ads/`
+    :return:
+    """
+    regex = ''
+    if pattern.startswith('||'):
+        regex = r'^[a-z][a-z0-9.+-]*:(?://)?(?:[^/?#]*\.)?'
+        pattern = pattern[2:]
+    elif pattern.startswith('|'):
+        regex = '^'
+        pattern = pattern[1:]
+    end = ''
+    if pattern.endswith('|'):
+        end = '$'
+        pattern = pattern[:-1]
+    for char in pattern:
+        if char == '*':
+            regex += '.*'
+        elif char == '^':
+            regex += r'(?:[^\w.%-]|$)'
+        else:
+            regex += re.escape(char)
+    return regex + end
+
+
+def pattern_token(pattern):
+    """
+    get the longest token of pattern which must appear as a whole token in
+    every matched url, None if there is no such token
+    :param pattern: url pattern
+    :return:
+    """
+    start_anchored = pattern.startswith('|')
+    pattern = pattern.lstrip('|')
+    end_anchored = pattern.endswith('|')
+    pattern = pattern.rstrip('|')
+    best = None
+    for match in TOKEN.finditer(pattern):
+        start, end = match.span()
+        if start == 0 and not start_anchored or start > 0 and pattern[start - 1] == '*':
+            continue
+        if end == len(pattern) and not end_anchored or end < len(pattern) and pattern[end] == '*':
+            continue
+        if best is None or len(match.group()) > len(best):
+            best = match.group()
+    return best
+
+
+class HostTrie(object):
+    """
+    Suffix trie of host labels, a host matches if it or one of its parent
+    domains is added
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def add(self, host):
+        node = self._root
+        for label in reversed(host.split('.')):
+            node = node.setdefault(label, {})
+        if None not in node:
+            node[None] = True
+            self.size += 1
+
+    def match(self, host):
+        node = self._root
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+    def __iter__(self):
+        """
+        iterate added hosts, subdomains of an added host are skipped
+        """
+        stack = [(self._root, [])]
+        while stack:
+            node, labels = stack.pop()
+            if None in node:
+                yield '.'.join(reversed(labels))
+                continue
+            for label, child in node.items():
+                stack.append((child, labels + [label]))
+
+
+class RuleOptions(object):
+    """
+    Options of a rule, such as resource types, third-party and domains
+    """
+
+    __slots__ = ('types', 'excluded_types', 'third_party', 'domains', 'excluded_domains')
+
+    def __init__(self):
+        self.types = None
+        self.excluded_types = set()
+        self.third_party = None
+        self.domains = set()
+        self.excluded_domains = set()
+
+    @classmethod
+    def parse(cls, text):
+        """
+        parse options of rule, None if some option is not supported
+        :param text: options, like `script,third-party`
+        :return:
+        """
+        options = cls()
+        for option in text.split(','):
+            option = option.strip()
+            negated = option.startswith('~')
+            name = option.lstrip('~')
+            if name in RESOURCE_TYPES:
+                if negated:
+                    options.excluded_types.update(RESOURCE_TYPES[name])
+                else:
+                    options.types = (options.types or set()) | set(RESOURCE_TYPES[name])
+            elif name in ('third-party', '3p'):
+                options.third_party = not negated
+            elif name in ('first-party', '1p'):
+                options.third_party = negated
+            elif name.startswith('domain='):
+                for domain in name[len('domain='):].split('|'):
+                    if domain.startswith('~'):
+                        options.excluded_domains.add(domain[1:])
+                    elif domain:
+                        options.domains.add(domain)
+            elif name not in IGNORED_OPTIONS:
+                return
+        return options
+
+    @staticmethod
+    def _in_domains(host, domains):
+        while host:
+            if host in domains:
+                return True
+            host = host.partition('.')[2]
+        return False
+
+    def match(self, host, resource_type, document_host):
+        if resource_type:
+            if self.types is not None and resource_type not in self.types:
+                return False
+            if resource_type in self.excluded_types:
+                return False
+        if document_host:
+            if self.third_party is not None and \
+                    (base_domain(host) != base_domain(document_host)) != self.third_party:
+                return False
+            if self.domains and not self._in_domains(document_host, self.domains):
+                return False
+            if self.excluded_domains and self._in_domains(document_host, self.excluded_domains):
+                return False
+        return True
+
+
+class RuleSet(object):
+    """
+    Url rules indexed by token, only rules sharing a token with the url are
+    evaluated, plain host rules are matched by a host trie
+    """
+
+    def __init__(self):
+        self.hosts = HostTrie()
+        self._tokens = {}
+        self._others = []
+        self._combined = None
+        self._combined_patterns = []
+        self.size = 0
+
+    def add(self, pattern, options=None, regex=None):
+        """
+        add url rule
+        :param pattern: EasyList url pattern
+        :param options: RuleOptions, None means any request
+        :param regex: raw regex replacing pattern
+        :return:
+        """
+        self.size += 1
+        if regex is None:
+            host = pattern[2:].rstrip('^') if pattern.startswith('||') else None
+            if options is None and host and HOST.match(host):
+                self.hosts.add(host)
+                return
+            regex = pattern_to_regex(pattern)
+            token = pattern_token(pattern)
+        else:
+            token = None
+        if token is None and options is None:
+            self._combined_patterns.append(regex)
+            self._combined = None
+            return
+        rule = re.compile(regex), options
+        if token is None:
+            self._others.append(rule)
+        else:
+            self._tokens.setdefault(token, []).append(rule)
+
+    @property
+    def hosts_only(self):
+        """
+        whether all rules are plain host rules
+        :return:
+        """
+        return not self._tokens and not self._others and not self._combined_patterns
+
+    def match(self, url, host, tokens, resource_type=None, document_host=None):
+        if host and self.hosts.match(host):
+            return True
+        if self._combined_patterns:
+            if self._combined is None:
+                self._combined = re.compile('|'.join(f'(?:{p})' for p in self._combined_patterns))
+            if self._combined.search(url):
+                return True
+        for token in tokens:
+            for regex, options in self._tokens.get(token, ()):
+                if (options is None or options.match(host, resource_type, document_host)) \
+                        and regex.search(url):
+                    return True
+        for regex, options in self._others:
+            if (options is None or options.match(host, resource_type, document_host)) \
+                    and regex.search(url):
+                return True
+        return False
+
+
+class Blocker(object):
+    """
+    Block requests by EasyList style rules or hosts files
+    """
+
+    def __init__(self):
+        self._block = RuleSet()
+        self._allow = RuleSet()
+
+    def __len__(self):
+        return self._block.size
+
+    def add_rule(self, line):
+        """
+        add a rule, element hiding rules and rules with unsupported options
+        are ignored
+        :param line: EasyList rule, host or hosts file line
+        :return: whether the rule is added
+        """
+        line = line.strip()
+        if not line or line.startswith(('!', '[', '#')) or '##' in line or '#@#' in line \
+                or '#?#' in line or '#$#' in line:
+            return False
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] in HOSTS_FILE_ADDRESSES:
+            # names of hosts file are never url patterns, ones without a dot like
+            # `localhost` are not blocked
+            hosts = []
+            for name in fields[1:]:
+                if name.startswith('#'):
+                    break
+                if HOST.match(name.lower()):
+                    hosts.append(name.lower())
+            for host in hosts:
+                self._block.hosts.add(host)
+                self._block.size += 1
+            return bool(hosts)
+        line = line.lower()
+        if HOST.match(line):
+            self._block.hosts.add(line)
+            self._block.size += 1
+            return True
+        rules = self._block
+        if line.startswith('@@'):
+            rules = self._allow
+            line = line[2:]
+        if line.startswith('/') and line.endswith('/') and len(line) > 2:
+            rules.add(None, regex=line[1:-1])
+            return True
+        options = None
+        if '$' in line:
+            line, _, text = line.rpartition('$')
+            options = RuleOptions.parse(text)
+            if options is None:
+                return False
+        if not line.strip('*|^'):
+            return False
+        rules.add(line, options)
+        return True
+
+    def load(self, path):
+        """
+        load rules from EasyList file or hosts file
+        :param path: file path
+        :return: count of added rules
+        """
+        count = 0
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if self.add_rule(line):
+                    count += 1
+        logger.debug('loaded %s block rules from %s', count, path)
+        return count
+
+    @classmethod
+    def from_rules(cls, rules=None, paths=None):
+        """
+        build blocker from rules and rule files
+        :param rules: rules
+        :param paths: paths of rule files
+        :return:
+        """
+        blocker = cls()
+        for rule in rules or []:
+            blocker.add_rule(rule)
+        for path in paths or []:
+            blocker.load(path)
+        return blocker
+
+    @property
+    def hosts_only(self):
+        """
+        whether all rules are plain host rules without exceptions, then
+        requests can be blocked by browser itself
+        :return:
+        """
+        return self._block.hosts_only and not self._allow.size
+
+    def url_patterns(self):
+        """
+        wildcard url patterns of host rules for browser, like `*://*.example.com/*`
+        :return:
+        """
+        patterns = []
+        for host in self._block.hosts:
+            patterns.append(f'*://{host}/*')
+            patterns.append(f'*://*.{host}/*')
+        return patterns
+
+    def should_block(self, url, resource_type=None, document_host=None):
+        """
+        check whether url should be blocked
+        :param url: url of request
+        :param resource_type: pyppeteer resource type of request
+        :param document_host: host of the page issuing the request
+        :return:
+        """
+        url = url.lower()
+        host = urllib.parse.urlsplit(url).hostname or ''
+        tokens = set(TOKEN.findall(url))
+        if not self._block.match(url, host, tokens, resource_type, document_host):
+            return False
+        return not self._allow.match(url, host, tokens, resource_type, document_host)
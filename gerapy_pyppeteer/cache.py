@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from scrapy.utils.project import data_path
+from scrapy.utils.python import global_object_name, to_unicode
+from w3lib.url import canonicalize_url
+
+from gerapy_pyppeteer.settings import *
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# pyppeteer meta which changes the rendered result
+CACHE_META_KEYS = ['wait_until', 'wait_for', 'script', 'actions', 'screenshot', 'pretend', 'capture',
+                   'extract', 'extract_only', 'cache_key']
+
+# response meta saved with rendered result
+CACHE_RESULT_META_KEYS = ['script_result', 'actions_result', 'screenshot', 'captures', 'extracted']
+
+
+def callable_name(value):
+    """
+    get name of callable identifying its code, None for lambdas, local functions and
+    other callables whose names are shared by different code
+    :param value: callable
+    :return:
+    """
+    qualname = getattr(value, '__qualname__', None)
+    if not qualname or '<' in qualname:
+        return None
+    return global_object_name(value)
+
+
+def render_fingerprint(request, headers=None, meta_keys=None):
+    """
+    get fingerprint of rendering a request, covering url, relevant headers
+    and pyppeteer meta changing the rendered result
+    :param request: request
+    :param headers: names of relevant headers
+    :param meta_keys: keys of relevant pyppeteer meta
+    :return: None if the result can't be identified, like actions of a lambda
+            without `cache_key` meta
+    """
+    pyppeteer_meta = request.meta.get('pyppeteer') or {}
+    options = {}
+    for key in meta_keys or CACHE_META_KEYS:
+        value = pyppeteer_meta.get(key)
+        if callable(value):
+            value = callable_name(value)
+            if value is None and pyppeteer_meta.get('cache_key') is None:
+                return None
+        options[key] = value
+    data = {
+        'method': request.method,
+        'url': canonicalize_url(request.url),
+        'headers': {name.lower(): [to_unicode(value) for value in request.headers.getlist(name)]
+                    for name in headers or []},
+        'pyppeteer': options,
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+class FilesystemRenderCacheStorage(object):
+    """
+    Render cache storing every entry as a pickle file, least recently used
+    entries are evicted beyond max entries or max size
+    """
+
+    def __init__(self, settings):
+        """
+        :param settings: crawler settings
+        """
+        self.cache_dir = data_path(settings.get('GERAPY_PYPPETEER_CACHE_DIR',
+                                                GERAPY_PYPPETEER_CACHE_DIR), createdir=True)
+        self.expiration_secs = settings.getint('GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS',
+                                               GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS)
+        self.max_entries = settings.getint('GERAPY_PYPPETEER_CACHE_MAX_ENTRIES',
+                                           GERAPY_PYPPETEER_CACHE_MAX_ENTRIES)
+        self.max_size = settings.getint('GERAPY_PYPPETEER_CACHE_MAX_SIZE',
+                                        GERAPY_PYPPETEER_CACHE_MAX_SIZE) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._size = 0
+        self._spider_dir = None
+
+    def _path(self, key):
+        return os.path.join(self._spider_dir, key[:2], f'{key}.pickle')
+
+    def open_spider(self, spider):
+        """
+        load index of entries ordered by access time
+        :param spider:
+        :return:
+        """
+        self._spider_dir = os.path.join(self.cache_dir, spider.name)
+        entries = []
+        for root, _, filenames in os.walk(self._spider_dir):
+            for filename in filenames:
+                if filename.endswith('.pickle'):
+                    stat = os.stat(os.path.join(root, filename))
+                    entries.append((stat.st_atime, filename[:-len('.pickle')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+        logger.debug('opened render cache %s with %s entries', self._spider_dir, len(self._index))
+
+    def close_spider(self, spider):
+        pass
+
+    def retrieve(self, key):
+        """
+        get entry of key, None if missing or expired
+        :param key: fingerprint
+        :return:
+        """
+        with self._lock:
+            if key not in self._index:
+                return
+            path = self._path(key)
+            try:
+                if self.expiration_secs and time.time() - os.stat(path).st_mtime > self.expiration_secs:
+                    self._remove(key)
+                    return
+                with open(path, 'rb') as f:
+                    entry = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._remove(key)
+                return
+            # keep mtime as creation time, atime as access time
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+            self._index.move_to_end(key)
+            return entry
+
+    def store(self, key, entry):
+        """
+        save entry of key and evict least recently used entries
+        :param key: fingerprint
+        :param entry: dict of rendered result
+        :return:
+        """
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self._size -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._size += len(data)
+            while self._index and ((self.max_entries and len(self._index) > self.max_entries) or
+                                   (self.max_size and self._size > self.max_size)):
+                self._remove(next(iter(self._index)))
+
+    def _remove(self, key):
+        self._size -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class SqliteRenderCacheStorage(object):
+    """
+    Render cache storing entries in a SQLite database, least recently used
+    entries are evicted beyond max entries or max size
+    """
+
+    def __init__(self, settings):
+        """
+        :param settings: crawler settings
+        """
+        self.cache_dir = data_path(settings.get('GERAPY_PYPPETEER_CACHE_DIR',
+                                                GERAPY_PYPPETEER_CACHE_DIR), createdir=True)
+        self.expiration_secs = settings.getint('GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS',
+                                               GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS)
+        self.max_entries = settings.getint('GERAPY_PYPPETEER_CACHE_MAX_ENTRIES',
+                                           GERAPY_PYPPETEER_CACHE_MAX_ENTRIES)
+        self.max_size = settings.getint('GERAPY_PYPPETEER_CACHE_MAX_SIZE',
+                                        GERAPY_PYPPETEER_CACHE_MAX_SIZE) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._db = None
+
+    def open_spider(self, spider):
+        """
+        open database of spider
+        :param spider:
+        :return:
+        """
+        path = os.path.join(self.cache_dir, f'{spider.name}.sqlite')
+        # entries are read and written in executor threads
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data BLOB, '
+                         'size INTEGER, created REAL, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._db.commit()
+        logger.debug('opened render cache %s', path)
+
+    def close_spider(self, spider):
+        with self._lock:
+            self._db.close()
+
+    def retrieve(self, key):
+        """
+        get entry of key, None if missing or expired
+        :param key: fingerprint
+        :return:
+        """
+        with self._lock:
+            row = self._db.execute('SELECT data, created FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return
+            data, created = row
+            if self.expiration_secs and time.time() - created > self.expiration_secs:
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._db.commit()
+                return
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        try:
+            return pickle.loads(data)
+        except (pickle.UnpicklingError, EOFError):
+            return
+
+    def store(self, key, entry):
+        """
+        save entry of key and evict least recently used entries
+        :param key: fingerprint
+        :param entry: dict of rendered result
+        :return:
+        """
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                             (key, sqlite3.Binary(data), len(data), now, now))
+            if self.max_entries:
+                self._db.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries '
+                                 'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            if self.max_size:
+                total, = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+                rows = self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall()
+                for old_key, size in rows:
+                    if total <= self.max_size:
+                        break
+                    self._db.execute('DELETE FROM entries WHERE key = ?', (old_key,))
+                    total -= size
+            self._db.commit()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import re
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# resource types of pyppeteer, other items of capture are url patterns
+RESOURCE_TYPES = {'document', 'stylesheet', 'image', 'media', 'font', 'script', 'texttrack',
+                  'xhr', 'fetch', 'eventsource', 'websocket', 'manifest', 'other'}
+
+
+class ResponseCapture(object):
+    """
+    Collect network responses of a page matching url patterns or resource types
+    """
+
+    def __init__(self, patterns=None, resource_types=None, stop=False):
+        """
+        :param patterns: regexes searched in url of responses
+        :param resource_types: resource types of responses, like `xhr` and `fetch`
+        :param stop: stop rendering once every pattern is matched, or any response
+                is captured if there are only resource types
+        """
+        self.patterns = [re.compile(pattern) for pattern in patterns or []]
+        self.resource_types = set(resource_types or [])
+        self.stop = stop
+        self.captures = []
+        self.done = asyncio.Event()
+        self._matched = set()
+        self._tasks = []
+
+    @classmethod
+    def from_meta(cls, capture):
+        """
+        build capture from `capture` of pyppeteer meta, None if nothing to capture
+        :param capture: list of url patterns and resource types, or dict like
+                `{'patterns': [...], 'resource_types': [...], 'stop': True}`
+        :return:
+        """
+        if not capture:
+            return None
+        if isinstance(capture, dict):
+            return cls(capture.get('patterns'), capture.get('resource_types'), capture.get('stop', False))
+        if isinstance(capture, str):
+            capture = [capture]
+        return cls([item for item in capture if item not in RESOURCE_TYPES],
+                   [item for item in capture if item in RESOURCE_TYPES])
+
+    @property
+    def complete(self):
+        """
+        whether every pattern is matched, or any response is captured if
+        there are only resource types
+        :return:
+        """
+        if self.patterns:
+            return len(self._matched) == len(self.patterns)
+        return bool(self.captures)
+
+    def attach(self, lease):
+        """
+        listen to responses of leased page
+        :param lease: PageLease
+        :return:
+        """
+        lease.on('response', self._on_response)
+
+    def _on_response(self, response):
+        resource_type = response.request.resourceType if response.request else None
+        matched = {index for index, pattern in enumerate(self.patterns) if pattern.search(response.url)}
+        if not matched and resource_type not in self.resource_types:
+            return
+        self._tasks.append(asyncio.ensure_future(self._read(response, resource_type, matched)))
+
+    async def _read(self, response, resource_type, matched):
+        """
+        read body of matched response
+        :param response:
+        :param resource_type:
+        :param matched: indexes of matched patterns
+        :return:
+        """
+        try:
+            body = await response.buffer()
+        except Exception:
+            # redirects and evicted resources have no body
+            logger.debug('error reading body of %s', response.url, exc_info=True)
+            body = None
+        self.captures.append({
+            'url': response.url,
+            'status': response.status,
+            'headers': response.headers,
+            'resource_type': resource_type,
+            'method': response.request.method if response.request else None,
+            'body': body,
+        })
+        self._matched |= matched
+        if self.stop and self.complete:
+            self.done.set()
+
+    async def wait_pending(self, timeout=None):
+        """
+        wait until bodies of matched responses are read, they are gone once
+        page navigates away, reads not done in time are cancelled, like ones
+        of long polling or event streams
+        :param timeout: timeout in seconds, None means no timeout
+        :return: count of cancelled reads
+        """
+        pending = [task for task in self._tasks if not task.done()]
+        if not pending:
+            return 0
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
+    async def until_complete(self, coroutine):
+        """
+        run coroutine, cancel it once capture is complete if it stops rendering
+        :param coroutine: coroutine of rendering, like `page.goto(url)`
+        :return: result of coroutine and whether it is cancelled
+        """
+        if not self.stop:
+            return await coroutine, False
+        if self.done.is_set():
+            coroutine.close()
+            return None, True
+        task = asyncio.ensure_future(coroutine)
+        done = asyncio.ensure_future(self.done.wait())
+        try:
+            await asyncio.wait([task, done], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            done.cancel()
+        if task.done():
+            return task.result(), False
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        return None, True
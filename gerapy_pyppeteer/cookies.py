@@ -0,0 +1,177 @@
+import logging
+import time
+from http.cookiejar import Cookie
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+
+def to_cookie_param(cookie):
+    """
+    convert cookie of cookie jar to CDP cookie param, cookies of host only are set by url
+    :param cookie: http.cookiejar.Cookie
+    :return: dict
+    """
+    param = {
+        'name': cookie.name,
+        'value': cookie.value or '',
+        'path': cookie.path or '/',
+        'secure': bool(cookie.secure),
+        'httpOnly': cookie.has_nonstandard_attr('HttpOnly'),
+    }
+    if cookie.domain.startswith('.'):
+        param['domain'] = cookie.domain
+    else:
+        scheme = 'https' if cookie.secure else 'http'
+        param['url'] = f'{scheme}://{cookie.domain}{param["path"]}'
+    if cookie.expires is not None:
+        param['expires'] = cookie.expires
+    return param
+
+
+def to_jar_cookie(data):
+    """
+    convert CDP cookie to cookie of cookie jar
+    :param data: dict of CDP cookie
+    :return: http.cookiejar.Cookie
+    """
+    domain = data['domain']
+    session = data.get('session') or data.get('expires', -1) < 0
+    return Cookie(
+        version=0,
+        name=data['name'],
+        value=data['value'],
+        port=None,
+        port_specified=False,
+        domain=domain,
+        domain_specified=domain.startswith('.'),
+        domain_initial_dot=domain.startswith('.'),
+        path=data.get('path', '/'),
+        path_specified=True,
+        secure=data.get('secure', False),
+        expires=None if session else int(data['expires']),
+        discard=session,
+        comment=None,
+        comment_url=None,
+        rest={'HttpOnly': None} if data.get('httpOnly') else {},
+    )
+
+
+def request_cookie_params(request):
+    """
+    get CDP cookie params of `cookies` of request, as dict or list of dicts
+    :param request: request
+    :return: list of dicts
+    """
+    cookies = request.cookies
+    if isinstance(cookies, dict):
+        cookies = [{'name': name, 'value': value} for name, value in cookies.items()]
+    params = []
+    for cookie in cookies or []:
+        if not isinstance(cookie, dict) or 'name' not in cookie:
+            continue
+        param = {key: cookie[key] for key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly',
+                                               'expires', 'sameSite') if cookie.get(key) is not None}
+        param['name'] = str(param['name'])
+        param['value'] = str(param.get('value', ''))
+        if 'domain' not in param:
+            param['url'] = request.url
+        params.append(param)
+    return params
+
+
+class CookieSync(object):
+    """
+    Sync cookies between cookie jars of Scrapy and browser, the jar of `cookiejar`
+    meta is pushed to page before rendering and cookies of browser are pulled back
+    after rendering
+    """
+
+    def __init__(self, cookies_middleware=None, isolated=False):
+        """
+        :param cookies_middleware: CookiesMiddleware of crawler, None if cookies are disabled,
+                then only cookies of request are pushed
+        :param isolated: whether every jar is rendered in its own browser context, if not
+                cookies of different jars are mixed by the browser
+        """
+        self.cookies_middleware = cookies_middleware
+        self.isolated = isolated
+        self._jar_keys = set()
+
+    @classmethod
+    def from_crawler(cls, crawler, isolated=False):
+        """
+        find CookiesMiddleware of crawler, the downloader must be created
+        :param crawler:
+        :param isolated: whether every jar is rendered in its own browser context
+        :return:
+        """
+        from scrapy.downloadermiddlewares.cookies import CookiesMiddleware
+        middlewares = crawler.engine.downloader.middleware.middlewares
+        for middleware in middlewares:
+            if isinstance(middleware, CookiesMiddleware):
+                return cls(middleware, isolated)
+        return cls(isolated=isolated)
+
+    def _check_jar(self, request):
+        """
+        warn once if requests of different jars share cookies of the browser
+        :param request: request
+        :return:
+        """
+        if self.isolated or len(self._jar_keys) > 1:
+            return
+        self._jar_keys.add(request.meta.get('cookiejar'))
+        if len(self._jar_keys) > 1:
+            logger.warning('requests of different cookie jars share cookies of the browser, '
+                           'set GERAPY_PYPPETEER_ISOLATION = \'session\' to keep them apart')
+
+    def _get_jar(self, request):
+        """
+        get cookie jar of request, None if not merged
+        :param request:
+        :return: scrapy.http.cookies.CookieJar
+        """
+        if self.cookies_middleware is None or request.meta.get('dont_merge_cookies'):
+            return None
+        return self.cookies_middleware.jars[request.meta.get('cookiejar')]
+
+    async def push(self, page, request):
+        """
+        set cookies of jar and request to page in one call
+        :param page: page object
+        :param request: request
+        :return: count of pushed cookies
+        """
+        params = []
+        jar = self._get_jar(request)
+        if jar is not None:
+            self._check_jar(request)
+            now = time.time()
+            params = [to_cookie_param(cookie) for cookie in jar.jar
+                      if not cookie.is_expired(now)]
+        # cookies of request override ones of jar, they are set later
+        params += request_cookie_params(request)
+        if params:
+            await page._client.send('Network.setCookies', {'cookies': params})
+        return len(params)
+
+    async def pull(self, page, request):
+        """
+        save cookies of browser visible to urls of request and page to jar of request,
+        cookies of other sites rendered by the browser are left alone
+        :param page: page object
+        :param request: request
+        :return: count of pulled cookies
+        """
+        jar = self._get_jar(request)
+        if jar is None:
+            return 0
+        urls = [request.url]
+        # url after redirects
+        if page.url.startswith(('http://', 'https://')) and page.url != request.url:
+            urls.append(page.url)
+        result = await page._client.send('Network.getCookies', {'urls': urls})
+        cookies = result.get('cookies', [])
+        for data in cookies:
+            jar.set_cookie(to_jar_cookie(data))
+        return len(cookies)
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+# time in seconds allowed to serialize a partially rendered page after the deadline
+PARTIAL_TIMEOUT = 1
+
+
+class DeadlineExceeded(Exception):
+    """
+    Deadline of rendering a request is exceeded
+    """
+
+
+class Deadline(object):
+    """
+    Budget of rendering a request shared by all phases
+    """
+
+    def __init__(self, timeout=None):
+        """
+        :param timeout: budget in seconds from now, None or 0 for no deadline
+        """
+        if timeout and timeout < 0:
+            raise ValueError(f'deadline should not be negative, got {timeout!r}')
+        self.expires = time.monotonic() + timeout if timeout else None
+
+    def __bool__(self):
+        return self.expires is not None
+
+    def remaining(self):
+        """
+        get remaining budget in seconds, None if there is no deadline
+        :return:
+        """
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0)
+
+    async def run(self, coroutine):
+        """
+        run coroutine within remaining budget, it is cancelled when the deadline is exceeded
+        :param coroutine: coroutine or future of a phase
+        :return: result of coroutine
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return await coroutine
+        if remaining <= 0:
+            # never started, a coroutine is closed and a future is cancelled
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            else:
+                asyncio.ensure_future(coroutine).cancel()
+            raise DeadlineExceeded()
+        try:
+            return await asyncio.wait_for(coroutine, remaining)
+        except asyncio.TimeoutError:
+            if self.remaining() > 0:
+                # timeout of the phase itself
+                raise
+            raise DeadlineExceeded()
@@ -1,27 +1,35 @@
 import asyncio
-import sys
+import os
+import time
 import urllib.parse
+from functools import partial
 from io import BytesIO
 
-import twisted.internet
-from pyppeteer import launch
-from pyppeteer.errors import NetworkError, PageError, TimeoutError
+from scrapy import signals
 from scrapy.http import HtmlResponse
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import data_path
 from scrapy.utils.python import global_object_name
-from twisted.internet.asyncioreactor import AsyncioSelectorReactor
 from twisted.internet.defer import Deferred
 
+from gerapy_pyppeteer.blocker import Blocker
+from gerapy_pyppeteer.cache import CACHE_RESULT_META_KEYS, render_fingerprint
+from gerapy_pyppeteer.capture import ResponseCapture
+from gerapy_pyppeteer.cookies import CookieSync
+from gerapy_pyppeteer.deadline import PARTIAL_TIMEOUT, Deadline, DeadlineExceeded
+from gerapy_pyppeteer.extract import extract_fields
+from gerapy_pyppeteer.failures import classify_failure
+from gerapy_pyppeteer.hybrid import HybridDecider
+from gerapy_pyppeteer.interception import FetchInterceptor
+from gerapy_pyppeteer.limiter import RenderLimiter
+from gerapy_pyppeteer.pool import BrowserPool
 from gerapy_pyppeteer.pretend import SCRIPTS as PRETEND_SCRIPTS
+from gerapy_pyppeteer.quiescence import NetworkMonitor, wait_for_quiescence
+from gerapy_pyppeteer.reactor import install_asyncio_reactor
+from gerapy_pyppeteer.screenshot import EXTENSIONS as SCREENSHOT_EXTENSIONS, take_screenshot
 from gerapy_pyppeteer.settings import *
-
-if sys.platform == 'win32':
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-reactor = AsyncioSelectorReactor(asyncio.get_event_loop())
-
-# install AsyncioSelectorReactor
-twisted.internet.reactor = reactor
-sys.modules['twisted.internet.reactor'] = reactor
+from gerapy_pyppeteer.throttle import RenderThrottle
+from gerapy_pyppeteer.timing import RenderTimer, TimingStats
 
 
 def as_deferred(f):
@@ -79,6 +87,27 @@ class PyppeteerMiddleware(object):
                          {'request': request, 'retries': retries, 'reason': reason},
                          extra={'spider': spider})
 
+    def _reschedule(self, request, spider):
+        """
+        get request rendered again after its page or browser crashed, not counted
+        as retry unless rescheduled too many times
+        :param request:
+        :param spider:
+        :return:
+        """
+        stats = spider.crawler.stats
+        reschedules = request.meta.get('pyppeteer_reschedule_times', 0) + 1
+        if reschedules > self.max_reschedule_times:
+            stats.inc_value('pyppeteer/reschedule/max_reached')
+            return self._retry(request, FAILURE_CRASH, spider)
+        logger.debug('rescheduling %(request)s (crashed %(reschedules)d times)',
+                     {'request': request, 'reschedules': reschedules}, extra={'spider': spider})
+        stats.inc_value('pyppeteer/reschedule/count')
+        rescheduled = request.copy()
+        rescheduled.meta['pyppeteer_reschedule_times'] = reschedules
+        rescheduled.dont_filter = True
+        return rescheduled
+
     @classmethod
     def from_crawler(cls, crawler):
         """
@@ -87,6 +116,7 @@ class PyppeteerMiddleware(object):
         :return:
         """
         settings = crawler.settings
+        install_asyncio_reactor(settings)
         logging_level = settings.get(
             'GERAPY_PYPPETEER_LOGGING_LEVEL', GERAPY_PYPPETEER_LOGGING_LEVEL)
         logging.getLogger('websockets').setLevel(logging_level)
@@ -145,6 +175,12 @@ class PyppeteerMiddleware(object):
             'GERAPY_PYPPETEER_SLEEP', GERAPY_PYPPETEER_SLEEP)
         cls.enable_request_interception = settings.getbool('GERAPY_ENABLE_REQUEST_INTERCEPTION',
                                                            GERAPY_ENABLE_REQUEST_INTERCEPTION)
+        cls.interception_engine = settings.get('GERAPY_PYPPETEER_INTERCEPTION_ENGINE',
+                                               GERAPY_PYPPETEER_INTERCEPTION_ENGINE)
+        cls.forward_headers = settings.getbool('GERAPY_PYPPETEER_FORWARD_HEADERS',
+                                               GERAPY_PYPPETEER_FORWARD_HEADERS)
+        cls.ignore_headers = {header.lower() for header in settings.getlist(
+            'GERAPY_PYPPETEER_IGNORE_HEADERS', GERAPY_PYPPETEER_IGNORE_HEADERS)}
         cls.retry_enabled = settings.getbool('RETRY_ENABLED')
         cls.max_retry_times = settings.getint('RETRY_TIMES')
         cls.retry_http_codes = set(int(x)
@@ -153,21 +189,230 @@ class PyppeteerMiddleware(object):
         cls.proxy = settings.get('GERAPY_PYPPETEER_PROXY')
         cls.proxy_credential = settings.get(
             'GERAPY_PYPPETEER_PROXY_CREDENTIAL')
-        return cls()
+        cls.browser_pool_enabled = settings.getbool('GERAPY_PYPPETEER_BROWSER_POOL',
+                                                    GERAPY_PYPPETEER_BROWSER_POOL)
+        cls.page_pool_size = settings.getint('GERAPY_PYPPETEER_PAGE_POOL_SIZE',
+                                             GERAPY_PYPPETEER_PAGE_POOL_SIZE)
+        cls.page_max_uses = settings.getint('GERAPY_PYPPETEER_PAGE_MAX_USES',
+                                            GERAPY_PYPPETEER_PAGE_MAX_USES)
+        # isolation relies on browsers shared by the pool
+        cls.isolation = settings.get('GERAPY_PYPPETEER_ISOLATION', GERAPY_PYPPETEER_ISOLATION) \
+            if cls.browser_pool_enabled else None
+        if cls.isolation not in (None, ISOLATION_PROXY, ISOLATION_SESSION, ISOLATION_REQUEST):
+            raise ValueError(
+                f'invalid GERAPY_PYPPETEER_ISOLATION {cls.isolation!r}')
+        cls.max_contexts = settings.getint('GERAPY_PYPPETEER_MAX_CONTEXTS',
+                                           GERAPY_PYPPETEER_MAX_CONTEXTS)
+        cls.max_browsers = settings.getint('GERAPY_PYPPETEER_MAX_BROWSERS',
+                                           GERAPY_PYPPETEER_MAX_BROWSERS)
+        cls.browser_count = settings.get('GERAPY_PYPPETEER_BROWSER_COUNT',
+                                         GERAPY_PYPPETEER_BROWSER_COUNT)
+        if cls.browser_count == BROWSER_COUNT_AUTO:
+            cls.browser_count = os.cpu_count() or 1
+        cls.browser_count = int(cls.browser_count)
+        cls.browser_sharding = settings.get('GERAPY_PYPPETEER_BROWSER_SHARDING',
+                                            GERAPY_PYPPETEER_BROWSER_SHARDING)
+        if cls.browser_sharding not in (SHARDING_LEAST_LOADED, SHARDING_ROUND_ROBIN, SHARDING_DOMAIN):
+            raise ValueError(
+                f'invalid GERAPY_PYPPETEER_BROWSER_SHARDING {cls.browser_sharding!r}')
+        cls.browser_endpoints = settings.getlist('GERAPY_PYPPETEER_BROWSER_ENDPOINTS',
+                                                 GERAPY_PYPPETEER_BROWSER_ENDPOINTS)
+        # remote browsers are not launched with a proxy, it is set on a browser context instead,
+        # requests without proxy still use the default context
+        if cls.browser_endpoints and cls.isolation is None:
+            if cls.browser_pool_enabled:
+                logger.info('using proxy isolation for GERAPY_PYPPETEER_BROWSER_ENDPOINTS')
+                cls.isolation = ISOLATION_PROXY
+            elif cls.proxy:
+                raise ValueError('GERAPY_PYPPETEER_PROXY of GERAPY_PYPPETEER_BROWSER_ENDPOINTS '
+                                 'requires GERAPY_PYPPETEER_BROWSER_POOL')
+        cls.health_check_interval = settings.getfloat('GERAPY_PYPPETEER_HEALTH_CHECK_INTERVAL',
+                                                      GERAPY_PYPPETEER_HEALTH_CHECK_INTERVAL)
+        cls.health_check_timeout = settings.getfloat('GERAPY_PYPPETEER_HEALTH_CHECK_TIMEOUT',
+                                                     GERAPY_PYPPETEER_HEALTH_CHECK_TIMEOUT)
+        cls.deadline = settings.getfloat('GERAPY_PYPPETEER_DEADLINE', GERAPY_PYPPETEER_DEADLINE)
+        if cls.deadline < 0:
+            raise ValueError(f'invalid GERAPY_PYPPETEER_DEADLINE {cls.deadline!r}')
+        cls.deadline_partial = settings.getbool('GERAPY_PYPPETEER_DEADLINE_PARTIAL',
+                                                GERAPY_PYPPETEER_DEADLINE_PARTIAL)
+        cls.fast_retry_times = settings.getint('GERAPY_PYPPETEER_FAST_RETRY_TIMES', GERAPY_PYPPETEER_FAST_RETRY_TIMES)
+        cls.fast_retry_backoff = settings.getfloat('GERAPY_PYPPETEER_FAST_RETRY_BACKOFF',
+                                                   GERAPY_PYPPETEER_FAST_RETRY_BACKOFF)
+        cls.fast_retry_failures = set(settings.getlist('GERAPY_PYPPETEER_FAST_RETRY_FAILURES',
+                                                       GERAPY_PYPPETEER_FAST_RETRY_FAILURES))
+        cls.prelaunch = settings.getbool('GERAPY_PYPPETEER_PRELAUNCH', GERAPY_PYPPETEER_PRELAUNCH)
+        cls.prelaunch_pages = settings.getint('GERAPY_PYPPETEER_PRELAUNCH_PAGES', GERAPY_PYPPETEER_PRELAUNCH_PAGES)
+        cls.warm_up_url = settings.get('GERAPY_PYPPETEER_WARM_UP_URL', GERAPY_PYPPETEER_WARM_UP_URL)
+        cls.warm_up_timeout = settings.getfloat('GERAPY_PYPPETEER_WARM_UP_TIMEOUT', GERAPY_PYPPETEER_WARM_UP_TIMEOUT)
+        cls.max_reschedule_times = settings.getint('GERAPY_PYPPETEER_MAX_RESCHEDULE_TIMES',
+                                                   GERAPY_PYPPETEER_MAX_RESCHEDULE_TIMES)
+        cls.browser_endpoint_backoff = settings.getfloat('GERAPY_PYPPETEER_BROWSER_ENDPOINT_BACKOFF',
+                                                         GERAPY_PYPPETEER_BROWSER_ENDPOINT_BACKOFF)
+        cls.disk_cache_dir = settings.get('GERAPY_PYPPETEER_DISK_CACHE_DIR',
+                                          GERAPY_PYPPETEER_DISK_CACHE_DIR)
+        if cls.disk_cache_dir:
+            cls.disk_cache_dir = os.path.abspath(data_path(cls.disk_cache_dir, createdir=True))
+        cls.disk_cache_size = settings.getint('GERAPY_PYPPETEER_DISK_CACHE_SIZE',
+                                              GERAPY_PYPPETEER_DISK_CACHE_SIZE)
+        cls.max_pages = settings.getint('GERAPY_PYPPETEER_MAX_PAGES',
+                                        GERAPY_PYPPETEER_MAX_PAGES)
+        cls.max_pages_per_domain = settings.getint('GERAPY_PYPPETEER_MAX_PAGES_PER_DOMAIN',
+                                                   GERAPY_PYPPETEER_MAX_PAGES_PER_DOMAIN)
+        cls.autothrottle_enabled = settings.getbool('GERAPY_PYPPETEER_AUTOTHROTTLE_ENABLED',
+                                                    GERAPY_PYPPETEER_AUTOTHROTTLE_ENABLED)
+        cls.cache_enabled = settings.getbool('GERAPY_PYPPETEER_CACHE_ENABLED',
+                                             GERAPY_PYPPETEER_CACHE_ENABLED)
+        cls.cache_headers = settings.getlist('GERAPY_PYPPETEER_CACHE_HEADERS',
+                                             GERAPY_PYPPETEER_CACHE_HEADERS)
+        cls.cache_ignore_http_codes = set(int(x) for x in settings.getlist(
+            'GERAPY_PYPPETEER_CACHE_IGNORE_HTTP_CODES', GERAPY_PYPPETEER_CACHE_IGNORE_HTTP_CODES))
+        cls.block_rules = settings.getlist('GERAPY_PYPPETEER_BLOCK_RULES',
+                                           GERAPY_PYPPETEER_BLOCK_RULES)
+        cls.block_lists = settings.getlist('GERAPY_PYPPETEER_BLOCK_LISTS',
+                                           GERAPY_PYPPETEER_BLOCK_LISTS)
+        cls.capture_timeout = settings.getfloat('GERAPY_PYPPETEER_CAPTURE_TIMEOUT', GERAPY_PYPPETEER_CAPTURE_TIMEOUT)
+        cls.quiescence = settings.getbool('GERAPY_PYPPETEER_QUIESCENCE', GERAPY_PYPPETEER_QUIESCENCE)
+        cls.quiescence_quiet_time = settings.getfloat('GERAPY_PYPPETEER_QUIESCENCE_QUIET_TIME',
+                                                      GERAPY_PYPPETEER_QUIESCENCE_QUIET_TIME)
+        cls.quiescence_timeout = settings.getfloat('GERAPY_PYPPETEER_QUIESCENCE_TIMEOUT',
+                                                   GERAPY_PYPPETEER_QUIESCENCE_TIMEOUT)
+        cls.quiescence_max_inflight = settings.getint('GERAPY_PYPPETEER_QUIESCENCE_MAX_INFLIGHT',
+                                                      GERAPY_PYPPETEER_QUIESCENCE_MAX_INFLIGHT)
+        cls.timing_meta = settings.getbool('GERAPY_PYPPETEER_TIMING_META', GERAPY_PYPPETEER_TIMING_META)
+        cls.hybrid = settings.getbool('GERAPY_PYPPETEER_HYBRID', GERAPY_PYPPETEER_HYBRID)
 
-    async def _process_request(self, request, spider):
+        middleware = cls()
+        # compile block rules once, matched against every sub request
+        middleware.blocker = None
+        if middleware.block_rules or middleware.block_lists:
+            middleware.blocker = Blocker.from_rules(middleware.block_rules, middleware.block_lists)
+            logger.info('loaded %s block rules', len(middleware.blocker))
+        middleware.browser_pool = BrowserPool(
+            enabled=middleware.browser_pool_enabled,
+            page_pool_size=middleware.page_pool_size,
+            page_max_uses=middleware.page_max_uses,
+            max_contexts=middleware.max_contexts,
+            max_browsers=middleware.max_browsers,
+            browser_count=middleware.browser_count,
+            sharding=middleware.browser_sharding,
+            endpoints=middleware.browser_endpoints,
+            health_check_interval=middleware.health_check_interval,
+            health_check_timeout=middleware.health_check_timeout,
+            endpoint_backoff=middleware.browser_endpoint_backoff,
+            disk_cache_dir=middleware.disk_cache_dir,
+            disk_cache_size=middleware.disk_cache_size * 1024 * 1024,
+            stats=crawler.stats)
+        middleware.render_limiter = RenderLimiter(
+            max_pages=middleware.max_pages,
+            max_pages_per_domain=middleware.max_pages_per_domain,
+            stats=crawler.stats)
+        middleware.render_throttle = None
+        if middleware.autothrottle_enabled:
+            middleware.render_throttle = RenderThrottle(
+                middleware.render_limiter,
+                pids=middleware.browser_pool.pids,
+                min_pages=settings.getint('GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_PAGES',
+                                          GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_PAGES),
+                max_pages=settings.getint('GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_PAGES',
+                                          middleware.max_pages or GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_PAGES),
+                start_pages=settings.getint('GERAPY_PYPPETEER_AUTOTHROTTLE_START_PAGES',
+                                            GERAPY_PYPPETEER_AUTOTHROTTLE_START_PAGES),
+                interval=settings.getfloat('GERAPY_PYPPETEER_AUTOTHROTTLE_INTERVAL',
+                                           GERAPY_PYPPETEER_AUTOTHROTTLE_INTERVAL),
+                min_free_memory=settings.getfloat('GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_FREE_MEMORY',
+                                                  GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_FREE_MEMORY),
+                max_browser_rss=settings.getint('GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_BROWSER_RSS',
+                                                GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_BROWSER_RSS),
+                max_loop_lag=settings.getfloat('GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_LOOP_LAG',
+                                               GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_LOOP_LAG),
+                target_latency=settings.getfloat('GERAPY_PYPPETEER_AUTOTHROTTLE_TARGET_LATENCY',
+                                                 GERAPY_PYPPETEER_AUTOTHROTTLE_TARGET_LATENCY),
+                stats=crawler.stats)
+        middleware.render_cache = None
+        if middleware.cache_enabled:
+            middleware.render_cache = load_object(settings.get(
+                'GERAPY_PYPPETEER_CACHE_STORAGE', GERAPY_PYPPETEER_CACHE_STORAGE))(settings)
+        middleware.screenshot_storage = None
+        _screenshot_storage = settings.get('GERAPY_PYPPETEER_SCREENSHOT_STORAGE',
+                                           GERAPY_PYPPETEER_SCREENSHOT_STORAGE)
+        if _screenshot_storage:
+            middleware.screenshot_storage = load_object(_screenshot_storage)(settings)
+        middleware.sync_cookies = settings.getbool('GERAPY_PYPPETEER_SYNC_COOKIES',
+                                                   GERAPY_PYPPETEER_SYNC_COOKIES)
+        middleware.cookie_sync = CookieSync()
+        middleware.timing_stats = None
+        if settings.getbool('GERAPY_PYPPETEER_TIMING_STATS', GERAPY_PYPPETEER_TIMING_STATS):
+            middleware.timing_stats = TimingStats(crawler.stats)
+        _hybrid_table = settings.get('GERAPY_PYPPETEER_HYBRID_TABLE', GERAPY_PYPPETEER_HYBRID_TABLE)
+        middleware.hybrid_decider = HybridDecider(
+            min_body_size=settings.getint('GERAPY_PYPPETEER_HYBRID_MIN_BODY_SIZE',
+                                          GERAPY_PYPPETEER_HYBRID_MIN_BODY_SIZE),
+            spa_patterns=settings.getlist('GERAPY_PYPPETEER_HYBRID_SPA_PATTERNS',
+                                          GERAPY_PYPPETEER_HYBRID_SPA_PATTERNS),
+            min_samples=settings.getint('GERAPY_PYPPETEER_HYBRID_MIN_SAMPLES',
+                                        GERAPY_PYPPETEER_HYBRID_MIN_SAMPLES),
+            path=data_path(_hybrid_table, createdir=False) if _hybrid_table else None)
+        crawler.signals.connect(middleware.spider_opened,
+                                signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed,
+                                signal=signals.spider_closed)
+        return middleware
+
+    def _get_pretend(self, pyppeteer_meta):
         """
-        use pyppeteer to process spider
-        :param request:
-        :param spider:
+        get pretend setting, local setting overwrites global
+        :param pyppeteer_meta:
         :return:
         """
-        # get pyppeteer meta
-        pyppeteer_meta = request.meta.get('pyppeteer') or {}
-        logger.debug('pyppeteer_meta %s', pyppeteer_meta)
-        if not isinstance(pyppeteer_meta, dict) or len(pyppeteer_meta.keys()) == 0:
-            return
+        if pyppeteer_meta.get('pretend') is not None:
+            return pyppeteer_meta.get('pretend')
+        return self.pretend
 
+    def _get_quiescence(self, pyppeteer_meta):
+        """
+        get options of waiting for quiescence, local setting overwrites global,
+        None means sleeping instead
+        :param pyppeteer_meta:
+        :return:
+        """
+        _quiescence = self.quiescence
+        if pyppeteer_meta.get('quiescence') is not None:
+            _quiescence = pyppeteer_meta.get('quiescence')
+        if not _quiescence:
+            return None
+        options = {
+            'quiet_time': self.quiescence_quiet_time,
+            'timeout': self.quiescence_timeout,
+            'max_inflight': self.quiescence_max_inflight,
+        }
+        if isinstance(_quiescence, dict):
+            options.update(_quiescence)
+        return options
+
+    def _get_connect_options(self):
+        """
+        assemble options of connecting to remote browsers
+        :return:
+        """
+        options = {}
+        if self.ignore_https_errors:
+            options['ignoreHTTPSErrors'] = self.ignore_https_errors
+        if self.slow_mo:
+            options['slowMo'] = self.slow_mo
+        return options
+
+    def _get_launch_options(self, pyppeteer_meta):
+        """
+        assemble launch options of pyppeteer
+        :param pyppeteer_meta:
+        :return:
+        """
+        # remote browsers are launched by others, proxy needs isolation
+        if self.browser_endpoints:
+            _proxy = self._get_proxy(pyppeteer_meta)
+            if _proxy and not self.isolation:
+                raise ValueError(f'proxy {_proxy} of remote browsers requires GERAPY_PYPPETEER_BROWSER_POOL')
+            return self._get_connect_options()
         options = {
             'headless': self.headless,
             'dumpio': self.dumpio,
@@ -206,90 +451,370 @@ class PyppeteerMiddleware(object):
             options['args'].append('--disable-gpu')
 
         # pretend as normal browser
-        _pretend = self.pretend  # get global pretend setting
-        if pyppeteer_meta.get('pretend') is not None:
-            # get local pretend setting to overwrite global
-            _pretend = pyppeteer_meta.get('pretend')
-        if _pretend:
+        if self._get_pretend(pyppeteer_meta):
             options['ignoreDefaultArgs'] = [
                 '--enable-automation'
             ]
             options['args'].append(
                 '--disable-blink-features=AutomationControlled')
 
-        # set proxy
-        _proxy = self.proxy
-        if pyppeteer_meta.get('proxy') is not None:
-            _proxy = pyppeteer_meta.get('proxy')
-        if _proxy:
+        # set proxy, isolated contexts set proxy by themselves
+        _proxy = self._get_proxy(pyppeteer_meta)
+        if _proxy and not self.isolation:
             options['args'].append(f'--proxy-server={_proxy}')
-        logger.debug('set options %s', options)
+        return options
 
-        browser = await launch(options)
-        page = None
+    def _get_proxy(self, pyppeteer_meta):
+        """
+        get proxy setting, local setting overwrites global
+        :param pyppeteer_meta:
+        :return:
+        """
+        if pyppeteer_meta.get('proxy') is not None:
+            return pyppeteer_meta.get('proxy')
+        return self.proxy
 
+    def _get_context_key(self, request, pyppeteer_meta):
+        """
+        get key of the incognito browser context used by request according to
+        isolation mode, None means the default context of browser
+        :param request:
+        :param pyppeteer_meta:
+        :return:
+        """
+        _proxy = self._get_proxy(pyppeteer_meta)
+        if self.isolation == ISOLATION_REQUEST:
+            return ISOLATION_REQUEST, id(request)
+        if self.isolation == ISOLATION_SESSION:
+            return ISOLATION_SESSION, _proxy, request.meta.get('cookiejar')
+        if self.isolation == ISOLATION_PROXY and _proxy:
+            return ISOLATION_PROXY, _proxy
+
+    def _get_affinity(self, request, context_key):
+        """
+        get affinity of request, requests with the same affinity are rendered
+        by the same browser, None means the least loaded browser
+        :param request:
+        :param context_key:
+        :return:
+        """
+        # a session must stay in the browser holding its context
+        if self.isolation == ISOLATION_SESSION:
+            return context_key
+        if self.browser_sharding == SHARDING_DOMAIN:
+            return urllib.parse.urlsplit(request.url).hostname
+
+    async def _setup_page(self, page, pretend, timer):
+        """
+        configure a newly created page, the configuration is kept while the
+        page is recycled by the pool
+        :param page:
+        :param pretend:
+        :param timer:
+        :return:
+        """
+        with timer.phase('setup'):
+            await page.setViewport({'width': self.window_width, 'height': self.window_height})
+            if pretend:
+                logger.debug('PRETEND_SCRIPTS is run')
+                for script in PRETEND_SCRIPTS:
+                    await page.evaluateOnNewDocument(script)
+
+    async def _process_request(self, request, spider):
+        """
+        use pyppeteer to process spider
+        :param request:
+        :param spider:
+        :return:
+        """
+        # get pyppeteer meta
+        pyppeteer_meta = request.meta.get('pyppeteer') or {}
+        logger.debug('pyppeteer_meta %s', pyppeteer_meta)
+        if not isinstance(pyppeteer_meta, dict) or len(pyppeteer_meta.keys()) == 0:
+            return
+
+        timer = RenderTimer()
+        started = time.monotonic()
+        response = None
         try:
-            page = await browser.newPage()
-        except NetworkError:
+            response = await self._render_with_cache(request, spider, pyppeteer_meta, timer)
+            return response
+        finally:
+            timer.add('total', time.monotonic() - started)
+            if self.timing_stats:
+                self.timing_stats.record(timer.phases)
+            if self.timing_meta and isinstance(response, HtmlResponse):
+                response.meta['pyppeteer_timing'] = timer.phases
+
+    async def _render_with_cache(self, request, spider, pyppeteer_meta, timer):
+        """
+        get rendered result from cache, or render request in a render slot
+        :param request:
+        :param spider:
+        :param pyppeteer_meta:
+        :param timer:
+        :return:
+        """
+        # use rendered result in cache
+        fingerprint = None
+        if self.render_cache and not request.meta.get('dont_cache'):
+            fingerprint = render_fingerprint(request, self.cache_headers)
+            if fingerprint is None:
+                logger.debug('not caching %s, set cache_key to identify its actions', request.url)
+                spider.crawler.stats.inc_value('pyppeteer/cache/uncacheable')
+        if fingerprint:
+            with timer.phase('cache'):
+                entry = await asyncio.get_event_loop().run_in_executor(
+                    None, self.render_cache.retrieve, fingerprint)
+            if entry:
+                logger.debug('get rendered result of %s from cache', request.url)
+                spider.crawler.stats.inc_value('pyppeteer/cache/hit')
+                return self._response_from_cache(request, entry)
+            spider.crawler.stats.inc_value('pyppeteer/cache/miss')
+
+        # wait for a render slot, plain requests never get here
+        if self.render_throttle:
+            self.render_throttle.start()
+        domain = urllib.parse.urlsplit(request.url).hostname
+        with timer.phase('queue'):
+            await self.render_limiter.acquire(domain)
+        started = time.monotonic()
+        try:
+            response = await self._render(request, spider, pyppeteer_meta, timer)
+        finally:
+            self.render_limiter.release(domain)
+            if self.render_throttle:
+                self.render_throttle.record(time.monotonic() - started)
+
+        if fingerprint and isinstance(response, HtmlResponse) and 'partial' not in response.flags \
+                and response.status not in self.cache_ignore_http_codes:
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None, self.render_cache.store, fingerprint, self._cache_entry(response))
+                spider.crawler.stats.inc_value('pyppeteer/cache/store')
+            except Exception:
+                logger.warning('error caching rendered result of %s', request.url, exc_info=True)
+        return response
+
+    @staticmethod
+    def _cache_entry(response):
+        """
+        get cache entry of rendered response
+        :param response:
+        :return:
+        """
+        meta = {}
+        for key in CACHE_RESULT_META_KEYS:
+            value = response.meta.get(key)
+            if isinstance(value, BytesIO):
+                value = value.getvalue()
+            if value is not None:
+                meta[key] = value
+        return {
+            'url': response.url,
+            'status': response.status,
+            'headers': dict(response.headers),
+            'body': response.body,
+            'meta': meta,
+        }
+
+    @staticmethod
+    def _response_from_cache(request, entry):
+        """
+        build response from cache entry
+        :param request:
+        :param entry:
+        :return:
+        """
+        response = HtmlResponse(
+            entry['url'],
+            status=entry['status'],
+            headers=entry['headers'],
+            body=entry['body'],
+            encoding='utf-8',
+            request=request,
+            flags=['cached']
+        )
+        for key, value in entry['meta'].items():
+            if key == 'screenshot' and isinstance(value, bytes):
+                value = BytesIO(value)
+            response.meta[key] = value
+        return response
+
+    async def _render(self, request, spider, pyppeteer_meta, timer):
+        """
+        render request using pyppeteer
+        :param request:
+        :param spider:
+        :param pyppeteer_meta:
+        :param timer: RenderTimer measuring phases
+        :return:
+        """
+        # pyppeteer is imported on the first rendered request to keep importing fast
+        from pyppeteer.errors import NetworkError, PageError
+        # budget of all phases from acquiring a page on
+        _deadline = Deadline(self._get_deadline(pyppeteer_meta))
+        options = self._get_launch_options(pyppeteer_meta)
+        logger.debug('set options %s', options)
+        _pretend = self._get_pretend(pyppeteer_meta)
+
+        _context_key = self._get_context_key(request, pyppeteer_meta)
+        acquiring = asyncio.ensure_future(self.browser_pool.acquire(
+            options,
+            context_key=_context_key,
+            proxy=self._get_proxy(pyppeteer_meta),
+            dispose=self.isolation == ISOLATION_REQUEST,
+            affinity=self._get_affinity(request, _context_key),
+            setup=partial(self._setup_page, pretend=_pretend, timer=timer),
+            timer=timer))
+        try:
+            # launching browser and creating page go on after the deadline,
+            # so they are never left half done, the page is given back once leased
+            lease = await _deadline.run(asyncio.shield(acquiring))
+        except DeadlineExceeded:
+            self.browser_pool.release_acquired(acquiring)
+            logger.warning('deadline exceeded acquiring page of %s', request.url)
+            spider.crawler.stats.inc_value('pyppeteer/deadline/exceeded_count')
+            return self._retry(request, FAILURE_TIMEOUT, spider)
+        except asyncio.CancelledError:
+            self.browser_pool.release_acquired(acquiring)
+            raise
+        except NetworkError as e:
             logger.error(
                 'network error occurred while launching pyppeteer page')
-            await page.close()
-            await browser.close()
-            return self._retry(request, 504, spider)
+            failure = classify_failure(e)
+            spider.crawler.stats.inc_value(f'pyppeteer/failure/{failure}')
+            return self._retry(request, failure, spider)
+        try:
+            return await self._render_page(request, spider, pyppeteer_meta, timer, lease, _pretend, _deadline)
+        except (NetworkError, PageError):
+            if lease.alive:
+                raise
+            logger.warning('page or browser crashed while rendering %s', request.url, exc_info=True)
+            spider.crawler.stats.inc_value(f'pyppeteer/failure/{FAILURE_CRASH}')
+            return self._reschedule(request, spider)
+        finally:
+            # release page even if actions or script failed, no-op if released already
+            await self.browser_pool.release(lease, _deadline.remaining())
+
+    async def _render_page(self, request, spider, pyppeteer_meta, timer, lease, _pretend, _deadline):
+        """
+        render request with leased page, the page is released once rendered
+        :param request:
+        :param spider:
+        :param pyppeteer_meta:
+        :param timer: RenderTimer measuring phases
+        :param lease: PageLease
+        :param _pretend: pretend as normal browser
+        :param _deadline: Deadline of all phases
+        :return:
+        """
+        from pyppeteer.errors import NetworkError, PageError, TimeoutError
+        page = lease.page
+        setup_started = time.monotonic()
 
         # set proxy auth credential, see more from
         # https://pyppeteer.github.io/pyppeteer/reference.html?highlight=auth#pyppeteer.page.Page.authenticate
         _proxy_credential = self.proxy_credential
         if pyppeteer_meta.get('proxy_credential') is not None:
             _proxy_credential = pyppeteer_meta.get('proxy_credential')
-        if _proxy_credential:
-            await page.authenticate(_proxy_credential)
-
-        await page.setViewport({'width': self.window_width, 'height': self.window_height})
-
-        if _pretend:
-            _default_user_agent = self.default_user_agent
-            # get Scrapy request ua, exclude default('Scrapy/2.5.0 (+https://scrapy.org)')
-            if 'Scrapy' not in request.headers.get('User-Agent').decode():
-                _default_user_agent = request.headers.get(
-                    'User-Agent').decode()
-            await page.setUserAgent(_default_user_agent)
-            logger.debug('PRETEND_SCRIPTS is run')
-            for script in PRETEND_SCRIPTS:
-                await page.evaluateOnNewDocument(script)
-
-        # set cookies
-        parse_result = urllib.parse.urlsplit(request.url)
-        domain = parse_result.hostname
-        _cookies = []
-        if isinstance(request.cookies, dict):
-            _cookies = [{'name': k, 'value': v, 'domain': domain}
-                        for k, v in request.cookies.items()]
-        else:
-            for _cookie in _cookies:
-                if isinstance(_cookie, dict) and 'domain' not in _cookie.keys():
-                    _cookie['domain'] = domain
-        await page.setCookie(*_cookies)
 
-        # the headers must be set using request interception
-        await page.setRequestInterception(self.enable_request_interception)
+        # get Scrapy request ua, exclude default('Scrapy/2.5.0 (+https://scrapy.org)')
+        _user_agent = request.headers.get('User-Agent')
+        _user_agent = _user_agent.decode() if _user_agent else None
+        if _user_agent and 'Scrapy' in _user_agent:
+            _user_agent = None
+        if _pretend and not _user_agent:
+            _user_agent = self.default_user_agent
+
+        # interception routes every request through Python and disables cache of browser,
+        # so enable it only if resource types are ignored or urls are blocked
+        domain = urllib.parse.urlsplit(request.url).hostname
+        _ignore_resource_types = self.ignore_resource_types
+        if pyppeteer_meta.get('ignore_resource_types') is not None:
+            _ignore_resource_types = pyppeteer_meta.get('ignore_resource_types')
+        _blocker = self.blocker
+        _intercept = self.enable_request_interception or bool(_ignore_resource_types) or bool(_blocker)
+        # pyppeteer intercepts every request itself to answer proxy auth
+        _fetch = _intercept and self.interception_engine == INTERCEPTION_FETCH and not _proxy_credential
+        if _fetch:
+            _intercept = False
+
+        async def _restore_user_agent():
+            await page.setUserAgent(await lease.browser.userAgent())
+
+        async def _configure():
+            if _proxy_credential:
+                await page.authenticate(_proxy_credential)
+            if _user_agent:
+                await page.setUserAgent(_user_agent)
+                # a recycled page keeps the override, restore the user agent of browser
+                lease.defer(_restore_user_agent)
+            # forward headers to every request of page, always set to overwrite
+            # headers left by the previous request of a recycled page
+            if self.forward_headers:
+                await page.setExtraHTTPHeaders(self._get_extra_headers(request))
+            # set cookies of cookie jar and request in one call
+            await self.cookie_sync.push(page, request)
+            if _fetch:
+                await FetchInterceptor(_ignore_resource_types, _blocker, domain, spider.crawler.stats,
+                                       intercept_all=self.enable_request_interception).attach(lease)
+            await page.setRequestInterception(_intercept)
+
+        try:
+            await _deadline.run(_configure())
+        except DeadlineExceeded:
+            logger.warning('deadline exceeded setting up page of %s', request.url)
+            spider.crawler.stats.inc_value('pyppeteer/deadline/exceeded_count')
+            # configuration of page may be left half done
+            lease.retired = True
+            await self.browser_pool.release(lease)
+            return self._retry(request, FAILURE_TIMEOUT, spider)
+
+        if _intercept:
+            stats = spider.crawler.stats
 
-        if self.enable_request_interception:
-            @page.on('request')
             async def _handle_interception(pu_request):
-                # handle headers
-                overrides = {
-                    'headers': pu_request.headers
-                }
-                # handle resource types
-                _ignore_resource_types = self.ignore_resource_types
-                if request.meta.get('pyppeteer', {}).get('ignore_resource_types') is not None:
-                    _ignore_resource_types = request.meta.get(
-                        'pyppeteer', {}).get('ignore_resource_types')
+                # handle resource types and block rules
                 if pu_request.resourceType in _ignore_resource_types:
                     await pu_request.abort()
+                elif _blocker and _blocker.should_block(pu_request.url, pu_request.resourceType, domain):
+                    stats.inc_value('pyppeteer/blocked_count')
+                    await pu_request.abort()
                 else:
-                    await pu_request.continue_(overrides)
+                    await pu_request.continue_()
+
+            lease.on('request', _handle_interception)
+
+        # track network activity from navigation on
+        _quiescence = self._get_quiescence(pyppeteer_meta)
+        _network_monitor = None
+        if _quiescence:
+            _network_monitor = NetworkMonitor()
+            _network_monitor.attach(lease)
+
+        # collect network responses from navigation on, rendering may stop once all arrived
+        _capture = ResponseCapture.from_meta(pyppeteer_meta.get('capture'))
+        if _capture:
+            _capture.attach(lease)
+
+        # phases are stopped once all captures arrived or the deadline is exceeded
+        _expired = False
+
+        async def _run_phase(coroutine, limited=True):
+            nonlocal _expired
+            if _capture:
+                coroutine = _capture.until_complete(coroutine)
+            try:
+                result = await (_deadline.run(coroutine) if limited else coroutine)
+            except DeadlineExceeded:
+                logger.warning('deadline exceeded rendering %s', request.url)
+                spider.crawler.stats.inc_value('pyppeteer/deadline/exceeded_count')
+                _expired = True
+                return None, True
+            return result if _capture else (result, False)
+
+        timer.add('setup', time.monotonic() - setup_started)
 
         _timeout = self.download_timeout
         if pyppeteer_meta.get('timeout') is not None:
@@ -297,65 +822,125 @@ class PyppeteerMiddleware(object):
 
         logger.debug('crawling %s', request.url)
 
-        response = None
-        try:
+        _wait_for = pyppeteer_meta.get('wait_for')
+
+        async def _navigate():
             options = {
                 'timeout': 1000 * _timeout
             }
             if pyppeteer_meta.get('wait_until'):
                 options['waitUntil'] = pyppeteer_meta.get('wait_until')
             logger.debug('request %s with options %s', request.url, options)
-            response = await page.goto(
-                request.url,
-                options=options
-            )
-        except (PageError, TimeoutError):
-            logger.exception(
-                'error rendering url %s using pyppeteer', request.url, exc_info=True)
-            await page.close()
-            await browser.close()
-            return self._retry(request, 504, spider)
-
-        # wait for dom loaded
-        if pyppeteer_meta.get('wait_for'):
-            _wait_for = pyppeteer_meta.get('wait_for')
-            try:
+            with timer.phase('goto'):
+                response, stopped = await _run_phase(page.goto(
+                    request.url,
+                    options=options
+                ))
+            # wait for dom loaded
+            if _wait_for and not stopped:
                 logger.debug('waiting for %s', _wait_for)
-                if isinstance(_wait_for, dict):
-                    await page.waitFor(**_wait_for)
-                else:
-                    await page.waitFor(_wait_for)
-            except TimeoutError:
-                logger.exception('error waiting for %s of %s',
-                                 _wait_for, request.url, exc_info=True)
-                await page.close()
-                await browser.close()
-                return self._retry(request, 504, spider)
+                with timer.phase('wait_for'):
+                    if isinstance(_wait_for, dict):
+                        _, stopped = await _run_phase(page.waitFor(**_wait_for))
+                    else:
+                        _, stopped = await _run_phase(page.waitFor(_wait_for))
+            return response, stopped
+
+        # navigate again on the same page with backoff before retrying by the scheduler
+        _fast_retry_times = self._get_fast_retry_times(pyppeteer_meta)
+        _fast_retries = 0
+        while True:
+            try:
+                response, _stopped = await _navigate()
+                break
+            except (PageError, TimeoutError) as e:
+                failure = classify_failure(e, lease)
+                spider.crawler.stats.inc_value(f'pyppeteer/failure/{failure}')
+                if failure == FAILURE_CRASH:
+                    logger.warning('page or browser crashed while loading %s', request.url)
+                    return self._reschedule(request, spider)
+                if _fast_retries >= _fast_retry_times or failure not in self.fast_retry_failures:
+                    logger.exception('error rendering url %s using pyppeteer, failure %s',
+                                     request.url, failure, exc_info=True)
+                    await self.browser_pool.release(lease, _deadline.remaining())
+                    return self._retry(request, failure, spider)
+                backoff = self.fast_retry_backoff * 2 ** _fast_retries
+                _fast_retries += 1
+                logger.debug('retrying %s on the same page in %ss (failed %d times): %s',
+                             request.url, backoff, _fast_retries, failure)
+                spider.crawler.stats.inc_value('pyppeteer/fast_retry/count')
+                with timer.phase('fast_retry'):
+                    response, _stopped = await _run_phase(asyncio.sleep(backoff))
+                if _stopped:
+                    break
+        if _fast_retries and not _stopped:
+            spider.crawler.stats.inc_value('pyppeteer/fast_retry/success_count')
+
+        # wait for quiescence, a succeeded wait_for ends waiting early
+        if _quiescence and not _wait_for and not _stopped:
+            logger.debug('waiting for quiescence of %s', request.url)
+            with timer.phase('quiescence'):
+                quiet, _stopped = await _run_phase(
+                    wait_for_quiescence(page, _network_monitor, **_quiescence))
+            if not quiet and not _stopped:
+                logger.debug('timeout waiting for quiescence of %s', request.url)
+                spider.crawler.stats.inc_value('pyppeteer/quiescence/timeout_count')
 
         _actions_result = None
         # evaluate actions
-        if pyppeteer_meta.get('actions'):
+        if pyppeteer_meta.get('actions') and not _stopped:
             _actions = pyppeteer_meta.get('actions')
             logger.debug('evaluating %s', _actions)
-            _actions_result = await _actions(page)
+            with timer.phase('actions'):
+                _actions_result, _stopped = await _run_phase(_actions(page))
 
         _script_result = None
         # evaluate script
-        if pyppeteer_meta.get('script'):
+        if pyppeteer_meta.get('script') and not _stopped:
             _script = pyppeteer_meta.get('script')
             logger.debug('evaluating %s', _script)
-            _script_result = await page.evaluate(_script)
+            with timer.phase('script'):
+                _script_result, _stopped = await _run_phase(page.evaluate(_script))
 
-        # sleep
-        _sleep = self.sleep
+        # sleep, not needed after waiting for quiescence
+        _sleep = None if _quiescence else self.sleep
         if pyppeteer_meta.get('sleep') is not None:
             _sleep = pyppeteer_meta.get('sleep')
-        if _sleep is not None:
+        if _sleep is not None and not _stopped:
+            # sleep is cut to the deadline rather than exceeding it
+            if _deadline:
+                _sleep = min(_sleep, _deadline.remaining())
             logger.debug('sleep for %ss', _sleep)
-            await asyncio.sleep(_sleep)
+            with timer.phase('sleep'):
+                _, _stopped = await _run_phase(asyncio.sleep(_sleep), limited=False)
+
+        # extract fields in page, no HTML is serialized if only fields are needed
+        _extracted = None
+        if pyppeteer_meta.get('extract') and not _stopped:
+            _extract = pyppeteer_meta.get('extract')
+            logger.debug('extracting %s', _extract)
+            with timer.phase('extract'):
+                _extracted, _stopped = await _run_phase(extract_fields(page, _extract))
 
-        content = await page.content()
-        body = str.encode(content)
+        _partial = self._get_deadline_partial(pyppeteer_meta)
+        if _expired and not _partial:
+            await self.browser_pool.release(lease, _deadline.remaining())
+            return self._retry(request, FAILURE_TIMEOUT, spider)
+
+        # content is not needed once all captures arrived
+        body = b''
+        if _expired:
+            # return DOM rendered so far, the page may be too busy to serialize it
+            try:
+                with timer.phase('content'):
+                    content = await asyncio.wait_for(page.content(), PARTIAL_TIMEOUT)
+                body = str.encode(content)
+            except asyncio.TimeoutError:
+                logger.warning('timeout getting partial content of %s', request.url)
+        elif not _stopped and not (_extracted is not None and pyppeteer_meta.get('extract_only')):
+            with timer.phase('content'):
+                content = await page.content()
+            body = str.encode(content)
 
         # screenshot
         # TODO: maybe add support for `enabled` sub attribute
@@ -363,44 +948,167 @@ class PyppeteerMiddleware(object):
         if pyppeteer_meta.get('screenshot') is not None:
             _screenshot = pyppeteer_meta.get('screenshot')
         screenshot = None
-        if _screenshot:
-            # pop path to not save img directly in this middleware
-            if isinstance(_screenshot, dict) and 'path' in _screenshot.keys():
-                _screenshot.pop('path')
+        if _screenshot and not _stopped:
             logger.debug('taking screenshot using args %s', _screenshot)
-            screenshot = await page.screenshot(_screenshot)
-            if isinstance(screenshot, bytes):
-                screenshot = BytesIO(screenshot)
+            with timer.phase('screenshot'):
+                screenshot, _stopped = await _run_phase(take_screenshot(page, _screenshot))
+            if _expired and not _partial:
+                await self.browser_pool.release(lease, _deadline.remaining())
+                return self._retry(request, FAILURE_TIMEOUT, spider)
+
+        # bodies of responses are gone once page is released
+        if _capture:
+            _capture_timeout = self.capture_timeout
+            if _deadline:
+                _capture_timeout = min(_capture_timeout, _deadline.remaining())
+            with timer.phase('capture'):
+                cancelled = await _capture.wait_pending(_capture_timeout)
+            if cancelled:
+                logger.warning('cancelled reading %s captured responses of %s', cancelled, request.url)
+                spider.crawler.stats.inc_value('pyppeteer/capture/timeout_count', cancelled)
+            spider.crawler.stats.inc_value('pyppeteer/capture/count', len(_capture.captures))
+            if _stopped and not _expired:
+                logger.debug('stopped rendering %s once all captures arrived', request.url)
+                spider.crawler.stats.inc_value('pyppeteer/capture/stop_count')
+
+        # save cookies of browser to cookie jar, like ones of a login, bounded by the
+        # deadline, a page at its deadline has the same time as serializing it
+        _pull_timeout = _deadline.remaining()
+        if _pull_timeout is not None:
+            _pull_timeout = max(_pull_timeout, PARTIAL_TIMEOUT)
+        try:
+            await asyncio.wait_for(self.cookie_sync.pull(page, request), _pull_timeout)
+        except NetworkError:
+            logger.warning('error pulling cookies of %s', request.url, exc_info=True)
+        except asyncio.TimeoutError:
+            logger.warning('timeout pulling cookies of %s', request.url)
 
-        # close page and browser
+        # release page and browser
         logger.debug('close pyppeteer')
-        await page.close()
-        await browser.close()
+        # navigation may be cancelled before committed if rendering stopped
+        url = page.url if response or not _stopped else request.url
+        with timer.phase('close'):
+            await self.browser_pool.release(lease, _deadline.remaining())
 
-        if not response:
+        if isinstance(screenshot, bytes) and self.screenshot_storage:
+            # write in a thread after page released, only the path is kept
+            _type = _screenshot.get('type', 'png') if isinstance(_screenshot, dict) else 'png'
+            with timer.phase('screenshot_store'):
+                screenshot = await asyncio.get_event_loop().run_in_executor(
+                    None, self.screenshot_storage.store, request, screenshot,
+                    SCREENSHOT_EXTENSIONS.get(_type, _type))
+        elif isinstance(screenshot, bytes):
+            screenshot = BytesIO(screenshot)
+
+        status, headers = 200, {}
+        if response:
+            status, headers = response.status, response.headers
+        elif not _stopped:
             logger.error(
                 'get null response by pyppeteer of url %s', request.url)
 
         # Necessary to bypass the compression middleware (?)
-        response.headers.pop('content-encoding', None)
-        response.headers.pop('Content-Encoding', None)
+        headers.pop('content-encoding', None)
+        headers.pop('Content-Encoding', None)
 
         response = HtmlResponse(
-            page.url,
-            status=response.status,
-            headers=response.headers,
+            url,
+            status=status,
+            headers=headers,
             body=body,
             encoding='utf-8',
-            request=request
+            request=request,
+            flags=['partial'] if _expired else None
         )
+        if _expired:
+            spider.crawler.stats.inc_value('pyppeteer/deadline/partial_count')
         if _script_result:
             response.meta['script_result'] = _script_result
         if _actions_result:
             response.meta['actions_result'] = _actions_result
         if screenshot:
             response.meta['screenshot'] = screenshot
+        if _capture:
+            response.meta['captures'] = _capture.captures
+        if _extracted is not None:
+            response.meta['extracted'] = _extracted
         return response
 
+    def _get_deadline(self, pyppeteer_meta):
+        """
+        get deadline in seconds of rendering, local setting overwrites global
+        :param pyppeteer_meta:
+        :return:
+        """
+        if pyppeteer_meta.get('deadline') is not None:
+            return pyppeteer_meta.get('deadline')
+        return self.deadline
+
+    def _get_deadline_partial(self, pyppeteer_meta):
+        """
+        get whether partially rendered page is returned after deadline, local setting overwrites global
+        :param pyppeteer_meta:
+        :return:
+        """
+        if pyppeteer_meta.get('partial') is not None:
+            return pyppeteer_meta.get('partial')
+        return self.deadline_partial
+
+    def _get_fast_retry_times(self, pyppeteer_meta):
+        """
+        get times to navigate again on the same page, local setting overwrites global
+        :param pyppeteer_meta:
+        :return:
+        """
+        if pyppeteer_meta.get('fast_retry') is not None:
+            return pyppeteer_meta.get('fast_retry')
+        return self.fast_retry_times
+
+    def _get_extra_headers(self, request):
+        """
+        get headers of request forwarded to browser
+        :param request:
+        :return: dict of header name and value
+        """
+        return {name: value for name, value in request.headers.to_unicode_dict().items()
+                if name.lower() not in self.ignore_headers}
+
+    def _get_hybrid(self, pyppeteer_meta):
+        """
+        get hybrid setting, local setting overwrites global
+        :param pyppeteer_meta:
+        :return:
+        """
+        if pyppeteer_meta.get('hybrid') is not None:
+            return pyppeteer_meta.get('hybrid')
+        return self.hybrid
+
+    def _fetch_plainly(self, request, spider):
+        """
+        check whether request is fetched over plain HTTP by Scrapy first
+        :param request:
+        :param spider:
+        :return:
+        """
+        pyppeteer_meta = request.meta.get('pyppeteer') or {}
+        if not isinstance(pyppeteer_meta, dict) or len(pyppeteer_meta.keys()) == 0:
+            return False
+        if not self._get_hybrid(pyppeteer_meta) or request.meta.get('pyppeteer_hybrid') == HYBRID_BROWSER:
+            return False
+        # these need a page
+        if pyppeteer_meta.get('script') or pyppeteer_meta.get('actions') or \
+                pyppeteer_meta.get('capture') or pyppeteer_meta.get('extract') or \
+                pyppeteer_meta.get('screenshot') or self.screenshot:
+            return False
+        if self.hybrid_decider.needs_browser(request.url):
+            logger.debug('rendering %s by browser as learned', request.url)
+            request.meta['pyppeteer_hybrid'] = HYBRID_BROWSER
+            spider.crawler.stats.inc_value('pyppeteer/hybrid/learned_count')
+            return False
+        request.meta['pyppeteer_hybrid'] = HYBRID_HTTP
+        spider.crawler.stats.inc_value('pyppeteer/hybrid/http_count')
+        return True
+
     def process_request(self, request, spider):
         """
         process request using pyppeteer
@@ -409,14 +1117,84 @@ class PyppeteerMiddleware(object):
         :return:
         """
         logger.debug('processing request %s', request)
+        if self._fetch_plainly(request, spider):
+            logger.debug('fetching %s over plain HTTP', request.url)
+            return
         return as_deferred(self._process_request(request, spider))
 
-    async def _spider_closed(self):
-        pass
+    def process_response(self, request, response, spider):
+        """
+        render plainly fetched response by browser if it needs JavaScript
+        :param request:
+        :param response:
+        :param spider:
+        :return:
+        """
+        if request.meta.get('pyppeteer_hybrid') != HYBRID_HTTP:
+            return response
+        reason = self.hybrid_decider.escalation_reason(response, request.meta.get('pyppeteer') or {})
+        self.hybrid_decider.record(request.url, bool(reason))
+        if not reason:
+            return response
+        logger.debug('rendering %s by browser: %s', request.url, reason)
+        stats = spider.crawler.stats
+        stats.inc_value('pyppeteer/hybrid/escalate_count')
+        stats.inc_value(f'pyppeteer/hybrid/escalate_reason_count/{reason}')
+        meta = dict(request.meta, pyppeteer_hybrid=HYBRID_BROWSER)
+        return request.replace(meta=meta, dont_filter=True)
+
+    async def _warm_up(self, spider):
+        """
+        prelaunch browsers and pages of global launch options, pages are set up
+        like ones created for requests
+        :param spider:
+        :return:
+        """
+        started = time.monotonic()
+        count = await self.browser_pool.warm_up(
+            self._get_launch_options({}),
+            page_count=self.prelaunch_pages,
+            setup=partial(self._setup_page, pretend=self.pretend, timer=RenderTimer()),
+            url=self.warm_up_url,
+            timeout=self.warm_up_timeout)
+        spider.crawler.stats.set_value('pyppeteer/warm_up/pages', count)
+        logger.info('prelaunched %s browsers and %s pages in %.2fs', self.browser_pool.browser_count,
+                    count, time.monotonic() - started)
+
+    def spider_opened(self, spider):
+        """
+        callback when spider opened, the crawl starts after browsers are prelaunched
+        :param spider:
+        :return:
+        """
+        if self.render_cache:
+            self.render_cache.open_spider(spider)
+        if self.sync_cookies:
+            self.cookie_sync = CookieSync.from_crawler(
+                spider.crawler, isolated=self.isolation in (ISOLATION_SESSION, ISOLATION_REQUEST))
+        self.hybrid_decider.load()
+        if self.screenshot_storage:
+            self.screenshot_storage.open_spider(spider)
+        if self.prelaunch:
+            return as_deferred(self._warm_up(spider))
+
+    async def _spider_closed(self, spider):
+        if self.render_throttle:
+            self.render_throttle.stop()
+        if self.render_cache:
+            self.render_cache.close_spider(spider)
+        self.hybrid_decider.save()
+        if self.screenshot_storage:
+            self.screenshot_storage.close_spider(spider)
+        if self.timing_stats:
+            self.timing_stats.flush()
+        logger.debug('closing browser pool')
+        await self.browser_pool.close()
 
-    def spider_closed(self):
+    def spider_closed(self, spider):
         """
         callback when spider closed
+        :param spider:
         :return:
         """
-        return as_deferred(self._spider_closed())
+        return as_deferred(self._spider_closed(spider))
@@ -0,0 +1,123 @@
+import json
+import re
+from functools import lru_cache
+
+# selector with optional suffix like Scrapy, `h1::text`, `a::attr(href)` or `div::html`
+SELECTOR = re.compile(r'^(?P<query>.*?)(?:::(?P<suffix>text|html|attr\((?P<attr>[^)]+)\)))?$', re.S)
+
+# evaluated in page with compiled spec, every field is a dict of `css` or `xpath`,
+# `attr` in `text`, `html` or attribute name, `many` and nested `fields`
+EXTRACT_SCRIPT = '''(spec) => {
+    const select = (root, field) => {
+        if (field.xpath) {
+            const result = document.evaluate(field.xpath, root, null,
+                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < result.snapshotLength && (field.many || i < 1); i++) {
+                nodes.push(result.snapshotItem(i));
+            }
+            return nodes;
+        }
+        if (!field.css) {
+            return [root];
+        }
+        if (field.many) {
+            return Array.from(root.querySelectorAll(field.css));
+        }
+        const element = root.querySelector(field.css);
+        return element ? [element] : [];
+    };
+    const value = (node, field) => {
+        if (field.fields) {
+            return extract(node, field.fields);
+        }
+        // text and attribute nodes selected by xpath
+        if (node.nodeType !== Node.ELEMENT_NODE) {
+            return node.nodeValue === null ? node.textContent.trim() : node.nodeValue.trim();
+        }
+        if (field.attr === 'text') {
+            return node.textContent.trim();
+        }
+        if (field.attr === 'html') {
+            return node.outerHTML;
+        }
+        return node.getAttribute(field.attr);
+    };
+    const extract = (root, fields) => {
+        const result = {};
+        for (const [name, field] of Object.entries(fields)) {
+            const values = select(root, field).map((node) => value(node, field));
+            result[name] = field.many ? values : (values.length ? values[0] : null);
+        }
+        return result;
+    };
+    return extract(document, spec);
+}'''
+
+
+def compile_field(spec):
+    """
+    normalize spec of a field
+    :param spec: CSS selector like `a::attr(href)`, list of one spec for all matches,
+            or dict of `css` or `xpath`, `attr`, `many` and nested `fields`
+    :return: dict of field
+    """
+    if isinstance(spec, list):
+        if len(spec) != 1:
+            raise ValueError(f'list spec should contain exactly one field, got {spec!r}')
+        return dict(compile_field(spec[0]), many=True)
+    if isinstance(spec, str):
+        match = SELECTOR.match(spec.strip())
+        return {
+            'css': match.group('query') or None,
+            'attr': match.group('attr') or match.group('suffix') or 'text',
+            'many': False,
+        }
+    if isinstance(spec, dict):
+        field = {
+            'attr': spec.get('attr', 'text'),
+            'many': bool(spec.get('many', False)),
+        }
+        if spec.get('xpath'):
+            field['xpath'] = spec['xpath']
+        else:
+            field['css'] = spec.get('css')
+        if spec.get('fields') is not None:
+            field['fields'] = compile_fields(spec['fields'])
+        return field
+    raise ValueError(f'invalid spec of field {spec!r}')
+
+
+def compile_fields(spec):
+    """
+    normalize spec of fields
+    :param spec: dict of field name and spec of field
+    :return: dict of field name and field
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f'spec of extract should be a dict, got {spec!r}')
+    return {name: compile_field(value) for name, value in spec.items()}
+
+
+@lru_cache(maxsize=256)
+def _compile(key):
+    return compile_fields(json.loads(key))
+
+
+def compile_extract(spec):
+    """
+    compile spec of extract, the same spec is compiled only once
+    :param spec: dict of field name and spec of field
+    :return: compiled spec
+    """
+    return _compile(json.dumps(spec))
+
+
+async def extract_fields(page, spec):
+    """
+    extract fields of page in a single round trip
+    :param page: page object
+    :param spec: dict of field name and spec of field
+    :return: dict of field name and value
+    """
+    return await page.evaluate(EXTRACT_SCRIPT, compile_extract(spec))
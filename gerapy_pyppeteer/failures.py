@@ -0,0 +1,56 @@
+import asyncio
+import re
+
+from gerapy_pyppeteer.settings import FAILURE_ABORT, FAILURE_CONNECTION, FAILURE_CRASH, FAILURE_DNS, \
+    FAILURE_OTHER, FAILURE_PROXY, FAILURE_TIMEOUT
+
+# network error of Chromium in message of navigation errors, like ``net::ERR_NAME_NOT_RESOLVED at <url>``
+NET_ERROR = re.compile(r'net::(ERR_[A-Z_]+)')
+
+# prefixes of Chromium network errors to kinds of failures, checked in order
+NET_ERROR_FAILURES = (
+    ('ERR_NAME_', FAILURE_DNS),
+    ('ERR_DNS_', FAILURE_DNS),
+    ('ERR_PROXY_', FAILURE_PROXY),
+    ('ERR_TUNNEL_', FAILURE_PROXY),
+    ('ERR_SOCKS_', FAILURE_PROXY),
+    ('ERR_NO_SUPPORTED_PROXIES', FAILURE_PROXY),
+    ('ERR_TIMED_OUT', FAILURE_TIMEOUT),
+    ('ERR_CONNECTION_TIMED_OUT', FAILURE_TIMEOUT),
+    ('ERR_CONNECTION_', FAILURE_CONNECTION),
+    ('ERR_ADDRESS_', FAILURE_CONNECTION),
+    ('ERR_INTERNET_DISCONNECTED', FAILURE_CONNECTION),
+    ('ERR_NETWORK_CHANGED', FAILURE_CONNECTION),
+    ('ERR_EMPTY_RESPONSE', FAILURE_CONNECTION),
+    ('ERR_ABORTED', FAILURE_ABORT),
+    ('ERR_BLOCKED_', FAILURE_ABORT),
+)
+
+# messages of errors raised when the page or browser is gone
+CRASH_MESSAGES = ('Target closed', 'Session closed', 'Page crashed', 'browser has disconnected')
+
+
+def classify_failure(exception, lease=None):
+    """
+    classify failure of rendering by exception
+    :param exception: exception raised by navigation or waiting
+    :param lease: PageLease of the page, crashed if not alive
+    :return: one of ``FAILURE_*``
+    """
+    from pyppeteer.errors import TimeoutError
+    if lease is not None and not lease.alive:
+        return FAILURE_CRASH
+    if isinstance(exception, (TimeoutError, asyncio.TimeoutError)):
+        return FAILURE_TIMEOUT
+    message = str(exception)
+    match = NET_ERROR.search(message)
+    if match:
+        for prefix, failure in NET_ERROR_FAILURES:
+            if match.group(1).startswith(prefix):
+                return failure
+        return FAILURE_OTHER
+    if any(crash_message in message for crash_message in CRASH_MESSAGES):
+        return FAILURE_CRASH
+    if 'frame was detached' in message:
+        return FAILURE_ABORT
+    return FAILURE_OTHER
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import re
+import urllib.parse
+
+from scrapy.http import TextResponse
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+DIGITS = re.compile(r'\d+')
+
+
+def url_pattern(url, depth=2):
+    """
+    get pattern of url, made of host and leading path segments with digits
+    replaced, like `example.com/news/*`
+    :param url:
+    :param depth: count of kept path segments
+    :return:
+    """
+    parse_result = urllib.parse.urlsplit(url)
+    segments = [DIGITS.sub('*', segment) for segment in parse_result.path.split('/')[1:depth + 1]]
+    return '/'.join([parse_result.hostname or ''] + segments)
+
+
+def wait_for_selector(wait_for):
+    """
+    get selector type and selector of `wait_for`, None if it is a function or timeout
+    :param wait_for: argument of `page.waitFor`, also supports dict
+    :return:
+    """
+    if isinstance(wait_for, dict):
+        wait_for = wait_for.get('selectorOrFunctionOrTimeout')
+    if not isinstance(wait_for, str):
+        return None
+    wait_for = wait_for.strip()
+    if wait_for.startswith('//'):
+        return 'xpath', wait_for
+    if wait_for.startswith(('function', 'async')) or '=>' in wait_for:
+        return None
+    return 'css', wait_for
+
+
+class HybridDecider(object):
+    """
+    Decide whether a page fetched over plain HTTP needs to be rendered by the
+    browser, and learn the decision of every domain and url pattern
+    """
+
+    def __init__(self, min_body_size=512, spa_patterns=None, min_samples=3, path=None):
+        """
+        :param min_body_size: bodies smaller than it in bytes are rendered
+        :param spa_patterns: regexes of SPA shells which are rendered
+        :param min_samples: count of fetches before a learned decision is used
+        :param path: path of JSON file keeping learned decisions across runs
+        """
+        self.min_body_size = min_body_size
+        self.spa_patterns = [re.compile(pattern.encode(), re.I) for pattern in spa_patterns or []]
+        self.min_samples = min_samples
+        self.path = path
+        # key -> [count of plain fetches, count of escalations]
+        self._table = {}
+
+    def load(self):
+        """
+        load learned decisions
+        :return:
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._table = json.load(f)
+        except (OSError, ValueError):
+            logger.warning('error loading hybrid decisions from %s', self.path, exc_info=True)
+
+    def save(self):
+        """
+        save learned decisions
+        :return:
+        """
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(self._table, f)
+        except OSError:
+            logger.warning('error saving hybrid decisions to %s', self.path, exc_info=True)
+
+    @staticmethod
+    def _keys(url):
+        """
+        get keys of url in decision table, the most specific first
+        :param url:
+        :return:
+        """
+        return url_pattern(url), urllib.parse.urlsplit(url).hostname or ''
+
+    def needs_browser(self, url):
+        """
+        check whether pages like url were learned to always need the browser
+        :param url:
+        :return:
+        """
+        for key in self._keys(url):
+            counts = self._table.get(key)
+            if counts and sum(counts) >= self.min_samples:
+                return counts[1] >= 0.9 * sum(counts)
+        return False
+
+    def record(self, url, escalated):
+        """
+        record decision of url
+        :param url:
+        :param escalated: whether url was rendered by the browser
+        :return:
+        """
+        for key in self._keys(url):
+            counts = self._table.setdefault(key, [0, 0])
+            counts[1 if escalated else 0] += 1
+
+    def escalation_reason(self, response, pyppeteer_meta):
+        """
+        get reason of rendering a plainly fetched response by the browser,
+        None if the response can be used as it is
+        :param response:
+        :param pyppeteer_meta:
+        :return:
+        """
+        if not isinstance(response, TextResponse):
+            return 'not_text'
+        if not 200 <= response.status < 300:
+            return 'status'
+        if len(response.body) < self.min_body_size:
+            return 'body_size'
+        for pattern in self.spa_patterns:
+            if pattern.search(response.body):
+                return 'spa_shell'
+        _wait_for = pyppeteer_meta.get('wait_for')
+        if _wait_for:
+            selector = wait_for_selector(_wait_for)
+            if selector is None:
+                return 'wait_for'
+            selector_type, query = selector
+            try:
+                if not (response.xpath(query) if selector_type == 'xpath' else response.css(query)):
+                    return 'wait_for'
+            except Exception:
+                # selectors only supported by the browser
+                return 'wait_for'
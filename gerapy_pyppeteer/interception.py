@@ -0,0 +1,105 @@
+import asyncio
+import logging
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# pyppeteer resource types to CDP resource types
+RESOURCE_TYPES = {
+    'document': 'Document',
+    'stylesheet': 'Stylesheet',
+    'image': 'Image',
+    'media': 'Media',
+    'font': 'Font',
+    'script': 'Script',
+    'texttrack': 'TextTrack',
+    'xhr': 'XHR',
+    'fetch': 'Fetch',
+    'eventsource': 'EventSource',
+    'websocket': 'WebSocket',
+    'manifest': 'Manifest',
+    'other': 'Other',
+}
+
+# blocked reason of requests blocked by `Network.setBlockedURLs`
+BLOCKED_REASON = 'inspector'
+
+
+class FetchInterceptor(object):
+    """
+    Intercept requests of page by CDP Fetch domain, only requests matching patterns
+    registered in browser are paused and handled here, host rules are blocked by
+    browser itself
+    """
+
+    def __init__(self, ignore_resource_types=None, blocker=None, document_host=None, stats=None,
+                 intercept_all=False):
+        """
+        :param ignore_resource_types: pyppeteer resource types to abort
+        :param blocker: Blocker
+        :param document_host: host of the page
+        :param stats: crawler stats
+        :param intercept_all: pause every request even if no rule needs it
+        """
+        self.ignore_resource_types = set(ignore_resource_types or [])
+        self.blocker = blocker if blocker else None
+        self.document_host = document_host
+        self.stats = stats
+        self.blocked_urls = []
+        if self.blocker and self.blocker.hosts_only:
+            self.blocked_urls = self.blocker.url_patterns()
+        if intercept_all or (self.blocker and not self.blocker.hosts_only):
+            self.patterns = [{'urlPattern': '*'}]
+        else:
+            self.patterns = [{'urlPattern': '*', 'resourceType': RESOURCE_TYPES.get(resource_type, resource_type)}
+                             for resource_type in sorted(self.ignore_resource_types)]
+        self._client = None
+
+    def __bool__(self):
+        return bool(self.blocked_urls or self.patterns)
+
+    async def attach(self, lease):
+        """
+        register patterns in browser, they are removed when the lease is released
+        :param lease: PageLease
+        :return:
+        """
+        client = self._client = lease.page._client
+        if self.blocked_urls:
+            lease.on('Network.loadingFailed', self._on_loading_failed, emitter=client)
+            await client.send('Network.setBlockedURLs', {'urls': self.blocked_urls})
+            lease.defer(lambda: client.send('Network.setBlockedURLs', {'urls': []}))
+        if self.patterns:
+            lease.on('Fetch.requestPaused', self._on_request_paused, emitter=client)
+            await client.send('Fetch.enable', {'patterns': self.patterns})
+            lease.defer(lambda: client.send('Fetch.disable'))
+
+    def _on_loading_failed(self, event):
+        if event.get('blockedReason') == BLOCKED_REASON and self.stats:
+            self.stats.inc_value('pyppeteer/blocked_count')
+
+    def _on_request_paused(self, event):
+        asyncio.ensure_future(self._handle(event))
+
+    async def _handle(self, event):
+        """
+        abort or continue paused request
+        :param event: event of `Fetch.requestPaused`
+        :return:
+        """
+        request_id = event['requestId']
+        url = event['request']['url']
+        resource_type = event.get('resourceType', 'Other').lower()
+        try:
+            if resource_type in self.ignore_resource_types:
+                await self._client.send('Fetch.failRequest', {
+                    'requestId': request_id, 'errorReason': 'BlockedByClient'})
+            elif self.blocker and self.blocker.should_block(url, resource_type, self.document_host):
+                if self.stats:
+                    self.stats.inc_value('pyppeteer/blocked_count')
+                await self._client.send('Fetch.failRequest', {
+                    'requestId': request_id, 'errorReason': 'BlockedByClient'})
+            else:
+                await self._client.send('Fetch.continueRequest', {'requestId': request_id})
+        except Exception:
+            # page may be closed or navigated away meanwhile
+            logger.debug('error handling paused request %s', url, exc_info=True)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+
+class RenderLimiter(object):
+    """
+    Limit count of concurrently rendered pages, globally and per domain,
+    requests exceeding the limits wait in a FIFO queue
+    """
+
+    def __init__(self, max_pages=0, max_pages_per_domain=0, stats=None):
+        """
+        :param max_pages: max count of concurrently rendered pages, 0 means no limit
+        :param max_pages_per_domain: max count of concurrently rendered pages of
+                the same domain, 0 means no limit
+        :param stats: crawler stats to export queue depth and wait time
+        """
+        self.max_pages = max_pages
+        self.max_pages_per_domain = max_pages_per_domain
+        self.stats = stats
+        self.active = 0
+        self._domain_active = {}
+        self._waiters = deque()
+
+    @property
+    def depth(self):
+        """
+        count of requests waiting in queue
+        :return:
+        """
+        return len(self._waiters)
+
+    def _can_start(self, domain):
+        """
+        check whether a page of domain can be rendered now
+        :param domain:
+        :return:
+        """
+        if self.max_pages and self.active >= self.max_pages:
+            return False
+        if self.max_pages_per_domain and \
+                self._domain_active.get(domain, 0) >= self.max_pages_per_domain:
+            return False
+        return True
+
+    def _start(self, domain):
+        """
+        count a page of domain as rendering
+        :param domain:
+        :return:
+        """
+        self.active += 1
+        self._domain_active[domain] = self._domain_active.get(domain, 0) + 1
+
+    def _wake(self):
+        """
+        start waiting requests in order, skipping domains at their limit
+        :return:
+        """
+        for waiter in list(self._waiters):
+            if self.max_pages and self.active >= self.max_pages:
+                break
+            domain, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+            elif self._can_start(domain):
+                self._waiters.remove(waiter)
+                self._start(domain)
+                future.set_result(None)
+        self._update_depth()
+
+    def _update_depth(self):
+        """
+        export queue depth to stats
+        :return:
+        """
+        if self.stats:
+            self.stats.set_value('pyppeteer/render_queue/depth', self.depth)
+            self.stats.max_value('pyppeteer/render_queue/max_depth', self.depth)
+
+    async def acquire(self, domain):
+        """
+        wait until a page of domain can be rendered
+        :param domain:
+        :return:
+        """
+        future = asyncio.get_event_loop().create_future()
+        waiter = domain, future
+        self._waiters.append(waiter)
+        self._wake()
+        if not future.done():
+            logger.debug('waiting for render slot of %s, queue depth %s', domain, self.depth)
+            started = time.monotonic()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self._update_depth()
+                elif future.done() and not future.cancelled():
+                    # slot was granted just before cancellation
+                    self.release(domain)
+                raise
+            if self.stats:
+                self.stats.inc_value('pyppeteer/render_queue/wait_count')
+                self.stats.inc_value('pyppeteer/render_queue/wait_time',
+                                     time.monotonic() - started)
+
+    def release(self, domain):
+        """
+        finish rendering a page of domain, start waiting requests
+        :param domain:
+        :return:
+        """
+        self.active -= 1
+        count = self._domain_active.get(domain, 0) - 1
+        if count > 0:
+            self._domain_active[domain] = count
+        else:
+            self._domain_active.pop(domain, None)
+        self._wake()
+
+    def resize(self, max_pages):
+        """
+        change max count of concurrently rendered pages
+        :param max_pages:
+        :return:
+        """
+        self.max_pages = max_pages
+        self._wake()
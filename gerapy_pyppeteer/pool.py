@@ -0,0 +1,892 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict, deque
+from functools import partial
+
+from gerapy_pyppeteer.settings import SHARDING_LEAST_LOADED, SHARDING_ROUND_ROBIN
+from gerapy_pyppeteer.timing import RenderTimer
+from gerapy_pyppeteer.watchdog import kill_process_tree, reap_exited
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# clear storage of current origin before recycling a page
+CLEAR_STORAGE = '''() => {
+    try { window.localStorage.clear(); } catch (e) {}
+    try { window.sessionStorage.clear(); } catch (e) {}
+}'''
+
+
+class PageLease(object):
+    """
+    Page handed out for a single request, listeners registered through the
+    lease are detached when the page is given back to the pool
+    """
+
+    def __init__(self, page, browser, key, context_key=None, dispose=False):
+        """
+        :param page: page object
+        :param browser: browser the page belongs to
+        :param key: signature and shard index of the browser
+        :param context_key: key of the browser context the page belongs to,
+                None means the default context
+        :param dispose: close the browser context when the lease is released
+        """
+        self.page = page
+        self.browser = browser
+        self.key = key
+        self.context_key = context_key
+        self.dispose = dispose
+        self.crashed = False
+        # state of page is unknown, it is closed instead of recycled
+        self.retired = False
+        self.released = False
+        self._listeners = []
+        self._finalizers = []
+
+    @property
+    def alive(self):
+        """
+        whether the page and its browser still work
+        :return:
+        """
+        connection = getattr(self.browser, '_connection', None)
+        return not self.crashed and not self.page.isClosed() and \
+            (connection is None or connection._connected)
+
+    @property
+    def slot(self):
+        """
+        key of the browser and context the page belongs to
+        :return:
+        """
+        return self.key, self.context_key
+
+    def on(self, event, handler, emitter=None):
+        """
+        register event handler on page for this lease only
+        :param event: event name, such as `request`
+        :param handler: event handler
+        :param emitter: emitter of event, like CDP session of page, page by default
+        :return:
+        """
+        emitter = emitter or self.page
+        emitter.on(event, handler)
+        self._listeners.append((emitter, event, handler))
+        return handler
+
+    def defer(self, callback):
+        """
+        register coroutine function undoing state set for this lease only,
+        called before the page is given back
+        :param callback: coroutine function without args
+        :return:
+        """
+        self._finalizers.append(callback)
+        return callback
+
+    async def finalize(self):
+        """
+        call deferred callbacks in reverse order
+        :return: whether all callbacks succeeded, otherwise state of page is unknown
+        """
+        succeeded = True
+        while self._finalizers:
+            callback = self._finalizers.pop()
+            try:
+                await callback()
+            except Exception:
+                logger.debug('error finalizing lease of page', exc_info=True)
+                succeeded = False
+        return succeeded
+
+    def detach(self):
+        """
+        detach all listeners registered by this lease
+        :return:
+        """
+        for emitter, event, handler in self._listeners:
+            try:
+                emitter.remove_listener(event, handler)
+            except KeyError:
+                pass
+        self._listeners = []
+
+
+class BrowserPool(object):
+    """
+    Pool of long-lived browsers, browsers launched with the same options are
+    sharded across `browser_count` processes, or connected remotely through
+    `endpoints`, with incognito browser contexts for isolation and a pool of
+    pre-configured pages for each context
+    """
+
+    def __init__(self, enabled=True, page_pool_size=0, page_max_uses=0, max_contexts=0,
+                 max_browsers=0, browser_count=1, sharding=SHARDING_LEAST_LOADED, endpoints=None,
+                 health_check_interval=0, health_check_timeout=10, endpoint_backoff=30,
+                 disk_cache_dir=None, disk_cache_size=0, stats=None):
+        """
+        :param enabled: keep browsers alive between requests, if False every
+                acquired browser is closed when it is released
+        :param page_pool_size: max count of idle pages kept for each browser,
+                0 means pages are closed after use
+        :param page_max_uses: retire page after this count of navigations,
+                0 means no limit
+        :param max_contexts: max count of browser contexts kept open, least
+                recently used contexts without leased pages are closed first,
+                0 means no limit
+        :param max_browsers: max count of launched browsers kept alive, least
+                recently used browsers without in-flight pages are closed first,
+                such as ones of a proxy no longer used, never less than
+                `browser_count`, 0 means no limit
+        :param browser_count: count of browser processes for each launch options
+        :param sharding: selection of browser for requests without affinity,
+                `least_loaded` or `round_robin`
+        :param endpoints: websocket endpoints or urls of pre-launched browsers,
+                if set browsers are connected instead of launched, one shard
+                for each endpoint
+        :param health_check_interval: interval in seconds to check health of
+                browsers, 0 means no health check
+        :param health_check_timeout: timeout in seconds of a health check
+        :param endpoint_backoff: time in seconds an unhealthy endpoint is
+                skipped before reconnecting
+        :param disk_cache_dir: directory of HTTP disk cache shared by pages and
+                kept across launches, each launched browser uses its own
+                sub directory as Chromium can't share it between processes
+        :param disk_cache_size: max size of disk cache of each browser in bytes,
+                0 means the default of Chromium
+        :param stats: crawler stats to export per shard stats
+        """
+        self.enabled = enabled
+        self.page_pool_size = page_pool_size if enabled else 0
+        self.page_max_uses = page_max_uses
+        self.max_contexts = max_contexts
+        self.max_browsers = max_browsers
+        self.endpoints = list(endpoints or [])
+        self.browser_count = len(self.endpoints) if self.endpoints else max(browser_count, 1)
+        self.sharding = sharding
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.endpoint_backoff = endpoint_backoff
+        self.disk_cache_dir = disk_cache_dir
+        self.disk_cache_size = disk_cache_size
+        self.stats = stats
+        self._round_robin = itertools.count()
+        self._unhealthy = {}
+        self._health_task = None
+        self._inflight = {}
+        self._browsers = OrderedDict()
+        self._locks = {}
+        self._contexts = OrderedDict()
+        self._context_leases = {}
+        self._idle_pages = {}
+        self._page_uses = {}
+        self._options = {}
+        self._launched = {}
+        self._launchers = set()
+        self._leases = set()
+        self._closed = False
+
+    @staticmethod
+    def signature(options):
+        """
+        get the signature of launch options, browsers launched with the same
+        signature are interchangeable
+        :param options: launch options
+        :return:
+        """
+        return json.dumps(options, sort_keys=True, default=str)
+
+    def _select_shard(self, signature, affinity=None):
+        """
+        select shard index for a new lease, requests with the same affinity
+        always go to the same shard using rendezvous hashing, otherwise the
+        least loaded or next shard is selected, unhealthy shards are skipped
+        :param signature: signature of launch options
+        :param affinity: affinity of request, such as domain or session
+        :return:
+        """
+        if self.browser_count == 1:
+            return 0
+        now = time.monotonic()
+        shards = [index for index in range(self.browser_count)
+                  if self._unhealthy.get(index, 0) <= now] or list(range(self.browser_count))
+        if affinity is not None:
+            return max(shards, key=lambda index: zlib.crc32(f'{affinity}#{index}'.encode()))
+        if self.sharding == SHARDING_ROUND_ROBIN:
+            return shards[next(self._round_robin) % len(shards)]
+        return min(shards, key=lambda index: self._inflight.get((signature, index), 0))
+
+    @staticmethod
+    def _shard_name(key):
+        """
+        get name of shard, unique for launch options and shard index, like `1d0a9105-0`
+        :param key: signature and shard index of the browser
+        :return:
+        """
+        signature, index = key
+        return f'{zlib.crc32(signature.encode()):08x}-{index}'
+
+    def _shard_stats_prefix(self, key):
+        """
+        get prefix of stats of shard, browsers of different launch options have their own
+        :param key: signature and shard index of the browser
+        :return:
+        """
+        return f'pyppeteer/shard/{self._shard_name(key)}'
+
+    def _update_inflight(self, key, delta):
+        """
+        update count of in-flight pages of shard
+        :param key: signature and shard index of the browser
+        :param delta: change of in-flight pages
+        :return:
+        """
+        inflight = self._inflight.get(key, 0) + delta
+        self._inflight[key] = inflight
+        if self.stats:
+            prefix = self._shard_stats_prefix(key)
+            self.stats.set_value(f'{prefix}/inflight', inflight)
+            self.stats.max_value(f'{prefix}/max_inflight', inflight)
+
+    def pids(self):
+        """
+        get process ids of launched browsers
+        :return:
+        """
+        return [browser.process.pid for browser in self._browsers.values()
+                if getattr(browser, 'process', None)]
+
+    def _forget_slot(self, slot):
+        """
+        forget a browser context and its idle pages
+        :param slot: key of browser and context
+        :return:
+        """
+        self._contexts.pop(slot, None)
+        self._context_leases.pop(slot, None)
+        self._locks.pop(slot, None)
+        for page in self._idle_pages.pop(slot, []):
+            self._page_uses.pop(page, None)
+
+    def _discard(self, key, browser):
+        """
+        forget a disconnected browser, its contexts and idle pages, then kill
+        its processes and launch it again in background
+        :param key: signature and shard index of the browser
+        :param browser: browser object
+        :return:
+        """
+        if self._browsers.get(key) is browser:
+            logger.warning('browser of shard %s disconnected unexpectedly', key[1])
+            if self.stats:
+                self.stats.inc_value(f'{self._shard_stats_prefix(key)}/crashes')
+            self._browsers.pop(key, None)
+            slots = set(self._idle_pages.keys()) | set(self._contexts.keys())
+            for slot in slots:
+                if slot[0] == key:
+                    self._forget_slot(slot)
+            asyncio.ensure_future(self._recover(key, browser))
+
+    async def _recover(self, key, browser):
+        """
+        kill processes of a discarded browser and launch it again, so the next
+        request does not wait for launching
+        :param key: signature and shard index of the browser
+        :param browser: browser object
+        :return:
+        """
+        process = getattr(browser, 'process', None)
+        if process is not None:
+            self._launched.pop(process.pid, None)
+            killed = await asyncio.get_event_loop().run_in_executor(None, kill_process_tree, process)
+            logger.debug('killed %s processes of browser of shard %s', killed, key[1])
+            # remove temporary user data dir of pyppeteer
+            try:
+                await asyncio.wait_for(browser._closeCallback(), self.health_check_timeout)
+            except Exception:
+                logger.debug('error cleaning up browser', exc_info=True)
+        else:
+            try:
+                await self._close_browser(browser)
+            except Exception:
+                logger.debug('error closing discarded browser', exc_info=True)
+        if self._closed or key not in self._options or key in self._browsers:
+            return
+        try:
+            await self._get_browser(key, self._options[key])
+            if self.stats:
+                self.stats.inc_value(f'{self._shard_stats_prefix(key)}/relaunches')
+        except Exception:
+            logger.warning('error relaunching browser of shard %s', key[1], exc_info=True)
+
+    async def _open_browser(self, key, options):
+        """
+        launch a browser, or connect to the endpoint of shard
+        :param key: signature and shard index of launch options
+        :param options: launch options, or connect options of endpoints
+        :return:
+        """
+        if not self.endpoints:
+            if self.disk_cache_dir:
+                options = self._with_disk_cache(key, options)
+            logger.debug('launching browser of shard %s with options %s', key[1], options)
+            # pyppeteer is imported on the first launch to keep importing fast
+            from pyppeteer.launcher import Launcher
+            # the process is started before the first await of launching, the launcher
+            # is kept so the process is killed if launching fails or the pool is closed
+            launcher = Launcher(options)
+            self._launchers.add(launcher)
+            try:
+                browser = await launcher.launch()
+            except Exception:
+                process = getattr(launcher, 'proc', None)
+                if process is not None:
+                    await asyncio.get_event_loop().run_in_executor(None, kill_process_tree, process)
+                raise
+            finally:
+                self._launchers.discard(launcher)
+            process = getattr(launcher, 'proc', None)
+            if process is not None:
+                self._launched[process.pid] = process
+            return browser
+        endpoint = self.endpoints[key[1]]
+        logger.debug('connecting browser of shard %s to %s', key[1], endpoint)
+        options = dict(options)
+        if endpoint.startswith('ws'):
+            options['browserWSEndpoint'] = endpoint
+        else:
+            options['browserURL'] = endpoint
+        from pyppeteer import connect
+        try:
+            return await connect(options)
+        except Exception:
+            self._mark_unhealthy(key)
+            raise
+
+    def _with_disk_cache(self, key, options):
+        """
+        add disk cache args to launch options, the directory is stable for the
+        same launch options and shard so the cache survives relaunches
+        :param key: signature and shard index of launch options
+        :param options: launch options
+        :return:
+        """
+        cache_dir = os.path.join(self.disk_cache_dir, self._shard_name(key))
+        args = list(options.get('args', []))
+        args.append(f'--disk-cache-dir={cache_dir}')
+        if self.disk_cache_size:
+            args.append(f'--disk-cache-size={self.disk_cache_size}')
+        return dict(options, args=args)
+
+    async def _close_browser(self, browser):
+        """
+        close a launched browser, or disconnect from a remote browser
+        :param browser: browser object
+        :return:
+        """
+        if self.endpoints:
+            await browser.disconnect()
+        else:
+            process = getattr(browser, 'process', None)
+            if process is not None:
+                self._launched.pop(process.pid, None)
+            await browser.close()
+
+    def _mark_unhealthy(self, key):
+        """
+        skip endpoint of shard for a while
+        :param key: signature and shard index of the browser
+        :return:
+        """
+        if self.endpoints:
+            logger.warning('endpoint %s is unhealthy, skip it for %ss',
+                           self.endpoints[key[1]], self.endpoint_backoff)
+            self._unhealthy[key[1]] = time.monotonic() + self.endpoint_backoff
+
+    async def _get_browser(self, key, options):
+        """
+        get a browser matching the launch options, launch it if not exists
+        :param key: signature and shard index of launch options
+        :param options: launch options
+        :return:
+        """
+        if not self.enabled:
+            return await self._open_browser(key, options)
+        if self.health_check_interval and self._health_task is None:
+            self._health_task = asyncio.ensure_future(self._check_health())
+        self._options[key] = options
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        launched = False
+        async with lock:
+            browser = self._browsers.get(key)
+            if browser is None:
+                browser = await self._open_browser(key, options)
+                if self.stats:
+                    self.stats.inc_value(f'{self._shard_stats_prefix(key)}/launches')
+                browser.on('disconnected',
+                           lambda: self._discard(key, browser))
+                self._browsers[key] = browser
+                launched = True
+            else:
+                self._browsers.move_to_end(key)
+        if launched:
+            await self._evict_browsers(key)
+        return browser
+
+    async def _evict_browsers(self, launched_key):
+        """
+        close least recently used launched browsers exceeding `max_browsers`,
+        browsers with in-flight pages are kept
+        :param launched_key: key of the browser just launched, it is kept
+        :return:
+        """
+        if not self.max_browsers or self.endpoints:
+            return
+        max_browsers = max(self.max_browsers, self.browser_count)
+        for key in list(self._browsers.keys()):
+            if len(self._browsers) <= max_browsers:
+                break
+            if key == launched_key or self._inflight.get(key):
+                continue
+            browser = self._browsers.pop(key, None)
+            if browser is None:
+                continue
+            logger.debug('closing idle browser of shard %s', key[1])
+            if self.stats:
+                self.stats.inc_value(f'{self._shard_stats_prefix(key)}/evictions')
+            # not launched again by recovering
+            self._options.pop(key, None)
+            slots = set(self._idle_pages.keys()) | set(self._contexts.keys())
+            for slot in slots:
+                if slot[0] == key:
+                    self._forget_slot(slot)
+            try:
+                await self._close_browser(browser)
+            except Exception:
+                logger.debug('error closing idle browser', exc_info=True)
+
+    async def _check_health(self):
+        """
+        ping browsers and leased pages periodically, browsers not responding are
+        dropped and launched or connected again, hung pages are closed so their
+        requests fail fast, exited browser processes are reaped
+        :return:
+        """
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for key, browser in list(self._browsers.items()):
+                try:
+                    await asyncio.wait_for(browser.version(), self.health_check_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.warning('browser of shard %s failed health check', key[1])
+                    self._mark_unhealthy(key)
+                    self._discard(key, browser)
+            await asyncio.gather(*[self._check_page(lease) for lease in list(self._leases)])
+            for pid in reap_exited(self._launched):
+                self._launched.pop(pid)
+                logger.warning('browser process %s exited', pid)
+                if self.stats:
+                    self.stats.inc_value('pyppeteer/reaped_processes')
+                # exited without the disconnected event
+                for key, browser in list(self._browsers.items()):
+                    if getattr(getattr(browser, 'process', None), 'pid', None) == pid:
+                        self._discard(key, browser)
+
+    async def _check_page(self, lease):
+        """
+        ping a leased page, close it if it does not respond
+        :param lease: PageLease
+        :return:
+        """
+        if not lease.alive:
+            return
+        try:
+            await asyncio.wait_for(lease.page._client.send('Runtime.evaluate', {'expression': '1'}),
+                                   self.health_check_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning('page of shard %s is hung, close it', lease.key[1])
+            if self.stats:
+                self.stats.inc_value(f'{self._shard_stats_prefix(lease.key)}/hung_pages')
+            await self._abandon(lease)
+        except Exception:
+            logger.debug('error checking page', exc_info=True)
+
+    def _on_page_error(self, lease, error):
+        """
+        handle crash of a leased page
+        :param lease: PageLease
+        :param error: error emitted by page
+        :return:
+        """
+        logger.warning('page of shard %s crashed: %s', lease.key[1], error)
+        lease.crashed = True
+        if self.stats:
+            self.stats.inc_value(f'{self._shard_stats_prefix(lease.key)}/page_crashes')
+        asyncio.ensure_future(self._abandon(lease))
+
+    async def _abandon(self, lease):
+        """
+        close page of lease, pending operations of the request fail fast
+        :param lease: PageLease
+        :return:
+        """
+        lease.crashed = True
+        try:
+            await asyncio.wait_for(lease.page.close(), self.health_check_timeout)
+        except Exception:
+            logger.debug('error closing abandoned page', exc_info=True)
+
+    @staticmethod
+    async def _create_context(browser, proxy=None):
+        """
+        create an incognito browser context, optionally with its own proxy
+        :param browser: browser object
+        :param proxy: proxy server of the context, like `http://x.x.x.x:x`
+        :return:
+        """
+        if not proxy:
+            return await browser.createIncognitoBrowserContext()
+        # pyppeteer does not expose the proxy option of browser contexts
+        result = await browser._connection.send('Target.createBrowserContext', {
+            'proxyServer': proxy
+        })
+        context_id = result['browserContextId']
+        from pyppeteer.browser import BrowserContext
+        context = BrowserContext(browser, context_id)
+        browser._contexts[context_id] = context
+        return context
+
+    async def _close_context(self, slot, context):
+        """
+        close a browser context and forget it
+        :param slot: key of browser and context
+        :param context: browser context object
+        :return:
+        """
+        self._forget_slot(slot)
+        try:
+            await context.close()
+        except Exception:
+            logger.debug('error closing browser context', exc_info=True)
+
+    async def _evict_contexts(self):
+        """
+        close least recently used contexts exceeding `max_contexts`
+        :return:
+        """
+        if not self.max_contexts:
+            return
+        for slot in list(self._contexts.keys()):
+            if len(self._contexts) <= self.max_contexts:
+                break
+            if self._context_leases.get(slot):
+                continue
+            logger.debug('closing idle browser context %s', slot)
+            await self._close_context(slot, self._contexts[slot])
+
+    async def _get_context(self, browser, slot, proxy=None):
+        """
+        get the browser context of slot, create it if not exists
+        :param browser: browser object
+        :param slot: key of browser and context
+        :param proxy: proxy server of the context
+        :return:
+        """
+        lock = self._locks.setdefault(slot, asyncio.Lock())
+        async with lock:
+            context = self._contexts.get(slot)
+            if context is None:
+                logger.debug('creating browser context %s', slot)
+                context = await self._create_context(browser, proxy)
+                self._contexts[slot] = context
+            else:
+                self._contexts.move_to_end(slot)
+        return context
+
+    async def _get_page(self, browser, slot, proxy=None):
+        """
+        get an idle page of slot, create a new one if there is none
+        :param browser: browser object
+        :param slot: key of browser and context
+        :param proxy: proxy server used when creating the browser context
+        :return: page object and whether it is newly created
+        """
+        idle_pages = self._idle_pages.get(slot)
+        while idle_pages:
+            page = idle_pages.popleft()
+            if not page.isClosed():
+                logger.debug('reuse idle page of %s', slot)
+                if slot in self._contexts:
+                    self._contexts.move_to_end(slot)
+                return page, False
+            self._page_uses.pop(page, None)
+        if slot[1] is None:
+            page = await browser.newPage()
+        else:
+            context = await self._get_context(browser, slot, proxy)
+            await self._evict_contexts()
+            page = await context.newPage()
+        self._page_uses[page] = 0
+        return page, True
+
+    async def acquire(self, options, context_key=None, proxy=None, dispose=False, affinity=None,
+                      setup=None, timer=None):
+        """
+        lease a page of a browser matching the launch options
+        :param options: launch options
+        :param context_key: key of the incognito browser context to use, None
+                means the default context of the browser
+        :param proxy: proxy server used when creating the browser context
+        :param dispose: close the browser context when the lease is released
+        :param affinity: requests with the same affinity are rendered by the
+                same browser, None means the least loaded browser
+        :param setup: coroutine function called with every newly created page
+        :param timer: RenderTimer measuring getting browser and page
+        :return: PageLease
+        """
+        signature = self.signature(options)
+        timer = timer or RenderTimer()
+        # fail over to other endpoints if connecting fails
+        attempts = self.browser_count if self.endpoints else 1
+        for attempt in range(attempts):
+            key = signature, self._select_shard(signature, affinity)
+            self._update_inflight(key, 1)
+            try:
+                with timer.phase('browser'):
+                    browser = await self._get_browser(key, options)
+                break
+            except Exception:
+                self._update_inflight(key, -1)
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning('error connecting browser of shard %s, try another one',
+                               key[1], exc_info=True)
+        slot = key, context_key
+        self._context_leases[slot] = self._context_leases.get(slot, 0) + 1
+        try:
+            with timer.phase('new_page'):
+                page, created = await self._get_page(browser, slot, proxy)
+        except Exception:
+            self._update_inflight(key, -1)
+            if slot in self._context_leases:
+                self._context_leases[slot] -= 1
+            # a browser of disabled pool belongs to this request only
+            if not self.enabled:
+                try:
+                    await self._close_browser(browser)
+                except Exception:
+                    logger.debug('error closing browser', exc_info=True)
+            raise
+        lease = PageLease(page, browser, key, context_key, dispose)
+        lease.on('error', partial(self._on_page_error, lease))
+        self._leases.add(lease)
+        if created and setup:
+            try:
+                await setup(page)
+            except Exception:
+                # setup only runs for new pages, a page missing it is never recycled
+                lease.retired = True
+                await self.release(lease)
+                raise
+        return lease
+
+    async def _warm_page(self, browser, setup=None, url=None, timeout=30):
+        """
+        create a page in the default context of browser, load warm-up url to
+        prime caches of browser, then reset it
+        :param browser: browser object
+        :param setup: coroutine function called with the page
+        :param url: warm-up url, None means no loading
+        :param timeout: timeout in seconds of loading warm-up url
+        :return: page object
+        """
+        page = await browser.newPage()
+        try:
+            if setup:
+                await setup(page)
+            if url:
+                try:
+                    await page.goto(url, options={'timeout': 1000 * timeout})
+                except Exception:
+                    logger.warning('error loading warm-up url %s', url, exc_info=True)
+                await self._reset(page)
+        except Exception:
+            await page.close()
+            raise
+        return page
+
+    async def warm_up(self, options, page_count=0, setup=None, url=None, timeout=30):
+        """
+        launch or connect all browsers of launch options and fill idle pages of
+        their default contexts before requests come
+        :param options: launch options
+        :param page_count: count of pages created for each browser, limited by
+                `page_pool_size`
+        :param setup: coroutine function called with every created page
+        :param url: warm-up url loaded by every created page
+        :param timeout: timeout in seconds of loading warm-up url
+        :return: count of idle pages created
+        """
+        if not self.enabled:
+            return 0
+        signature = self.signature(options)
+        keys = [(signature, index) for index in range(self.browser_count)]
+        browsers = await asyncio.gather(*[self._get_browser(key, options) for key in keys],
+                                        return_exceptions=True)
+        page_count = min(page_count, self.page_pool_size)
+        count = 0
+        for key, browser in zip(keys, browsers):
+            if isinstance(browser, Exception):
+                logger.warning('error launching browser of shard %s', key[1], exc_info=browser)
+                continue
+            # warm-up url is loaded even if no page is kept
+            pages = await asyncio.gather(*[self._warm_page(browser, setup, url, timeout)
+                                           for _ in range(max(page_count, 1 if url else 0))],
+                                         return_exceptions=True)
+            slot = key, None
+            idle_pages = self._idle_pages.setdefault(slot, deque())
+            for page in pages:
+                if isinstance(page, Exception):
+                    logger.warning('error creating page of shard %s', key[1], exc_info=page)
+                    continue
+                if len(idle_pages) < page_count:
+                    self._page_uses[page] = 0
+                    idle_pages.append(page)
+                    count += 1
+                else:
+                    await page.close()
+        return count
+
+    async def _reset(self, page, clear_cookies=True):
+        """
+        reset state of page left by the previous request
+        :param page: page object
+        :param clear_cookies: delete cookies of page, they are kept in the cookie store
+                of the browser context shared by all its pages
+        :return:
+        """
+        await page.evaluate(CLEAR_STORAGE)
+        if clear_cookies:
+            cookies = await page.cookies()
+            if cookies:
+                await page.deleteCookie(*cookies)
+        await page.goto('about:blank')
+
+    def release_acquired(self, acquiring):
+        """
+        give back the page of an acquiring nobody waits for anymore once it is leased
+        :param acquiring: future of `acquire`
+        :return:
+        """
+        def _release(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            asyncio.ensure_future(self.release(future.result()))
+
+        acquiring.add_done_callback(_release)
+
+    async def release(self, lease, timeout=None):
+        """
+        give back a leased page, it will be recycled or closed
+        :param lease: PageLease
+        :param timeout: timeout in seconds of finalizing and resetting page, it is closed
+                instead of recycled if they take longer, never longer than `health_check_timeout`
+                as the page is not watched by health checks anymore
+        :return:
+        """
+        if lease.released:
+            return
+        lease.released = True
+        self._leases.discard(lease)
+        if self.health_check_timeout:
+            timeout = self.health_check_timeout if timeout is None else min(timeout, self.health_check_timeout)
+        try:
+            # a page closed anyway needs no finalizing
+            finalized = lease.alive and (timeout is None or timeout > 0) \
+                and await asyncio.wait_for(lease.finalize(), timeout)
+        except asyncio.TimeoutError:
+            logger.debug('timeout finalizing lease of page, retire it')
+            finalized = False
+        lease.detach()
+        page, key, slot = lease.page, lease.key, lease.slot
+        self._update_inflight(key, -1)
+        if slot in self._context_leases:
+            self._context_leases[slot] -= 1
+        uses = self._page_uses.pop(page, 0) + 1
+        recycle = finalized and self.page_pool_size > 0 and not page.isClosed() \
+            and not lease.dispose and not lease.retired \
+            and (not self.page_max_uses or uses < self.page_max_uses) \
+            and (timeout is None or timeout > 0)
+        if recycle:
+            # cookies of the default context or of a context still used by other
+            # pages belong to those pages too
+            clear_cookies = lease.context_key is not None and not self._context_leases.get(slot)
+            try:
+                await asyncio.wait_for(self._reset(page, clear_cookies), timeout)
+            except Exception:
+                logger.debug('error resetting page, retire it', exc_info=True)
+                recycle = False
+        idle_pages = self._idle_pages.setdefault(slot, deque())
+        if recycle and self._browsers.get(key) is lease.browser \
+                and (lease.context_key is None or slot in self._contexts) \
+                and len(idle_pages) < self.page_pool_size:
+            self._page_uses[page] = uses
+            idle_pages.append(page)
+        elif not page.isClosed():
+            try:
+                await asyncio.wait_for(page.close(), self.health_check_timeout or None)
+            except Exception:
+                logger.debug('error closing page', exc_info=True)
+        if lease.dispose and slot in self._contexts \
+                and not self._context_leases.get(slot):
+            await self._close_context(slot, self._contexts[slot])
+        if not self.enabled:
+            await self._close_browser(lease.browser)
+
+    async def close(self):
+        """
+        close all browsers of the pool, pages and contexts created in remote
+        browsers are closed before disconnecting
+        :return:
+        """
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        browsers = list(self._browsers.values())
+        self._browsers.clear()
+        if self.endpoints:
+            for pages in self._idle_pages.values():
+                for page in pages:
+                    try:
+                        await page.close()
+                    except Exception:
+                        logger.debug('error closing page', exc_info=True)
+            for context in self._contexts.values():
+                try:
+                    await context.close()
+                except Exception:
+                    logger.debug('error closing browser context', exc_info=True)
+        self._contexts.clear()
+        self._context_leases.clear()
+        self._idle_pages.clear()
+        self._page_uses.clear()
+        for browser in browsers:
+            try:
+                await self._close_browser(browser)
+            except Exception:
+                logger.exception('error closing browser', exc_info=True)
+        # browsers still being launched
+        for launcher in list(self._launchers):
+            process = getattr(launcher, 'proc', None)
+            if process is not None:
+                await asyncio.get_event_loop().run_in_executor(None, kill_process_tree, process)
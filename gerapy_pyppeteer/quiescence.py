@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# resolve when DOM has not been mutated for quietMs, or maxMs passed
+DOM_QUIET_SCRIPT = '''(quietMs, maxMs) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    const timer = setInterval(() => {
+        const now = performance.now();
+        if (now - last >= quietMs || now - start >= maxMs) {
+            clearInterval(timer);
+            observer.disconnect();
+            resolve(now - last >= quietMs);
+        }
+    }, Math.min(50, quietMs));
+})'''
+
+
+class NetworkMonitor(object):
+    """
+    Track in-flight requests of a page and time of the last network activity
+    """
+
+    def __init__(self):
+        self._inflight = set()
+        self.last_activity = time.monotonic()
+
+    @property
+    def inflight(self):
+        """
+        count of in-flight requests
+        :return:
+        """
+        return len(self._inflight)
+
+    def attach(self, lease):
+        """
+        listen to network events of leased page
+        :param lease: PageLease
+        :return:
+        """
+        lease.on('request', self._on_request)
+        lease.on('requestfinished', self._on_finished)
+        lease.on('requestfailed', self._on_finished)
+
+    def _on_request(self, request):
+        self._inflight.add(request)
+        self.last_activity = time.monotonic()
+
+    def _on_finished(self, request):
+        self._inflight.discard(request)
+        self.last_activity = time.monotonic()
+
+
+async def wait_for_quiescence(page, monitor, quiet_time=0.5, timeout=5, max_inflight=0):
+    """
+    wait until network and DOM of page have been quiet for quiet time
+    :param page: page
+    :param monitor: NetworkMonitor attached before navigation
+    :param quiet_time: time in seconds without network activity and DOM mutations
+    :param timeout: max time in seconds to wait
+    :param max_inflight: max count of in-flight requests considered quiet, like long polling
+    :return: whether page became quiet before timeout
+    """
+    from pyppeteer.errors import NetworkError
+    deadline = time.monotonic() + timeout
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            return False
+        # DOM quiet time overlaps network quiet time
+        try:
+            dom_quiet = await page.evaluate(DOM_QUIET_SCRIPT, quiet_time * 1000,
+                                            (deadline - now) * 1000)
+        except NetworkError:
+            # execution context destroyed by navigation
+            logger.debug('page navigated while waiting for quiescence')
+            await asyncio.sleep(0.05)
+            continue
+        if not dom_quiet:
+            return False
+        # network is tracked without talking to the browser
+        network_quiet_for = time.monotonic() - monitor.last_activity
+        if monitor.inflight <= max_inflight and network_quiet_for >= quiet_time:
+            return True
+        # wait for network and check DOM again
+        while monitor.inflight > max_inflight or network_quiet_for < quiet_time:
+            now = time.monotonic()
+            if now >= deadline:
+                return False
+            await asyncio.sleep(min(max(quiet_time - network_quiet_for, 0.05), deadline - now))
+            network_quiet_for = time.monotonic() - monitor.last_activity
@@ -0,0 +1,35 @@
+import asyncio
+import sys
+
+ASYNCIO_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
+
+
+def is_asyncio_reactor_installed():
+    """
+    whether the installed Twisted reactor runs on an asyncio event loop
+    :return:
+    """
+    reactor = sys.modules.get('twisted.internet.reactor')
+    if reactor is None:
+        return False
+    from twisted.internet.asyncioreactor import AsyncioSelectorReactor
+    return isinstance(reactor, AsyncioSelectorReactor)
+
+
+def install_asyncio_reactor(settings):
+    """
+    make sure requests are rendered on the asyncio reactor, it is installed like
+    `TWISTED_REACTOR` does only if no reactor is installed yet, a reactor installed
+    by Scrapy or others is never replaced
+    :param settings: crawler settings
+    :return:
+    """
+    reactor_path = settings.get('TWISTED_REACTOR') or ASYNCIO_REACTOR
+    if 'twisted.internet.reactor' not in sys.modules and reactor_path == ASYNCIO_REACTOR:
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        from twisted.internet import asyncioreactor
+        asyncioreactor.install(asyncio.get_event_loop())
+    if not is_asyncio_reactor_installed():
+        raise ValueError(
+            f'PyppeteerMiddleware requires the asyncio reactor, set TWISTED_REACTOR = {ASYNCIO_REACTOR!r}')
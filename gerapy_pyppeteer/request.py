@@ -8,7 +8,9 @@ class PyppeteerRequest(Request):
     """
 
     def __init__(self, url, callback=None, wait_until=None, wait_for=None, script=None, actions=None, proxy=None,
-                 proxy_credential=None, sleep=None, timeout=None, ignore_resource_types=None, pretend=None, screenshot=None, meta=None,
+                 proxy_credential=None, sleep=None, timeout=None, ignore_resource_types=None, pretend=None, screenshot=None,
+                 hybrid=None, quiescence=None, capture=None, extract=None,
+                 extract_only=None, deadline=None, partial=None, fast_retry=None, cache_key=None, meta=None,
                  *args, **kwargs):
         """
         :param url: request url
@@ -27,6 +29,20 @@ class PyppeteerRequest(Request):
         :param screenshot: ignored resource types, see
                 https://miyakogi.github.io/pyppeteer/_modules/pyppeteer/page.html#Page.screenshot,
                 override `GERAPY_PYPPETEER_SCREENSHOT`
+        :param hybrid: fetch over plain HTTP first, override `GERAPY_PYPPETEER_HYBRID`
+        :param quiescence: wait until network and DOM are quiet, also supports dict like
+                `{'quiet_time': 0.5, 'timeout': 5, 'max_inflight': 0}`, override `GERAPY_PYPPETEER_QUIESCENCE`
+        :param capture: url patterns and resource types of network responses to capture, also supports
+                dict like `{'patterns': ['/api/'], 'resource_types': ['xhr'], 'stop': True}`
+        :param extract: fields to extract in page, dict of field name and CSS selector like `a::attr(href)`,
+                list of one selector for all matches, or dict like `{'xpath': '//li', 'many': True, 'fields': {...}}`
+        :param extract_only: only return extracted fields, the body of response is empty
+        :param deadline: deadline in seconds of all phases of rendering, override `GERAPY_PYPPETEER_DEADLINE`
+        :param partial: return page rendered so far when the deadline is exceeded,
+                override `GERAPY_PYPPETEER_DEADLINE_PARTIAL`
+        :param fast_retry: times to navigate again on the same page, override `GERAPY_PYPPETEER_FAST_RETRY_TIMES`
+        :param cache_key: key of the rendered result in render cache, identifies `actions` defined as
+                lambda or local function, which are not cached without it
         :param args:
         :param kwargs:
         """
@@ -56,6 +72,24 @@ class PyppeteerRequest(Request):
             'ignore_resource_types') is not None else ignore_resource_types
         self.screenshot = pyppeteer_meta.get('screenshot') if pyppeteer_meta.get(
             'screenshot') is not None else screenshot
+        self.hybrid = pyppeteer_meta.get('hybrid') if pyppeteer_meta.get(
+            'hybrid') is not None else hybrid
+        self.quiescence = pyppeteer_meta.get('quiescence') if pyppeteer_meta.get(
+            'quiescence') is not None else quiescence
+        self.capture = pyppeteer_meta.get('capture') if pyppeteer_meta.get(
+            'capture') is not None else capture
+        self.extract = pyppeteer_meta.get('extract') if pyppeteer_meta.get(
+            'extract') is not None else extract
+        self.extract_only = pyppeteer_meta.get('extract_only') if pyppeteer_meta.get(
+            'extract_only') is not None else extract_only
+        self.deadline = pyppeteer_meta.get('deadline') if pyppeteer_meta.get(
+            'deadline') is not None else deadline
+        self.partial = pyppeteer_meta.get('partial') if pyppeteer_meta.get(
+            'partial') is not None else partial
+        self.fast_retry = pyppeteer_meta.get('fast_retry') if pyppeteer_meta.get(
+            'fast_retry') is not None else fast_retry
+        self.cache_key = pyppeteer_meta.get('cache_key') if pyppeteer_meta.get(
+            'cache_key') is not None else cache_key
 
         pyppeteer_meta = meta.setdefault('pyppeteer', {})
         pyppeteer_meta['wait_until'] = self.wait_until
@@ -69,5 +103,14 @@ class PyppeteerRequest(Request):
         pyppeteer_meta['timeout'] = self.timeout
         pyppeteer_meta['screenshot'] = self.screenshot
         pyppeteer_meta['ignore_resource_types'] = self.ignore_resource_types
+        pyppeteer_meta['hybrid'] = self.hybrid
+        pyppeteer_meta['quiescence'] = self.quiescence
+        pyppeteer_meta['capture'] = self.capture
+        pyppeteer_meta['extract'] = self.extract
+        pyppeteer_meta['extract_only'] = self.extract_only
+        pyppeteer_meta['deadline'] = self.deadline
+        pyppeteer_meta['partial'] = self.partial
+        pyppeteer_meta['fast_retry'] = self.fast_retry
+        pyppeteer_meta['cache_key'] = self.cache_key
 
         super().__init__(url, callback, meta=meta, *args, **kwargs)
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import logging
+import math
+import os
+import tempfile
+
+from w3lib.url import canonicalize_url
+
+from gerapy_pyppeteer.settings import *
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+# file extensions of screenshot types
+EXTENSIONS = {
+    'png': 'png',
+    'jpeg': 'jpg',
+    'webp': 'webp',
+}
+
+
+async def take_screenshot(page, options):
+    """
+    take screenshot of page, `webp` type and `thumbnail` option are captured
+    by Chromium directly, others by pyppeteer
+    :param page: page object
+    :param options: screenshot options of pyppeteer, also supports `webp` type
+            and `thumbnail` width in pixels which scales the image when capturing
+    :return: bytes or base64 string
+    """
+    options = dict(options) if isinstance(options, dict) else {}
+    # not to save image directly in this middleware
+    options.pop('path', None)
+    thumbnail = options.pop('thumbnail', None)
+    image_type = options.get('type', 'png')
+    if image_type != 'webp' and not thumbnail:
+        return await page.screenshot(options)
+
+    params = {'format': image_type}
+    if image_type != 'png' and options.get('quality') is not None:
+        params['quality'] = options['quality']
+    clip = options.get('clip')
+    viewport = page.viewport
+    if options.get('fullPage'):
+        metrics = await page._client.send('Page.getLayoutMetrics')
+        width = math.ceil(metrics['contentSize']['width'])
+        height = math.ceil(metrics['contentSize']['height'])
+        clip = {'x': 0, 'y': 0, 'width': width, 'height': height}
+        await page._client.send('Emulation.setDeviceMetricsOverride', {
+            'mobile': bool(viewport and viewport.get('isMobile')),
+            'width': width,
+            'height': height,
+            'deviceScaleFactor': (viewport or {}).get('deviceScaleFactor', 1),
+            'screenOrientation': {'angle': 0, 'type': 'portraitPrimary'},
+        })
+    elif clip is None:
+        metrics = await page._client.send('Page.getLayoutMetrics')
+        layout = metrics['layoutViewport']
+        clip = {'x': layout['pageX'], 'y': layout['pageY'],
+                'width': layout['clientWidth'], 'height': layout['clientHeight']}
+    clip = dict(clip, scale=clip.get('scale', 1))
+    if thumbnail:
+        clip['scale'] = min(thumbnail / clip['width'], 1)
+    params['clip'] = clip
+    if options.get('omitBackground'):
+        await page._client.send('Emulation.setDefaultBackgroundColorOverride',
+                                {'color': {'r': 0, 'g': 0, 'b': 0, 'a': 0}})
+    try:
+        result = await page._client.send('Page.captureScreenshot', params)
+    finally:
+        if options.get('omitBackground'):
+            await page._client.send('Emulation.setDefaultBackgroundColorOverride')
+        if options.get('fullPage') and viewport:
+            await page.setViewport(viewport)
+    if options.get('encoding') == 'base64':
+        return result['data']
+    return base64.b64decode(result['data'])
+
+
+class DirectoryScreenshotStorage(object):
+    """
+    Save screenshots to a directory of spider, named by fingerprint of url
+    """
+
+    def __init__(self, settings):
+        """
+        :param settings: crawler settings
+        """
+        self.screenshot_dir = settings.get('GERAPY_PYPPETEER_SCREENSHOT_DIR',
+                                           GERAPY_PYPPETEER_SCREENSHOT_DIR)
+        self._spider_dir = None
+
+    def open_spider(self, spider):
+        self._spider_dir = os.path.abspath(os.path.join(self.screenshot_dir, spider.name))
+        os.makedirs(self._spider_dir, exist_ok=True)
+        logger.debug('saving screenshots to %s', self._spider_dir)
+
+    def close_spider(self, spider):
+        pass
+
+    def _path(self, request, data, extension):
+        name = hashlib.sha1(canonicalize_url(request.url).encode()).hexdigest()
+        return os.path.join(self._spider_dir, f'{name}.{extension}')
+
+    @staticmethod
+    def _write(path, data):
+        """
+        write file atomically, readers never see a partial image
+        :param path:
+        :param data:
+        :return:
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def store(self, request, data, extension):
+        """
+        save screenshot of request
+        :param request: request
+        :param data: image bytes
+        :param extension: file extension, like `png`
+        :return: path of saved file
+        """
+        path = self._path(request, data, extension)
+        self._write(path, data)
+        return path
+
+
+class ContentAddressedScreenshotStorage(DirectoryScreenshotStorage):
+    """
+    Save screenshots named by hash of content, identical screenshots are
+    saved only once
+    """
+
+    def _path(self, request, data, extension):
+        name = hashlib.sha256(data).hexdigest()
+        return os.path.join(self._spider_dir, name[:2], f'{name}.{extension}')
+
+    def store(self, request, data, extension):
+        path = self._path(request, data, extension)
+        if not os.path.exists(path):
+            self._write(path, data)
+        return path
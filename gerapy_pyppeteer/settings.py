@@ -42,4 +42,187 @@ GERAPY_PYPPETEER_DISABLE_GPU = True
 GERAPY_PYPPETEER_IGNORE_RESOURCE_TYPES = []
 GERAPY_PYPPETEER_SCREENSHOT = None
 GERAPY_PYPPETEER_SLEEP = 1
+# deadline in seconds of all phases of rendering a request, from getting a page to taking
+# the screenshot, 0 for no deadline, otherwise only navigation is limited by download timeout
+GERAPY_PYPPETEER_DEADLINE = 0
+# return page rendered so far with flag `partial` when the deadline is exceeded, instead of retrying
+GERAPY_PYPPETEER_DEADLINE_PARTIAL = False
 GERAPY_ENABLE_REQUEST_INTERCEPTION = False
+
+# engine of request interception, CDP Fetch domain pauses only requests matching patterns
+# registered in browser, page pauses every request and handles it by `request` event
+INTERCEPTION_FETCH = 'fetch'
+INTERCEPTION_PAGE = 'page'
+GERAPY_PYPPETEER_INTERCEPTION_ENGINE = INTERCEPTION_FETCH
+
+# forward headers of Scrapy request to browser as extra HTTP headers, except ignored ones,
+# User-Agent is set by user agent override and cookies by cookie middleware, extra headers
+# are sent with every subresource so credentials and referer are not forwarded
+GERAPY_PYPPETEER_FORWARD_HEADERS = True
+GERAPY_PYPPETEER_IGNORE_HEADERS = ['Accept', 'Accept-Encoding', 'Authorization', 'Connection', 'Content-Length',
+                                   'Cookie', 'Host', 'Proxy-Authorization', 'Referer', 'User-Agent']
+
+# push cookie jar of Scrapy to browser before rendering and pull cookies of browser back
+# after rendering, jars are selected by `cookiejar` meta
+GERAPY_PYPPETEER_SYNC_COOKIES = True
+
+# keep launched browsers alive and reuse them across requests
+GERAPY_PYPPETEER_BROWSER_POOL = True
+
+# max count of idle pages kept for each browser, 0 to close pages after use
+GERAPY_PYPPETEER_PAGE_POOL_SIZE = 8
+# retire page after this count of navigations, 0 for no limit
+GERAPY_PYPPETEER_PAGE_MAX_USES = 100
+
+# isolation of requests sharing a browser, can be one of:
+# ``None``: all requests share the default browser context
+# ``proxy``: one incognito browser context per proxy
+# ``session``: one incognito browser context per proxy and ``cookiejar`` meta
+# ``request``: one incognito browser context per request
+ISOLATION_PROXY = 'proxy'
+ISOLATION_SESSION = 'session'
+ISOLATION_REQUEST = 'request'
+GERAPY_PYPPETEER_ISOLATION = None
+# max count of browser contexts kept open, 0 for no limit
+GERAPY_PYPPETEER_MAX_CONTEXTS = 32
+# max count of launched browsers kept alive, every launch options such as a proxy without
+# isolation needs its own browser, least recently used idle browsers are closed first,
+# 0 for no limit
+GERAPY_PYPPETEER_MAX_BROWSERS = 8
+
+# count of browser processes for the same launch options, ``auto`` for count of cpu cores
+BROWSER_COUNT_AUTO = 'auto'
+GERAPY_PYPPETEER_BROWSER_COUNT = 1
+# assignment of requests to browsers, can be one of:
+# ``least_loaded``: the browser with least in-flight pages
+# ``round_robin``: browsers in turn
+# ``domain``: the same domain always goes to the same browser to keep cache locality
+SHARDING_LEAST_LOADED = 'least_loaded'
+SHARDING_ROUND_ROBIN = 'round_robin'
+SHARDING_DOMAIN = 'domain'
+GERAPY_PYPPETEER_BROWSER_SHARDING = SHARDING_LEAST_LOADED
+
+# websocket endpoints or urls of pre-launched browsers to connect instead of launching,
+# like ``ws://127.0.0.1:9222/devtools/browser/<id>`` or ``http://127.0.0.1:9222``
+GERAPY_PYPPETEER_BROWSER_ENDPOINTS = []
+# interval in seconds to check health of browsers, 0 to disable
+GERAPY_PYPPETEER_HEALTH_CHECK_INTERVAL = 30
+GERAPY_PYPPETEER_HEALTH_CHECK_TIMEOUT = 10
+# times a request is rendered again after its page or browser crashed, not counted as retry
+GERAPY_PYPPETEER_MAX_RESCHEDULE_TIMES = 3
+# time in seconds an unhealthy endpoint is skipped before reconnecting
+GERAPY_PYPPETEER_BROWSER_ENDPOINT_BACKOFF = 30
+
+# max count of concurrently rendered pages, 0 for no limit except CONCURRENT_REQUESTS
+GERAPY_PYPPETEER_MAX_PAGES = 0
+# max count of concurrently rendered pages of the same domain, 0 for no limit
+GERAPY_PYPPETEER_MAX_PAGES_PER_DOMAIN = 0
+
+# adjust count of concurrently rendered pages at runtime by memory, event loop lag and latency
+GERAPY_PYPPETEER_AUTOTHROTTLE_ENABLED = False
+GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_PAGES = 1
+# defaults to GERAPY_PYPPETEER_MAX_PAGES if it is set
+GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_PAGES = 16
+GERAPY_PYPPETEER_AUTOTHROTTLE_START_PAGES = 4
+# interval in seconds of adjustment
+GERAPY_PYPPETEER_AUTOTHROTTLE_INTERVAL = 5
+# min ratio of available host memory
+GERAPY_PYPPETEER_AUTOTHROTTLE_MIN_FREE_MEMORY = 0.1
+# max resident memory of local browsers in MB, 0 for no limit
+GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_BROWSER_RSS = 0
+# max lag of event loop in seconds, 0 for no limit
+GERAPY_PYPPETEER_AUTOTHROTTLE_MAX_LOOP_LAG = 0.5
+# max p95 render latency in seconds, 0 for no limit
+GERAPY_PYPPETEER_AUTOTHROTTLE_TARGET_LATENCY = 0
+
+# cache rendered results, keyed by url, relevant headers and pyppeteer meta
+GERAPY_PYPPETEER_CACHE_ENABLED = False
+# ``gerapy_pyppeteer.cache.FilesystemRenderCacheStorage`` or ``gerapy_pyppeteer.cache.SqliteRenderCacheStorage``
+GERAPY_PYPPETEER_CACHE_STORAGE = 'gerapy_pyppeteer.cache.FilesystemRenderCacheStorage'
+# directory of cache, relative to the project data dir
+GERAPY_PYPPETEER_CACHE_DIR = 'pyppeteer_cache'
+# time in seconds cached results expire, 0 for never
+GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS = 0
+# max count of cached results, 0 for no limit
+GERAPY_PYPPETEER_CACHE_MAX_ENTRIES = 0
+# max size of cached results in MB, 0 for no limit
+GERAPY_PYPPETEER_CACHE_MAX_SIZE = 0
+# request headers changing the rendered result
+GERAPY_PYPPETEER_CACHE_HEADERS = []
+GERAPY_PYPPETEER_CACHE_IGNORE_HTTP_CODES = []
+
+# directory of HTTP disk cache of local browsers shared by pages and kept across runs,
+# relative to the project data dir, None for a temporary cache of each browser
+GERAPY_PYPPETEER_DISK_CACHE_DIR = None
+# max size of disk cache of each browser in MB, 0 for the default of Chromium
+GERAPY_PYPPETEER_DISK_CACHE_SIZE = 0
+
+# block sub requests matching EasyList style rules, like ``||doubleclick.net^`` or ``/ads/*$script,third-party``
+GERAPY_PYPPETEER_BLOCK_RULES = []
+# paths of EasyList or hosts files of block rules
+GERAPY_PYPPETEER_BLOCK_LISTS = []
+
+# fetch pyppeteer requests over plain HTTP first, render by browser only when needed
+HYBRID_HTTP = 'http'
+HYBRID_BROWSER = 'browser'
+GERAPY_PYPPETEER_HYBRID = False
+# bodies smaller than it in bytes are rendered by browser
+GERAPY_PYPPETEER_HYBRID_MIN_BODY_SIZE = 512
+# regexes of SPA shells rendered by browser
+GERAPY_PYPPETEER_HYBRID_SPA_PATTERNS = [
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>',
+    r'<noscript>[^<]*(?:enable|requires?)\s+javascript',
+]
+# count of fetches of a domain or url pattern before its learned decision is used
+GERAPY_PYPPETEER_HYBRID_MIN_SAMPLES = 3
+# JSON file keeping learned decisions across runs, relative to the project data dir, None for not keeping
+GERAPY_PYPPETEER_HYBRID_TABLE = None
+
+# wait until network and DOM are quiet instead of sleeping for GERAPY_PYPPETEER_SLEEP
+GERAPY_PYPPETEER_QUIESCENCE = False
+# time in seconds without network activity and DOM mutations
+GERAPY_PYPPETEER_QUIESCENCE_QUIET_TIME = 0.5
+# max time in seconds to wait
+GERAPY_PYPPETEER_QUIESCENCE_TIMEOUT = 5
+# max count of in-flight requests considered quiet, like long polling
+GERAPY_PYPPETEER_QUIESCENCE_MAX_INFLIGHT = 0
+
+# max time in seconds to wait for bodies of captured responses after rendering, reads not done
+# in time are cancelled, like ones of long polling or event streams
+GERAPY_PYPPETEER_CAPTURE_TIMEOUT = 5
+
+# export histograms of time of render phases to stats
+GERAPY_PYPPETEER_TIMING_STATS = True
+# save time of render phases of every request to ``response.meta['pyppeteer_timing']``
+GERAPY_PYPPETEER_TIMING_META = False
+
+# save screenshots to storage in a thread instead of keeping them in memory, ``response.meta['screenshot']`` is
+# the path then, ``gerapy_pyppeteer.screenshot.DirectoryScreenshotStorage`` or
+# ``gerapy_pyppeteer.screenshot.ContentAddressedScreenshotStorage``, None for ``BytesIO`` in memory
+GERAPY_PYPPETEER_SCREENSHOT_STORAGE = None
+GERAPY_PYPPETEER_SCREENSHOT_DIR = 'screenshots'
+
+# kinds of rendering failures, counted in stats ``pyppeteer/failure/<kind>``
+FAILURE_DNS = 'dns'
+FAILURE_PROXY = 'proxy'
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_CONNECTION = 'connection'
+FAILURE_ABORT = 'abort'
+FAILURE_CRASH = 'crash'
+FAILURE_OTHER = 'other'
+# times to navigate again on the same page with exponential backoff before retrying
+# by the scheduler, 0 to retry by the scheduler only
+GERAPY_PYPPETEER_FAST_RETRY_TIMES = 0
+# backoff in seconds before the first fast retry, doubled on every attempt
+GERAPY_PYPPETEER_FAST_RETRY_BACKOFF = 0.5
+# kinds of failures retried on the same page, other ones are retried by the scheduler
+GERAPY_PYPPETEER_FAST_RETRY_FAILURES = [FAILURE_TIMEOUT, FAILURE_CONNECTION, FAILURE_ABORT]
+
+# launch or connect all browsers at spider open instead of on the first request
+GERAPY_PYPPETEER_PRELAUNCH = False
+# count of pages created for each prelaunched browser at spider open, limited by
+# GERAPY_PYPPETEER_PAGE_POOL_SIZE, pages are created in the default browser context
+GERAPY_PYPPETEER_PRELAUNCH_PAGES = 0
+# url loaded by prelaunched pages to prime caches of browser, None for no loading
+GERAPY_PYPPETEER_WARM_UP_URL = None
+GERAPY_PYPPETEER_WARM_UP_TIMEOUT = 30
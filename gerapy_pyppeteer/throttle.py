@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+
+def memory_available_ratio():
+    """
+    get ratio of available memory of host, None if unknown
+    :return:
+    """
+    info = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                name, value = line.split(':', 1)
+                info[name] = int(value.split()[0])
+    except (OSError, ValueError):
+        return None
+    if not info.get('MemTotal') or 'MemAvailable' not in info:
+        return None
+    return info['MemAvailable'] / info['MemTotal']
+
+
+def process_tree_rss(pids):
+    """
+    get total resident memory in bytes of processes and all their descendants,
+    such as Chromium and its renderer processes, None if unknown
+    :param pids: root process ids
+    :return:
+    """
+    if not pids or not os.path.isdir('/proc'):
+        return None
+    parents, rss = {}, {}
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        pid = int(entry)
+        parents.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * page_size
+    total, stack = 0, list(pids)
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(parents.get(pid, []))
+    return total
+
+
+class RenderThrottle(object):
+    """
+    Adjust count of concurrently rendered pages at runtime like AutoThrottle,
+    decrease multiplicatively when host memory, Chromium memory, event loop lag
+    or render latency exceeds its limit, increase by one while requests are
+    waiting for render slots
+    """
+
+    def __init__(self, limiter, pids=None, min_pages=1, max_pages=16, start_pages=4, interval=5,
+                 min_free_memory=0.1, max_browser_rss=0, max_loop_lag=0.5, target_latency=0,
+                 stats=None):
+        """
+        :param limiter: RenderLimiter to adjust
+        :param pids: function returning process ids of local browsers
+        :param min_pages: lower bound of concurrently rendered pages
+        :param max_pages: upper bound of concurrently rendered pages
+        :param start_pages: initial count of concurrently rendered pages
+        :param interval: interval in seconds of adjustment
+        :param min_free_memory: min ratio of available host memory
+        :param max_browser_rss: max resident memory of browsers in MB, 0 means no limit
+        :param max_loop_lag: max lag of event loop in seconds, 0 means no limit
+        :param target_latency: max p95 render latency in seconds, 0 means no limit
+        :param stats: crawler stats to export decisions
+        """
+        self.limiter = limiter
+        self.pids = pids
+        self.min_pages = max(min_pages, 1)
+        self.max_pages = max(max_pages, self.min_pages)
+        self.interval = interval
+        self.min_free_memory = min_free_memory
+        self.max_browser_rss = max_browser_rss
+        self.max_loop_lag = max_loop_lag
+        self.target_latency = target_latency
+        self.stats = stats
+        self._latencies = deque(maxlen=200)
+        self._task = None
+        self.limiter.resize(min(max(start_pages, self.min_pages), self.max_pages))
+
+    def record(self, latency):
+        """
+        record latency of a finished render
+        :param latency: render time in seconds
+        :return:
+        """
+        self._latencies.append(latency)
+
+    def _p95_latency(self):
+        """
+        get p95 of recent render latencies, None if nothing rendered
+        :return:
+        """
+        if not self._latencies:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+
+    def start(self):
+        """
+        start adjusting in background
+        :return:
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """
+        stop adjusting
+        :return:
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """
+        adjust limit every interval
+        :return:
+        """
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            loop_lag = max(time.monotonic() - started - self.interval, 0)
+            try:
+                self.adjust(loop_lag)
+            except Exception:
+                logger.exception('error adjusting render concurrency', exc_info=True)
+
+    def _overload(self, loop_lag):
+        """
+        get reason of overload, None if not overloaded
+        :param loop_lag: measured lag of event loop in seconds
+        :return:
+        """
+        free_memory = memory_available_ratio()
+        browser_rss = process_tree_rss(self.pids()) if self.pids else None
+        p95_latency = self._p95_latency()
+        if self.stats:
+            self.stats.set_value('pyppeteer/throttle/loop_lag', loop_lag)
+            if free_memory is not None:
+                self.stats.set_value('pyppeteer/throttle/free_memory', free_memory)
+            if browser_rss is not None:
+                self.stats.set_value('pyppeteer/throttle/browser_rss', browser_rss)
+                self.stats.max_value('pyppeteer/throttle/max_browser_rss', browser_rss)
+            if p95_latency is not None:
+                self.stats.set_value('pyppeteer/throttle/p95_latency', p95_latency)
+        if free_memory is not None and free_memory < self.min_free_memory:
+            return f'free memory {free_memory:.0%}'
+        if self.max_browser_rss and browser_rss is not None \
+                and browser_rss > self.max_browser_rss * 1024 * 1024:
+            return f'browser rss {browser_rss / 1024 / 1024:.0f}MB'
+        if self.max_loop_lag and loop_lag > self.max_loop_lag:
+            return f'event loop lag {loop_lag:.2f}s'
+        if self.target_latency and p95_latency is not None and p95_latency > self.target_latency:
+            return f'p95 render latency {p95_latency:.2f}s'
+
+    def adjust(self, loop_lag=0):
+        """
+        adjust count of concurrently rendered pages once
+        :param loop_lag: measured lag of event loop in seconds
+        :return:
+        """
+        current = self.limiter.max_pages
+        reason = self._overload(loop_lag)
+        if reason:
+            target = max(int(current * 0.75), self.min_pages)
+        elif self.limiter.depth and self.limiter.active >= current:
+            target = min(current + 1, self.max_pages)
+            reason = f'{self.limiter.depth} requests waiting'
+        else:
+            target = current
+        if target != current:
+            logger.info('%s render concurrency from %s to %s: %s',
+                        'increasing' if target > current else 'decreasing', current, target, reason)
+            self.limiter.resize(target)
+            if self.stats:
+                self.stats.inc_value('pyppeteer/throttle/increase_count' if target > current
+                                     else 'pyppeteer/throttle/decrease_count')
+        if self.stats:
+            self.stats.set_value('pyppeteer/throttle/max_pages', target)
@@ -0,0 +1,96 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# percentiles of phase time exported to stats
+PERCENTILES = (50, 95, 99)
+
+
+class RenderTimer(object):
+    """
+    Measure time of every phase of rendering a request
+    """
+
+    def __init__(self):
+        # phase name -> seconds, in order of phases
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        measure time of a phase, time of repeated phases is summed up
+        :param name: phase name, such as `goto`
+        :return:
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.monotonic() - started
+
+    def add(self, name, seconds):
+        """
+        add time of a phase measured elsewhere
+        :param name: phase name
+        :param seconds:
+        :return:
+        """
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+
+class TimingStats(object):
+    """
+    Export histograms of phase time to crawler stats, count and sum cover
+    all requests, percentiles cover recent requests
+    """
+
+    def __init__(self, stats, sample_size=1000, update_interval=10):
+        """
+        :param stats: crawler stats
+        :param sample_size: count of recent samples of every phase for percentiles
+        :param update_interval: percentiles are updated every this count of samples
+        """
+        self.stats = stats
+        self.sample_size = sample_size
+        self.update_interval = update_interval
+        self._samples = {}
+        self._pending = {}
+
+    def record(self, phases):
+        """
+        record phase time of a request
+        :param phases: dict of phase name and seconds
+        :return:
+        """
+        for name, seconds in phases.items():
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.sample_size)
+            samples.append(seconds)
+            self.stats.inc_value(f'pyppeteer/timing/{name}/count')
+            self.stats.inc_value(f'pyppeteer/timing/{name}/sum', seconds)
+            self.stats.max_value(f'pyppeteer/timing/{name}/max', seconds)
+            self._pending[name] = self._pending.get(name, 0) + 1
+            if self._pending[name] >= self.update_interval:
+                self._update(name)
+
+    def _update(self, name):
+        """
+        export percentiles of phase
+        :param name: phase name
+        :return:
+        """
+        self._pending[name] = 0
+        samples = sorted(self._samples[name])
+        for percentile in PERCENTILES:
+            index = min(len(samples) * percentile // 100, len(samples) - 1)
+            self.stats.set_value(f'pyppeteer/timing/{name}/p{percentile}', samples[index])
+
+    def flush(self):
+        """
+        export percentiles of all phases
+        :return:
+        """
+        for name, pending in self._pending.items():
+            if pending:
+                self._update(name)
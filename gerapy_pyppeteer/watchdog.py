@@ -0,0 +1,86 @@
+import logging
+import os
+import signal
+
+logger = logging.getLogger('gerapy.pyppeteer')
+
+
+def processes():
+    """
+    get parent process id, state and name of all processes, empty if /proc is not available
+    :return: dict of process id and (parent process id, state, name)
+    """
+    result = {}
+    if not os.path.isdir('/proc'):
+        return result
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                data = f.read()
+        except OSError:
+            continue
+        name, _, rest = data.partition(' (')[2].rpartition(') ')
+        fields = rest.split()
+        if len(fields) < 2:
+            continue
+        result[int(entry)] = int(fields[1]), fields[0], name
+    return result
+
+
+def descendants(pid, table=None):
+    """
+    get process ids of descendants of process
+    :param pid: process id
+    :param table: result of `processes`
+    :return: list of process ids
+    """
+    table = processes() if table is None else table
+    children = {}
+    for child, (parent, _, _) in table.items():
+        children.setdefault(parent, []).append(child)
+    result, stack = [], list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        result.append(child)
+        stack.extend(children.get(child, []))
+    return result
+
+
+def kill(pid):
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_process_tree(process):
+    """
+    kill browser process and its descendants, then reap it, descendants are
+    collected first as they are moved to init once the browser exits
+    :param process: subprocess.Popen of browser
+    :return: count of killed processes
+    """
+    pids = descendants(process.pid)
+    if process.poll() is None:
+        pids.append(process.pid)
+    for pid in pids:
+        kill(pid)
+    try:
+        process.wait(timeout=10)
+    except Exception:
+        logger.warning('browser process %s not exited after killed', process.pid)
+    return len(pids)
+
+
+def reap_exited(launched):
+    """
+    reap exited browser processes recorded as launched, so they are not left as
+    zombies, processes not recorded are never touched as they may be owned by
+    other pools or user code
+    :param launched: dict of process id and subprocess.Popen launched by the pool
+    :return: process ids of exited processes
+    """
+    # poll waits for the process without blocking
+    return [pid for pid, process in launched.items() if process.poll() is not None]
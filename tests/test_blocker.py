@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from gerapy_pyppeteer.blocker import Blocker
+
+
+class BlockerTest(unittest.TestCase):
+
+    def test_host_rule(self):
+        blocker = Blocker.from_rules(['ads.example.com'])
+        self.assertTrue(blocker.should_block('https://ads.example.com/banner.js'))
+        self.assertTrue(blocker.should_block('https://cdn.ads.example.com/banner.js'))
+        self.assertFalse(blocker.should_block('https://example.com/ads.example.com'))
+        self.assertTrue(blocker.hosts_only)
+        self.assertEqual(len(blocker), 1)
+
+    def test_hosts_file_lines(self):
+        blocker = Blocker()
+        self.assertTrue(blocker.add_rule('0.0.0.0 tracker.example.com metrics.example.com # comment'))
+        self.assertTrue(blocker.should_block('https://tracker.example.com/t.gif'))
+        self.assertTrue(blocker.should_block('https://metrics.example.com/t.gif'))
+        self.assertFalse(blocker.should_block('https://comment/'))
+        self.assertEqual(len(blocker), 2)
+
+    def test_hosts_file_names_without_dot(self):
+        blocker = Blocker()
+        self.assertFalse(blocker.add_rule('127.0.0.1 localhost'))
+        self.assertFalse(blocker.add_rule('127.0.0.1 local'))
+        self.assertFalse(blocker.add_rule('::1 localhost ip6-localhost'))
+        blocker.add_rule('0.0.0.0 ads.example.com')
+        self.assertFalse(blocker.should_block('https://news.example.com/local/weather'))
+        self.assertFalse(blocker.should_block('http://localhost:8050/render'))
+        self.assertTrue(blocker.hosts_only)
+        self.assertEqual(blocker.url_patterns(), ['*://ads.example.com/*', '*://*.ads.example.com/*'])
+
+    def test_ignored_lines(self):
+        blocker = Blocker()
+        for line in ['', '! comment', '[Adblock Plus 2.0]', '# comment', 'example.com##.ad', '||*^']:
+            self.assertFalse(blocker.add_rule(line), line)
+        self.assertEqual(len(blocker), 0)
+
+    def test_pattern_rules(self):
+        blocker = Blocker.from_rules(['||ads.example.com^', '/banner\\d+/', '/pixel.gif|'])
+        self.assertTrue(blocker.should_block('https://ads.example.com/x.js'))
+        self.assertTrue(blocker.should_block('https://static.example.net/banner12.png'))
+        self.assertTrue(blocker.should_block('https://example.net/img/pixel.gif'))
+        self.assertFalse(blocker.should_block('https://example.net/img/pixel.gif?x=1'))
+        self.assertFalse(blocker.should_block('https://example.net/banner.png'))
+        self.assertFalse(blocker.hosts_only)
+
+    def test_exception_rules(self):
+        blocker = Blocker.from_rules(['ads.example.com', '@@||ads.example.com/consent^'])
+        self.assertTrue(blocker.should_block('https://ads.example.com/x.js'))
+        self.assertFalse(blocker.should_block('https://ads.example.com/consent/x.js'))
+        self.assertFalse(blocker.hosts_only)
+
+    def test_options(self):
+        blocker = Blocker.from_rules(['||track.io^$script,third-party'])
+        self.assertTrue(blocker.should_block('https://track.io/a.js', 'script', 'news.com'))
+        self.assertFalse(blocker.should_block('https://track.io/a.js', 'script', 'www.track.io'))
+        self.assertFalse(blocker.should_block('https://track.io/a.png', 'image', 'news.com'))
+
+    def test_unsupported_options(self):
+        blocker = Blocker()
+        self.assertFalse(blocker.add_rule('||example.com^$unknown-option'))
+        self.assertEqual(len(blocker), 0)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hosts')
+            with open(path, 'w') as f:
+                f.write('127.0.0.1 localhost\n0.0.0.0 ads.example.com\n! comment\n||track.io^\n')
+            blocker = Blocker.from_rules(paths=[path])
+        self.assertEqual(len(blocker), 2)
+        self.assertTrue(blocker.should_block('https://track.io/a.js'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import tempfile
+import time
+import unittest
+
+from scrapy import Request, Spider
+from scrapy.settings import Settings
+
+from gerapy_pyppeteer.cache import FilesystemRenderCacheStorage, SqliteRenderCacheStorage, render_fingerprint
+
+
+class RenderFingerprintTest(unittest.TestCase):
+
+    def test_canonical_url(self):
+        self.assertEqual(render_fingerprint(Request('https://example.com/?b=2&a=1')),
+                         render_fingerprint(Request('https://example.com/?a=1&b=2')))
+
+    def test_meta(self):
+        plain = render_fingerprint(Request('https://example.com/'))
+        waiting = render_fingerprint(Request('https://example.com/', meta={'pyppeteer': {'wait_for': '.item'}}))
+        self.assertNotEqual(plain, waiting)
+        self.assertEqual(plain, render_fingerprint(Request('https://example.com/', meta={'pyppeteer': {'proxy': 'x'}})))
+
+    def test_headers(self):
+        first = Request('https://example.com/', headers={'Accept-Language': 'en'})
+        second = Request('https://example.com/', headers={'Accept-Language': 'de'})
+        self.assertEqual(render_fingerprint(first), render_fingerprint(second))
+        self.assertNotEqual(render_fingerprint(first, headers=['Accept-Language']),
+                            render_fingerprint(second, headers=['Accept-Language']))
+
+
+    def test_actions(self):
+        first = Request('https://example.com/', meta={'pyppeteer': {'actions': click}})
+        second = Request('https://example.com/', meta={'pyppeteer': {'actions': scroll}})
+        self.assertNotEqual(render_fingerprint(first), render_fingerprint(second))
+
+    def test_unnamed_actions(self):
+        async def local_click(page):
+            pass
+
+        for actions in (lambda page: None, local_click):
+            request = Request('https://example.com/', meta={'pyppeteer': {'actions': actions}})
+            self.assertIsNone(render_fingerprint(request))
+        first = Request('https://example.com/', meta={'pyppeteer': {'actions': lambda page: None,
+                                                                    'cache_key': 'first'}})
+        second = Request('https://example.com/', meta={'pyppeteer': {'actions': lambda page: None,
+                                                                     'cache_key': 'second'}})
+        self.assertIsNotNone(render_fingerprint(first))
+        self.assertNotEqual(render_fingerprint(first), render_fingerprint(second))
+
+
+async def click(page):
+    pass
+
+
+async def scroll(page):
+    pass
+
+
+class StorageTestMixin(object):
+    storage_class = None
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spider = Spider('test')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_storage(self, **settings):
+        settings.setdefault('GERAPY_PYPPETEER_CACHE_DIR', self.directory.name)
+        storage = self.storage_class(Settings(settings))
+        storage.open_spider(self.spider)
+        self.addCleanup(storage.close_spider, self.spider)
+        return storage
+
+    def test_store_and_retrieve(self):
+        storage = self.get_storage()
+        self.assertIsNone(storage.retrieve('a' * 40))
+        storage.store('a' * 40, {'body': b'<html></html>', 'status': 200})
+        self.assertEqual(storage.retrieve('a' * 40), {'body': b'<html></html>', 'status': 200})
+
+    def test_persistence(self):
+        storage = self.get_storage()
+        storage.store('a' * 40, {'status': 200})
+        storage.close_spider(self.spider)
+        self.assertEqual(self.get_storage().retrieve('a' * 40), {'status': 200})
+
+    def test_expiration(self):
+        storage = self.get_storage(GERAPY_PYPPETEER_CACHE_EXPIRATION_SECS=1)
+        storage.store('a' * 40, {'status': 200})
+        self.assertIsNotNone(storage.retrieve('a' * 40))
+        time.sleep(1.1)
+        self.assertIsNone(storage.retrieve('a' * 40))
+
+    def test_max_entries(self):
+        storage = self.get_storage(GERAPY_PYPPETEER_CACHE_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            storage.store(key * 40, {'status': 200})
+            time.sleep(0.01)
+        self.assertIsNone(storage.retrieve('a' * 40))
+        self.assertIsNotNone(storage.retrieve('b' * 40))
+        self.assertIsNotNone(storage.retrieve('c' * 40))
+
+
+class FilesystemRenderCacheStorageTest(StorageTestMixin, unittest.TestCase):
+    storage_class = FilesystemRenderCacheStorage
+
+    def test_least_recently_used(self):
+        storage = self.get_storage(GERAPY_PYPPETEER_CACHE_MAX_ENTRIES=2)
+        storage.store('a' * 40, {'status': 200})
+        storage.store('b' * 40, {'status': 200})
+        storage.retrieve('a' * 40)
+        storage.store('c' * 40, {'status': 200})
+        self.assertIsNotNone(storage.retrieve('a' * 40))
+        self.assertIsNone(storage.retrieve('b' * 40))
+
+
+class SqliteRenderCacheStorageTest(StorageTestMixin, unittest.TestCase):
+    storage_class = SqliteRenderCacheStorage
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from gerapy_pyppeteer.capture import ResponseCapture
+
+
+class Request(object):
+
+    def __init__(self, resource_type='xhr', method='GET'):
+        self.resourceType = resource_type
+        self.method = method
+
+
+class Response(object):
+
+    def __init__(self, url, resource_type='xhr', body=b'{}', read=None):
+        self.url = url
+        self.status = 200
+        self.headers = {'content-type': 'application/json'}
+        self.request = Request(resource_type)
+        self.body = body
+        self.read = read
+
+    async def buffer(self):
+        if self.read is not None:
+            await self.read.wait()
+        if self.body is None:
+            raise RuntimeError('no body')
+        return self.body
+
+
+class ResponseCaptureTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_from_meta(self):
+        self.assertIsNone(ResponseCapture.from_meta(None))
+        capture = ResponseCapture.from_meta(['/api/', 'xhr'])
+        self.assertEqual([pattern.pattern for pattern in capture.patterns], ['/api/'])
+        self.assertEqual(capture.resource_types, {'xhr'})
+        self.assertFalse(capture.stop)
+        capture = ResponseCapture.from_meta({'patterns': ['/api/'], 'stop': True})
+        self.assertEqual(capture.resource_types, set())
+        self.assertTrue(capture.stop)
+        self.assertEqual(len(ResponseCapture.from_meta('/api/').patterns), 1)
+
+    def test_capture(self):
+        async def main():
+            capture = ResponseCapture(['/api/'], ['fetch'])
+            capture._on_response(Response('https://example.com/api/items'))
+            capture._on_response(Response('https://example.com/app.js', 'script'))
+            capture._on_response(Response('https://example.com/track', 'fetch', body=None))
+            self.assertEqual(await capture.wait_pending(), 0)
+            return capture.captures
+
+        captures = self.run_async(main())
+        self.assertEqual([(capture['url'], capture['resource_type'], capture['body']) for capture in captures], [
+            ('https://example.com/api/items', 'xhr', b'{}'),
+            # response without body is captured too
+            ('https://example.com/track', 'fetch', None),
+        ])
+        self.assertEqual(captures[0]['method'], 'GET')
+
+    def test_wait_pending(self):
+        async def main():
+            capture = ResponseCapture(['/stream'])
+            capture._on_response(Response('https://example.com/stream', read=asyncio.Event()))
+            # reads not done in time are cancelled
+            self.assertEqual(await capture.wait_pending(0.01), 1)
+            return capture.captures
+
+        self.assertEqual(self.run_async(main()), [])
+
+    def test_until_complete(self):
+        async def main():
+            capture = ResponseCapture(['/a', '/b'], stop=True)
+            rendering = asyncio.Event()
+
+            async def render():
+                await rendering.wait()
+                return 'rendered'
+
+            async def respond():
+                capture._on_response(Response('https://example.com/a'))
+                await asyncio.sleep(0.01)
+                # not complete until every pattern is matched
+                self.assertFalse(capture.done.is_set())
+                capture._on_response(Response('https://example.com/b'))
+
+            asyncio.ensure_future(respond())
+            result = await capture.until_complete(render())
+            self.assertTrue(capture.complete)
+            # capture is complete already
+            self.assertEqual(await capture.until_complete(render()), (None, True))
+            return result
+
+        self.assertEqual(self.run_async(main()), (None, True))
+
+    def test_until_complete_without_stop(self):
+        async def main():
+            capture = ResponseCapture(['/a'])
+
+            async def render():
+                capture._on_response(Response('https://example.com/a'))
+                await asyncio.sleep(0.01)
+                return 'rendered'
+
+            return await capture.until_complete(render())
+
+        self.assertEqual(self.run_async(main()), ('rendered', False))
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+import unittest
+
+from scrapy import Request
+from scrapy.downloadermiddlewares.cookies import CookiesMiddleware
+
+from gerapy_pyppeteer.cookies import CookieSync, request_cookie_params, to_cookie_param, to_jar_cookie
+
+
+class Client(object):
+
+    def __init__(self, cookies):
+        self.cookies = cookies
+        self.sent = []
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+        return {'cookies': self.cookies}
+
+
+class Page(object):
+
+    def __init__(self, url, cookies=None):
+        self.url = url
+        self._client = Client(cookies or [])
+
+
+class CookiesTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        expires = int(time.time()) + 3600
+        data = {'name': 'session', 'value': 'abc', 'domain': '.example.com', 'path': '/app',
+                'secure': True, 'httpOnly': True, 'expires': expires, 'session': False}
+        cookie = to_jar_cookie(data)
+        self.assertEqual(cookie.domain, '.example.com')
+        self.assertTrue(cookie.domain_specified)
+        self.assertEqual(cookie.expires, expires)
+        self.assertFalse(cookie.discard)
+        self.assertEqual(to_cookie_param(cookie), {
+            'name': 'session', 'value': 'abc', 'path': '/app', 'secure': True, 'httpOnly': True,
+            'domain': '.example.com', 'expires': expires,
+        })
+
+    def test_host_only(self):
+        cookie = to_jar_cookie({'name': 'a', 'value': '1', 'domain': 'www.example.com', 'path': '/',
+                                'expires': -1, 'session': True})
+        self.assertFalse(cookie.domain_specified)
+        self.assertIsNone(cookie.expires)
+        self.assertTrue(cookie.discard)
+        param = to_cookie_param(cookie)
+        self.assertEqual(param['url'], 'http://www.example.com/')
+        self.assertNotIn('domain', param)
+        self.assertNotIn('expires', param)
+
+    def test_request_cookies_dict(self):
+        request = Request('https://example.com/a', cookies={'a': 1})
+        self.assertEqual(request_cookie_params(request), [{'name': 'a', 'value': '1', 'url': 'https://example.com/a'}])
+
+    def test_request_cookies_list(self):
+        request = Request('https://example.com/a', cookies=[
+            {'name': 'a', 'value': '1', 'domain': '.example.com', 'path': '/'},
+            {'name': 'b', 'value': '2', 'secure': True},
+            {'value': 'nameless'},
+        ])
+        self.assertEqual(request_cookie_params(request), [
+            {'name': 'a', 'value': '1', 'domain': '.example.com', 'path': '/'},
+            {'name': 'b', 'value': '2', 'secure': True, 'url': 'https://example.com/a'},
+        ])
+
+
+class CookieSyncTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_pull_urls_of_request(self):
+        cookies_middleware = CookiesMiddleware()
+        cookie_sync = CookieSync(cookies_middleware)
+        page = Page('https://www.example.com/home', [
+            {'name': 'sid', 'value': '1', 'domain': 'www.example.com', 'path': '/', 'session': True},
+        ])
+        request = Request('https://example.com/login', meta={'cookiejar': 1})
+        self.assertEqual(self.run_async(cookie_sync.pull(page, request)), 1)
+        self.assertEqual(page._client.sent, [
+            ('Network.getCookies', {'urls': ['https://example.com/login', 'https://www.example.com/home']}),
+        ])
+        self.assertEqual([cookie.name for cookie in cookies_middleware.jars[1].jar], ['sid'])
+
+    def test_pull_without_jar(self):
+        page = Page('https://example.com/')
+        request = Request('https://example.com/', meta={'cookiejar': 1})
+        self.assertEqual(self.run_async(CookieSync().pull(page, request)), 0)
+        self.assertEqual(page._client.sent, [])
+
+    def test_shared_jars(self):
+        for isolated, warned in ((False, True), (True, False)):
+            cookie_sync = CookieSync(CookiesMiddleware(), isolated=isolated)
+            with self.assertLogs('gerapy.pyppeteer', 'WARNING') as logs:
+                for jar in (1, 1, 2, 3):
+                    request = Request('https://example.com/', meta={'cookiejar': jar})
+                    self.run_async(cookie_sync.push(Page('about:blank'), request))
+                # assertLogs needs at least one record
+                logging.getLogger('gerapy.pyppeteer').warning('done')
+            self.assertEqual(len(logs.records), 2 if warned else 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
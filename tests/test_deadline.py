@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from gerapy_pyppeteer.deadline import Deadline, DeadlineExceeded
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_no_deadline(self):
+        async def main():
+            deadline = Deadline()
+            self.assertFalse(deadline)
+            self.assertIsNone(deadline.remaining())
+            await asyncio.sleep(0.01)
+            return await deadline.run(asyncio.sleep(0, 'done'))
+
+        self.assertEqual(self.run_async(main()), 'done')
+
+    def test_negative_deadline(self):
+        with self.assertRaises(ValueError):
+            Deadline(-1)
+
+    def test_within_deadline(self):
+        async def main():
+            deadline = Deadline(1)
+            self.assertTrue(deadline)
+            return await deadline.run(asyncio.sleep(0.01, 'done'))
+
+        self.assertEqual(self.run_async(main()), 'done')
+
+    def test_deadline_exceeded(self):
+        async def main():
+            deadline = Deadline(0.05)
+            await deadline.run(asyncio.sleep(1))
+
+        with self.assertRaises(DeadlineExceeded):
+            self.run_async(main())
+
+    def test_phase_timeout(self):
+        async def main():
+            deadline = Deadline(1)
+            # timeout of the phase itself is not the deadline
+            await deadline.run(asyncio.wait_for(asyncio.sleep(1), 0.01))
+
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_async(main())
+
+    def test_expired_coroutine(self):
+        async def main():
+            deadline = Deadline(0.01)
+            await asyncio.sleep(0.02)
+            started = []
+
+            async def phase():
+                started.append(True)
+
+            with self.assertRaises(DeadlineExceeded):
+                await deadline.run(phase())
+            return started
+
+        self.assertEqual(self.run_async(main()), [])
+
+    def test_expired_future(self):
+        async def main():
+            deadline = Deadline(0.01)
+            await asyncio.sleep(0.02)
+            task = asyncio.ensure_future(asyncio.sleep(1))
+            shielded = asyncio.shield(task)
+            with self.assertRaises(DeadlineExceeded):
+                await deadline.run(shielded)
+            # shielded task goes on, only the outer future is cancelled
+            self.assertTrue(shielded.cancelled())
+            self.assertFalse(task.cancelled())
+            task.cancel()
+
+        self.run_async(main())
@@ -0,0 +1,43 @@
+import unittest
+
+from gerapy_pyppeteer.extract import compile_extract, compile_field, compile_fields
+
+
+class ExtractTest(unittest.TestCase):
+
+    def test_selector(self):
+        self.assertEqual(compile_field('h1'), {'css': 'h1', 'attr': 'text', 'many': False})
+        self.assertEqual(compile_field('h1::text'), {'css': 'h1', 'attr': 'text', 'many': False})
+        self.assertEqual(compile_field('div::html'), {'css': 'div', 'attr': 'html', 'many': False})
+        self.assertEqual(compile_field('a::attr(href)'), {'css': 'a', 'attr': 'href', 'many': False})
+        self.assertEqual(compile_field('::attr(lang)'), {'css': None, 'attr': 'lang', 'many': False})
+
+    def test_list(self):
+        self.assertEqual(compile_field(['li::text']), {'css': 'li', 'attr': 'text', 'many': True})
+        with self.assertRaises(ValueError):
+            compile_field(['li', 'p'])
+
+    def test_dict(self):
+        self.assertEqual(compile_field({'xpath': '//h1/text()'}),
+                         {'xpath': '//h1/text()', 'attr': 'text', 'many': False})
+        self.assertEqual(compile_field({'css': '.item', 'many': True, 'fields': {'title': 'h2'}}), {
+            'css': '.item', 'attr': 'text', 'many': True,
+            'fields': {'title': {'css': 'h2', 'attr': 'text', 'many': False}},
+        })
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            compile_field(1)
+        with self.assertRaises(ValueError):
+            compile_fields(['h1'])
+        with self.assertRaises(ValueError):
+            compile_extract({'title': None})
+
+    def test_compile_extract(self):
+        spec = {'title': 'h1', 'links': ['a::attr(href)']}
+        self.assertEqual(compile_extract(spec), compile_fields(spec))
+        self.assertIs(compile_extract(dict(spec)), compile_extract(spec))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from pyppeteer.errors import NetworkError, PageError, TimeoutError
+
+from gerapy_pyppeteer.failures import classify_failure
+from gerapy_pyppeteer.settings import FAILURE_ABORT, FAILURE_CONNECTION, FAILURE_CRASH, FAILURE_DNS, \
+    FAILURE_OTHER, FAILURE_PROXY, FAILURE_TIMEOUT
+
+
+class Lease(object):
+
+    def __init__(self, alive):
+        self.alive = alive
+
+
+class ClassifyFailureTest(unittest.TestCase):
+
+    def test_timeout(self):
+        self.assertEqual(classify_failure(TimeoutError('Navigation Timeout Exceeded')), FAILURE_TIMEOUT)
+        self.assertEqual(classify_failure(asyncio.TimeoutError()), FAILURE_TIMEOUT)
+
+    def test_net_errors(self):
+        for error, failure in [
+            ('ERR_NAME_NOT_RESOLVED', FAILURE_DNS),
+            ('ERR_PROXY_CONNECTION_FAILED', FAILURE_PROXY),
+            ('ERR_TUNNEL_CONNECTION_FAILED', FAILURE_PROXY),
+            ('ERR_CONNECTION_TIMED_OUT', FAILURE_TIMEOUT),
+            ('ERR_CONNECTION_REFUSED', FAILURE_CONNECTION),
+            ('ERR_EMPTY_RESPONSE', FAILURE_CONNECTION),
+            ('ERR_ABORTED', FAILURE_ABORT),
+            ('ERR_CERT_DATE_INVALID', FAILURE_OTHER),
+        ]:
+            exception = PageError(f'net::{error} at https://example.com/')
+            self.assertEqual(classify_failure(exception), failure, error)
+
+    def test_crash(self):
+        self.assertEqual(classify_failure(NetworkError('Protocol error: Target closed.')), FAILURE_CRASH)
+        self.assertEqual(classify_failure(PageError('net::ERR_ABORTED'), Lease(alive=False)), FAILURE_CRASH)
+        self.assertEqual(classify_failure(PageError('net::ERR_ABORTED'), Lease(alive=True)), FAILURE_ABORT)
+
+    def test_other(self):
+        self.assertEqual(classify_failure(PageError('Navigating frame was detached')), FAILURE_ABORT)
+        self.assertEqual(classify_failure(ValueError('boom')), FAILURE_OTHER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from scrapy.http import HtmlResponse, Response
+
+from gerapy_pyppeteer.hybrid import HybridDecider, url_pattern, wait_for_selector
+
+BODY = b'<html><body><div class="item">item</div>' + b' ' * 1024 + b'</body></html>'
+
+
+class HybridTest(unittest.TestCase):
+
+    def test_url_pattern(self):
+        self.assertEqual(url_pattern('https://example.com/news/2020/10/a.html'), 'example.com/news/*')
+        self.assertEqual(url_pattern('https://example.com/item/123'), 'example.com/item/*')
+        self.assertEqual(url_pattern('https://example.com/'), 'example.com/')
+
+    def test_wait_for_selector(self):
+        self.assertEqual(wait_for_selector('.item'), ('css', '.item'))
+        self.assertEqual(wait_for_selector('//div'), ('xpath', '//div'))
+        self.assertEqual(wait_for_selector({'selectorOrFunctionOrTimeout': 'h1'}), ('css', 'h1'))
+        self.assertIsNone(wait_for_selector('() => window.ready'))
+        self.assertIsNone(wait_for_selector(1000))
+
+    def test_escalation_reason(self):
+        decider = HybridDecider(spa_patterns=[r'<div id="app"></div>'])
+        url = 'https://example.com/'
+        self.assertEqual(decider.escalation_reason(Response(url, body=b'\x00'), {}), 'not_text')
+        self.assertEqual(decider.escalation_reason(HtmlResponse(url, status=500, body=BODY), {}), 'status')
+        self.assertEqual(decider.escalation_reason(HtmlResponse(url, body=b'<html></html>'), {}), 'body_size')
+        self.assertEqual(decider.escalation_reason(HtmlResponse(url, body=BODY + b'<div id="app"></div>'), {}),
+                         'spa_shell')
+        response = HtmlResponse(url, body=BODY)
+        self.assertIsNone(decider.escalation_reason(response, {}))
+        self.assertIsNone(decider.escalation_reason(response, {'wait_for': '.item'}))
+        self.assertEqual(decider.escalation_reason(response, {'wait_for': '.missing'}), 'wait_for')
+        self.assertEqual(decider.escalation_reason(response, {'wait_for': '() => true'}), 'wait_for')
+
+    def test_learning(self):
+        decider = HybridDecider(min_samples=3)
+        for _ in range(2):
+            decider.record('https://example.com/item/1', True)
+        self.assertFalse(decider.needs_browser('https://example.com/item/2'))
+        decider.record('https://example.com/item/3', True)
+        self.assertTrue(decider.needs_browser('https://example.com/item/4'))
+        # domain decision is used for unknown patterns
+        self.assertTrue(decider.needs_browser('https://example.com/news/1'))
+        # a plain fetch makes the domain mixed
+        decider.record('https://example.com/news/1', False)
+        self.assertFalse(decider.needs_browser('https://example.com/news/2'))
+        self.assertTrue(decider.needs_browser('https://example.com/item/5'))
+        self.assertFalse(decider.needs_browser('https://example.org/item/1'))
+
+    def test_mixed(self):
+        decider = HybridDecider(min_samples=3)
+        for escalated in (True, False, True):
+            decider.record('https://example.com/item/1', escalated)
+        self.assertFalse(decider.needs_browser('https://example.com/item/2'))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hybrid.json')
+            decider = HybridDecider(min_samples=1, path=path)
+            decider.record('https://example.com/item/1', True)
+            decider.save()
+            decider = HybridDecider(min_samples=1, path=path)
+            decider.load()
+            self.assertTrue(decider.needs_browser('https://example.com/item/2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
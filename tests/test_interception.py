@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+
+from gerapy_pyppeteer.blocker import Blocker
+from gerapy_pyppeteer.interception import FetchInterceptor
+from gerapy_pyppeteer.pool import PageLease
+
+
+class Emitter(object):
+
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def emit(self, event, data):
+        for handler in list(self.listeners.get(event, [])):
+            handler(data)
+
+
+class Client(Emitter):
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+
+
+class Page(Emitter):
+
+    def __init__(self):
+        super().__init__()
+        self._client = Client()
+
+    def isClosed(self):
+        return False
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+
+class FetchInterceptorTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_nothing_to_intercept(self):
+        self.assertFalse(FetchInterceptor())
+        self.assertTrue(FetchInterceptor(intercept_all=True))
+
+    def test_resource_types(self):
+        interceptor = FetchInterceptor(ignore_resource_types=['image', 'font'])
+        # only ignored resource types are paused
+        self.assertEqual(interceptor.patterns, [{'urlPattern': '*', 'resourceType': 'Font'},
+                                                {'urlPattern': '*', 'resourceType': 'Image'}])
+        self.assertEqual(interceptor.blocked_urls, [])
+
+    def test_hosts_only_blocker(self):
+        interceptor = FetchInterceptor(blocker=Blocker.from_rules(['ads.example.com']))
+        # hosts are blocked by browser itself without pausing requests
+        self.assertEqual(interceptor.blocked_urls, ['*://ads.example.com/*', '*://*.ads.example.com/*'])
+        self.assertEqual(interceptor.patterns, [])
+
+    def test_attach(self):
+        async def main():
+            stats = Stats()
+            interceptor = FetchInterceptor(ignore_resource_types=['image'],
+                                           blocker=Blocker.from_rules(['ads.example.com']), stats=stats)
+            page = Page()
+            client = page._client
+            lease = PageLease(page, None, ('{}', 0))
+            await interceptor.attach(lease)
+            self.assertEqual([method for method, _ in client.sent], ['Network.setBlockedURLs', 'Fetch.enable'])
+            client.emit('Network.loadingFailed', {'blockedReason': 'inspector'})
+            client.emit('Network.loadingFailed', {'blockedReason': 'other'})
+            self.assertEqual(stats.values, {'pyppeteer/blocked_count': 1})
+            # patterns are removed when the lease is released
+            self.assertTrue(await lease.finalize())
+            lease.detach()
+            self.assertEqual(client.sent[-2:], [('Fetch.disable', None), ('Network.setBlockedURLs', {'urls': []})])
+            self.assertEqual(client.listeners, {'Network.loadingFailed': [], 'Fetch.requestPaused': []})
+
+        self.run_async(main())
+
+    def test_handle(self):
+        async def main():
+            stats = Stats()
+            interceptor = FetchInterceptor(ignore_resource_types=['image'],
+                                           blocker=Blocker.from_rules(['/banner\\d+/']),
+                                           document_host='example.com', stats=stats)
+            page = Page()
+            await interceptor.attach(PageLease(page, None, ('{}', 0)))
+            client = page._client
+            client.sent = []
+            for request_id, url, resource_type in [('1', 'https://example.com/a.png', 'Image'),
+                                                   ('2', 'https://example.com/banner1.js', 'Script'),
+                                                   ('3', 'https://example.com/app.js', 'Script')]:
+                await interceptor._handle({'requestId': request_id, 'request': {'url': url},
+                                           'resourceType': resource_type})
+            self.assertEqual(stats.values, {'pyppeteer/blocked_count': 1})
+            return client.sent
+
+        self.assertEqual(self.run_async(main()), [
+            ('Fetch.failRequest', {'requestId': '1', 'errorReason': 'BlockedByClient'}),
+            ('Fetch.failRequest', {'requestId': '2', 'errorReason': 'BlockedByClient'}),
+            ('Fetch.continueRequest', {'requestId': '3'}),
+        ])
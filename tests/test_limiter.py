@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+
+from gerapy_pyppeteer.limiter import RenderLimiter
+
+
+class RenderLimiterTest(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_unlimited(self):
+        async def main():
+            limiter = RenderLimiter()
+            for _ in range(10):
+                await limiter.acquire('example.com')
+            return limiter.active
+
+        self.assertEqual(self.run_async(main()), 10)
+
+    def test_max_pages(self):
+        async def main():
+            limiter = RenderLimiter(max_pages=2)
+            await limiter.acquire('a.com')
+            await limiter.acquire('b.com')
+            waiter = asyncio.ensure_future(limiter.acquire('c.com'))
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            self.assertEqual(limiter.depth, 1)
+            limiter.release('a.com')
+            await asyncio.wait_for(waiter, 1)
+            self.assertEqual(limiter.depth, 0)
+            self.assertEqual(limiter.active, 2)
+
+        self.run_async(main())
+
+    def test_max_pages_per_domain(self):
+        async def main():
+            limiter = RenderLimiter(max_pages=3, max_pages_per_domain=1)
+            await limiter.acquire('a.com')
+            first = asyncio.ensure_future(limiter.acquire('a.com'))
+            second = asyncio.ensure_future(limiter.acquire('b.com'))
+            await asyncio.sleep(0)
+            # requests of other domains are not blocked by the queue head
+            self.assertFalse(first.done())
+            self.assertTrue(second.done())
+            limiter.release('a.com')
+            await asyncio.wait_for(first, 1)
+
+        self.run_async(main())
+
+    def test_fifo(self):
+        async def main():
+            limiter = RenderLimiter(max_pages=1)
+            await limiter.acquire('a.com')
+            order = []
+
+            async def acquire(name):
+                await limiter.acquire('a.com')
+                order.append(name)
+
+            waiters = [asyncio.ensure_future(acquire(name)) for name in ('first', 'second')]
+            await asyncio.sleep(0)
+            limiter.release('a.com')
+            await asyncio.sleep(0)
+            limiter.release('a.com')
+            await asyncio.wait_for(asyncio.gather(*waiters), 1)
+            self.assertEqual(order, ['first', 'second'])
+
+        self.run_async(main())
+
+    def test_cancel(self):
+        async def main():
+            limiter = RenderLimiter(max_pages=1)
+            await limiter.acquire('a.com')
+            waiter = asyncio.ensure_future(limiter.acquire('a.com'))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(limiter.depth, 0)
+            limiter.release('a.com')
+            self.assertEqual(limiter.active, 0)
+
+        self.run_async(main())
+
+    def test_resize(self):
+        async def main():
+            limiter = RenderLimiter(max_pages=1)
+            await limiter.acquire('a.com')
+            waiter = asyncio.ensure_future(limiter.acquire('b.com'))
+            await asyncio.sleep(0)
+            limiter.resize(2)
+            await asyncio.wait_for(waiter, 1)
+            self.assertEqual(limiter.active, 2)
+
+        self.run_async(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
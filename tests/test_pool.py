@@ -0,0 +1,687 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from gerapy_pyppeteer.pool import BrowserPool
+from gerapy_pyppeteer.settings import SHARDING_ROUND_ROBIN
+
+
+class FakePage(object):
+
+    def __init__(self, browser, context=None):
+        self.browser = browser
+        self.context = context
+        self.closed = False
+        self.calls = []
+        self.listeners = {}
+        self.cookie_jar = [{'name': 'session', 'value': '1'}]
+
+    def isClosed(self):
+        return self.closed
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    async def evaluate(self, script):
+        self.calls.append('evaluate')
+
+    async def cookies(self):
+        return list(self.cookie_jar)
+
+    async def deleteCookie(self, *cookies):
+        self.calls.append('deleteCookie')
+        self.cookie_jar = []
+
+    async def goto(self, url, options=None):
+        self.calls.append(('goto', url))
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext(object):
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def newPage(self):
+        page = FakePage(self.browser, self)
+        self.browser.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser(object):
+
+    def __init__(self, options=None):
+        self.options = options
+        self.closed = False
+        self.disconnected = False
+        self.pages = []
+        self.contexts = []
+        self.listeners = {}
+        self.fail_new_page = False
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def emit(self, event):
+        for handler in self.listeners.get(event, []):
+            handler()
+
+    async def newPage(self):
+        if self.fail_new_page:
+            raise RuntimeError('newPage failed')
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def createIncognitoBrowserContext(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def version(self):
+        return 'HeadlessChrome/1'
+
+    async def close(self):
+        self.closed = True
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+class FakeLauncher(object):
+    browsers = []
+    fail_new_page = False
+
+    def __init__(self, options):
+        self.options = options
+        self.proc = None
+
+    async def launch(self):
+        browser = FakeBrowser(self.options)
+        browser.fail_new_page = self.fail_new_page
+        self.browsers.append(browser)
+        return browser
+
+
+class FakeStats(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+    def set_value(self, key, value):
+        self.values[key] = value
+
+    def max_value(self, key, value):
+        self.values[key] = max(self.values.get(key, value), value)
+
+
+class BrowserPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        FakeLauncher.browsers = []
+        FakeLauncher.fail_new_page = False
+        patcher = mock.patch('pyppeteer.launcher.Launcher', FakeLauncher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_reuse_browser(self):
+        async def main():
+            pool = BrowserPool()
+            first = await pool.acquire({'headless': True})
+            await pool.release(first)
+            second = await pool.acquire({'headless': True})
+            await pool.release(second)
+            self.assertIs(first.browser, second.browser)
+            self.assertFalse(first.browser.closed)
+            # pages are closed without a page pool
+            self.assertTrue(first.page.closed)
+            await pool.close()
+            self.assertTrue(first.browser.closed)
+
+        self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 1)
+
+    def test_launch_options(self):
+        async def main():
+            pool = BrowserPool()
+            first = await pool.acquire({'headless': True})
+            second = await pool.acquire({'headless': False})
+            self.assertIsNot(first.browser, second.browser)
+            self.assertEqual(pool._inflight, {first.key: 1, second.key: 1})
+            await pool.release(first)
+            await pool.release(second)
+            self.assertEqual(pool._inflight, {first.key: 0, second.key: 0})
+            await pool.close()
+
+        self.run_async(main())
+
+    def test_disabled(self):
+        async def main():
+            pool = BrowserPool(enabled=False)
+            first = await pool.acquire({'headless': True})
+            await pool.release(first)
+            self.assertTrue(first.browser.closed)
+            second = await pool.acquire({'headless': True})
+            self.assertIsNot(first.browser, second.browser)
+            await pool.release(second)
+
+        self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 2)
+
+    def test_disabled_new_page_error(self):
+        FakeLauncher.fail_new_page = True
+        with self.assertRaises(RuntimeError):
+            self.run_async(BrowserPool(enabled=False).acquire({'headless': True}))
+        # browser belongs to the failed request only
+        self.assertEqual(len(FakeLauncher.browsers), 1)
+        self.assertTrue(FakeLauncher.browsers[0].closed)
+
+    def test_evict_browsers(self):
+        async def main():
+            pool = BrowserPool(max_browsers=2)
+            browsers = {}
+            for proxy in ('a', 'b', 'a', 'c'):
+                lease = await pool.acquire({'args': [f'--proxy-server={proxy}']})
+                browsers[proxy] = lease.browser
+                await pool.release(lease)
+            # least recently used browser is closed first
+            self.assertEqual([browsers[proxy].closed for proxy in 'abc'], [False, True, False])
+            self.assertEqual(list(pool._browsers.values()), [browsers['a'], browsers['c']])
+            await pool.close()
+
+        self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 3)
+
+    def test_evict_browsers_inflight(self):
+        async def main():
+            pool = BrowserPool(max_browsers=1)
+            first = await pool.acquire({'args': ['--proxy-server=a']})
+            second = await pool.acquire({'args': ['--proxy-server=b']})
+            # browser with an in-flight page is kept
+            self.assertEqual(len(pool._browsers), 2)
+            self.assertFalse(first.browser.closed)
+            await pool.release(first)
+            await pool.release(second)
+            third = await pool.acquire({'args': ['--proxy-server=c']})
+            self.assertEqual(list(pool._browsers.values()), [third.browser])
+            self.assertTrue(first.browser.closed)
+            self.assertTrue(second.browser.closed)
+            await pool.release(third)
+
+        self.run_async(main())
+
+    def test_recycle_page(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            first = await pool.acquire({})
+            await pool.release(first)
+            second = await pool.acquire({})
+            await pool.release(second)
+            self.assertIs(first.page, second.page)
+            self.assertFalse(first.page.closed)
+            self.assertEqual(first.page.calls, ['evaluate', ('goto', 'about:blank')] * 2)
+            # cookies of the default context are shared by other pages
+            self.assertEqual(len(first.page.cookie_jar), 1)
+
+        self.run_async(main())
+
+    def test_page_pool_size(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            first = await pool.acquire({})
+            second = await pool.acquire({})
+            await pool.release(first)
+            await pool.release(second)
+            self.assertFalse(first.page.closed)
+            self.assertTrue(second.page.closed)
+
+        self.run_async(main())
+
+    def test_page_max_uses(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1, page_max_uses=2)
+            pages = []
+            for _ in range(3):
+                lease = await pool.acquire({})
+                pages.append(lease.page)
+                await pool.release(lease)
+            self.assertIs(pages[0], pages[1])
+            self.assertIsNot(pages[1], pages[2])
+            self.assertTrue(pages[0].closed)
+
+        self.run_async(main())
+
+    def test_setup(self):
+        async def main():
+            pages = []
+
+            async def setup(page):
+                pages.append(page)
+
+            pool = BrowserPool(page_pool_size=1)
+            for _ in range(2):
+                lease = await pool.acquire({}, setup=setup)
+                await pool.release(lease)
+            return pages
+
+        # only newly created pages are set up
+        self.assertEqual(len(self.run_async(main())), 1)
+
+    def test_setup_error(self):
+        async def main():
+            async def setup(page):
+                raise RuntimeError('setup failed')
+
+            pool = BrowserPool(page_pool_size=1)
+            with self.assertRaises(RuntimeError):
+                await pool.acquire({}, setup=setup)
+            page = FakeLauncher.browsers[0].pages[0]
+            # page missing setup is never recycled
+            self.assertTrue(page.closed)
+            self.assertFalse(any(pool._idle_pages.values()))
+            self.assertEqual(pool._inflight, {(pool.signature({}), 0): 0})
+
+        self.run_async(main())
+
+    def test_finalize(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            lease = await pool.acquire({})
+            called = []
+
+            async def restore():
+                called.append(True)
+
+            lease.defer(restore)
+            handler = lease.on('response', lambda response: None)
+            await pool.release(lease)
+            self.assertEqual(called, [True])
+            self.assertNotIn(handler, lease.page.listeners['response'])
+            self.assertFalse(lease.page.closed)
+
+            lease = await pool.acquire({})
+
+            async def fail():
+                raise RuntimeError('finalizing failed')
+
+            lease.defer(fail)
+            await pool.release(lease)
+            # state of page is unknown
+            self.assertTrue(lease.page.closed)
+
+        self.run_async(main())
+
+    def test_reset_error(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            lease = await pool.acquire({})
+
+            async def goto(url, options=None):
+                raise RuntimeError('goto failed')
+
+            lease.page.goto = goto
+            await pool.release(lease)
+            self.assertTrue(lease.page.closed)
+            self.assertFalse(any(pool._idle_pages.values()))
+
+        self.run_async(main())
+
+    def test_contexts(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            first = await pool.acquire({}, context_key='a')
+            second = await pool.acquire({}, context_key='b')
+            third = await pool.acquire({})
+            self.assertIs(first.browser, second.browser)
+            self.assertIsNot(first.page.context, second.page.context)
+            self.assertIsNone(third.page.context)
+            for lease in (first, second, third):
+                await pool.release(lease)
+            lease = await pool.acquire({}, context_key='a')
+            self.assertIs(lease.page, first.page)
+            await pool.release(lease)
+
+        self.run_async(main())
+
+    def test_context_cookies(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=2)
+            first = await pool.acquire({}, context_key='a')
+            second = await pool.acquire({}, context_key='a')
+            await pool.release(first)
+            # cookies are kept while other pages use the context
+            self.assertNotIn('deleteCookie', first.page.calls)
+            await pool.release(second)
+            self.assertIn('deleteCookie', second.page.calls)
+
+        self.run_async(main())
+
+    def test_dispose_context(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            lease = await pool.acquire({}, context_key='a', dispose=True)
+            await pool.release(lease)
+            self.assertTrue(lease.page.closed)
+            self.assertTrue(lease.page.context.closed)
+            self.assertNotIn(lease.slot, pool._contexts)
+
+        self.run_async(main())
+
+    def test_evict_contexts(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1, max_contexts=2)
+            contexts = {}
+            for context_key in ('a', 'b', 'a', 'c'):
+                lease = await pool.acquire({}, context_key=context_key)
+                contexts[context_key] = lease.page.context
+                await pool.release(lease)
+            # least recently used context is closed first, with its idle pages
+            self.assertEqual([contexts[key].closed for key in 'abc'], [False, True, False])
+            self.assertEqual([slot[1] for slot in pool._contexts], ['a', 'c'])
+            self.assertNotIn((lease.key, 'b'), pool._idle_pages)
+
+            leased = await pool.acquire({}, context_key='a')
+            lease = await pool.acquire({}, context_key='d')
+            # context with a leased page is kept
+            self.assertFalse(contexts['a'].closed)
+            self.assertTrue(contexts['c'].closed)
+            for lease in (leased, lease):
+                await pool.release(lease)
+
+        self.run_async(main())
+
+    def test_least_loaded(self):
+        async def main():
+            pool = BrowserPool(browser_count=3)
+            leases = [await pool.acquire({}) for _ in range(3)]
+            self.assertEqual(sorted(lease.key[1] for lease in leases), [0, 1, 2])
+            await pool.release(leases[1])
+            lease = await pool.acquire({})
+            self.assertEqual(lease.key, leases[1].key)
+
+        self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 3)
+
+    def test_round_robin(self):
+        async def main():
+            pool = BrowserPool(browser_count=2, sharding=SHARDING_ROUND_ROBIN)
+            shards = []
+            for _ in range(4):
+                lease = await pool.acquire({})
+                shards.append(lease.key[1])
+                await pool.release(lease)
+            return shards
+
+        self.assertEqual(self.run_async(main()), [0, 1, 0, 1])
+
+    def test_affinity(self):
+        async def main():
+            pool = BrowserPool(browser_count=4)
+            shards = set()
+            for _ in range(4):
+                lease = await pool.acquire({}, affinity='example.com')
+                shards.add(lease.key[1])
+            return shards
+
+        # requests of the same affinity share a browser even if it is busy
+        self.assertEqual(len(self.run_async(main())), 1)
+
+    def test_shard_stats(self):
+        stats = FakeStats()
+
+        async def main():
+            pool = BrowserPool(browser_count=2, stats=stats)
+            first = await pool.acquire({})
+            second = await pool.acquire({})
+            await pool.release(first)
+            await pool.release(second)
+            return pool._shard_stats_prefix(first.key)
+
+        prefix = self.run_async(main())
+        self.assertRegex(prefix, r'^pyppeteer/shard/[0-9a-f]{8}-0$')
+        self.assertEqual(stats.values[f'{prefix}/launches'], 1)
+        self.assertEqual(stats.values[f'{prefix}/inflight'], 0)
+        self.assertEqual(stats.values[f'{prefix}/max_inflight'], 1)
+        # browsers of other launch options have their own stats
+        self.assertNotEqual(BrowserPool._shard_name((BrowserPool.signature({}), 0)),
+                            BrowserPool._shard_name((BrowserPool.signature({'headless': False}), 0)))
+
+    def test_endpoints(self):
+        connected = []
+
+        async def connect(options):
+            connected.append(options)
+            return FakeBrowser(options)
+
+        async def main():
+            pool = BrowserPool(page_pool_size=1, endpoints=['ws://a:9222/devtools/browser/x',
+                                                            'http://b:9222'])
+            leases = [await pool.acquire({'ignoreHTTPSErrors': True}) for _ in range(2)]
+            for lease in leases:
+                await pool.release(lease)
+            await pool.close()
+            return leases
+
+        with mock.patch('pyppeteer.connect', connect):
+            leases = self.run_async(main())
+        self.assertEqual(connected, [
+            {'ignoreHTTPSErrors': True, 'browserWSEndpoint': 'ws://a:9222/devtools/browser/x'},
+            {'ignoreHTTPSErrors': True, 'browserURL': 'http://b:9222'},
+        ])
+        self.assertEqual(FakeLauncher.browsers, [])
+        # remote browsers are disconnected, not closed, after closing their pages
+        for lease in leases:
+            self.assertTrue(lease.browser.disconnected)
+            self.assertFalse(lease.browser.closed)
+            self.assertTrue(lease.page.closed)
+
+    def test_endpoint_failover(self):
+        async def connect(options):
+            if options['browserURL'] == 'http://a:9222':
+                raise ConnectionRefusedError()
+            return FakeBrowser(options)
+
+        async def main():
+            pool = BrowserPool(endpoints=['http://a:9222', 'http://b:9222'], endpoint_backoff=30)
+            shards = []
+            for _ in range(3):
+                lease = await pool.acquire({})
+                shards.append(lease.key[1])
+            self.assertEqual(list(pool._unhealthy.keys()), [0])
+            self.assertEqual(pool._inflight, {(pool.signature({}), 0): 0, (pool.signature({}), 1): 3})
+            return shards
+
+        with mock.patch('pyppeteer.connect', connect):
+            # unhealthy endpoint is skipped
+            self.assertEqual(self.run_async(main()), [1, 1, 1])
+
+    def test_endpoints_unavailable(self):
+        async def connect(options):
+            raise ConnectionRefusedError()
+
+        with mock.patch('pyppeteer.connect', connect):
+            with self.assertRaises(ConnectionRefusedError):
+                self.run_async(BrowserPool(endpoints=['http://a:9222', 'http://b:9222']).acquire({}))
+
+    def test_discard_browser(self):
+        stats = FakeStats()
+
+        async def main():
+            pool = BrowserPool(page_pool_size=1, stats=stats)
+            lease = await pool.acquire({}, context_key='a')
+            await pool.release(lease)
+            crashed = lease.browser
+            crashed.emit('disconnected')
+            self.assertNotIn(lease.key, pool._browsers)
+            self.assertEqual(pool._contexts, {})
+            self.assertEqual(pool._idle_pages, {})
+            # browser is launched again in background
+            for _ in range(5):
+                await asyncio.sleep(0)
+            self.assertTrue(crashed.closed)
+            self.assertIsNot(pool._browsers[lease.key], crashed)
+            # disconnecting of a replaced browser is ignored
+            crashed.emit('disconnected')
+            self.assertIn(lease.key, pool._browsers)
+            return pool._shard_stats_prefix(lease.key)
+
+        prefix = self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 2)
+        self.assertEqual(stats.values[f'{prefix}/crashes'], 1)
+        self.assertEqual(stats.values[f'{prefix}/relaunches'], 1)
+
+    def test_page_crash(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            lease = await pool.acquire({})
+            for handler in lease.page.listeners['error']:
+                handler(RuntimeError('Page crashed!'))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            self.assertFalse(lease.alive)
+            self.assertTrue(lease.page.closed)
+            await pool.release(lease)
+            self.assertFalse(any(pool._idle_pages.values()))
+
+        self.run_async(main())
+
+    def test_health_check(self):
+        async def main():
+            pool = BrowserPool(health_check_interval=0.01, health_check_timeout=0.05)
+            lease = await pool.acquire({})
+            await pool.release(lease)
+            hung = asyncio.Event()
+
+            async def version():
+                await hung.wait()
+
+            lease.browser.version = version
+            for _ in range(20):
+                await asyncio.sleep(0.02)
+                if pool._browsers.get(lease.key) not in (None, lease.browser):
+                    break
+            await pool.close()
+
+        self.run_async(main())
+        # browser not responding is closed and launched again
+        self.assertEqual(len(FakeLauncher.browsers), 2)
+        self.assertTrue(FakeLauncher.browsers[0].closed)
+
+    def test_hung_reset(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1, health_check_timeout=0.05)
+            lease = await pool.acquire({})
+            hung = asyncio.Event()
+
+            async def evaluate(script):
+                await hung.wait()
+
+            lease.page.evaluate = evaluate
+            loop = asyncio.get_event_loop()
+            start = loop.time()
+            # no deadline, reset is still bounded by the health check timeout
+            await pool.release(lease)
+            self.assertLess(loop.time() - start, 1)
+            self.assertTrue(lease.page.closed)
+            self.assertEqual(pool._inflight, {lease.key: 0})
+
+        self.run_async(main())
+
+    def test_release_acquired(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            acquiring = asyncio.ensure_future(pool.acquire({}))
+            # nobody waits for the page anymore, it is given back once leased
+            pool.release_acquired(acquiring)
+            lease = await acquiring
+            for _ in range(50):
+                if pool._idle_pages.get(lease.slot):
+                    break
+                await asyncio.sleep(0.01)
+            self.assertTrue(lease.released)
+            self.assertEqual(pool._inflight, {lease.key: 0})
+            self.assertEqual(list(pool._idle_pages[lease.slot]), [lease.page])
+
+            cancelled = asyncio.ensure_future(pool.acquire({}))
+            cancelled.cancel()
+            pool.release_acquired(cancelled)
+            with self.assertRaises(asyncio.CancelledError):
+                await cancelled
+
+        self.run_async(main())
+
+    def test_release_after_deadline(self):
+        async def main():
+            pool = BrowserPool(page_pool_size=1)
+            lease = await pool.acquire({})
+            finalized = []
+
+            async def restore():
+                finalized.append(True)
+
+            lease.defer(restore)
+            # no budget is left to reset the page
+            await pool.release(lease, 0)
+            self.assertEqual(finalized, [])
+            self.assertTrue(lease.page.closed)
+            self.assertEqual(pool._inflight, {lease.key: 0})
+
+        self.run_async(main())
+
+    def test_warm_up(self):
+        async def main():
+            set_up = []
+
+            async def setup(page):
+                set_up.append(page)
+
+            pool = BrowserPool(page_pool_size=2, browser_count=2)
+            count = await pool.warm_up({}, page_count=3, setup=setup, url='http://localhost/')
+            self.assertEqual(count, 4)
+            self.assertEqual(len(set_up), 4)
+            # warmed up pages are leased without creating pages
+            lease = await pool.acquire({}, setup=setup)
+            self.assertIn(lease.page, set_up)
+            self.assertEqual(len(set_up), 4)
+            # cookies set by the warm-up url are not left to requests
+            self.assertEqual(lease.page.calls, [('goto', 'http://localhost/'), 'evaluate',
+                                                'deleteCookie', ('goto', 'about:blank')])
+            await pool.release(lease)
+
+        self.run_async(main())
+        self.assertEqual(len(FakeLauncher.browsers), 2)
+
+    def test_warm_up_url_only(self):
+        async def main():
+            pool = BrowserPool()
+            count = await pool.warm_up({}, page_count=2, url='http://localhost/')
+            self.assertEqual(count, 0)
+            page, = FakeLauncher.browsers[0].pages
+            # warm-up url is loaded even if no page is kept
+            self.assertEqual(page.calls[0], ('goto', 'http://localhost/'))
+            self.assertTrue(page.closed)
+
+        self.run_async(main())
+
+    def test_warm_up_disabled(self):
+        self.assertEqual(self.run_async(BrowserPool(enabled=False).warm_up({}, page_count=1)), 0)
+        self.assertEqual(FakeLauncher.browsers, [])
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# installing a reactor changes global state, so every case runs in its own interpreter
+SETUP = '''
+from scrapy.settings import Settings
+from gerapy_pyppeteer.reactor import ASYNCIO_REACTOR, install_asyncio_reactor, is_asyncio_reactor_installed
+'''
+
+
+class ReactorTest(unittest.TestCase):
+
+    def run_python(self, code):
+        result = subprocess.run([sys.executable, '-c', SETUP + code],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return result.returncode, result.stdout.decode().strip(), result.stderr.decode()
+
+    def test_lazy_import(self):
+        code, output, error = self.run_python(
+            'import sys\n'
+            'import gerapy_pyppeteer.downloadermiddlewares\n'
+            'print(sorted(name for name in ("pyppeteer", "twisted.internet.reactor") if name in sys.modules))\n')
+        self.assertEqual(code, 0, error)
+        # importing never installs a reactor or imports pyppeteer
+        self.assertEqual(output, '[]')
+
+    def test_install(self):
+        code, output, error = self.run_python(
+            'print(is_asyncio_reactor_installed())\n'
+            'install_asyncio_reactor(Settings())\n'
+            'print(is_asyncio_reactor_installed())\n'
+            '# installed already\n'
+            'install_asyncio_reactor(Settings({"TWISTED_REACTOR": ASYNCIO_REACTOR}))\n')
+        self.assertEqual(code, 0, error)
+        self.assertEqual(output.split(), ['False', 'True'])
+
+    def test_other_reactor_installed(self):
+        code, _, error = self.run_python(
+            'from twisted.internet import reactor\n'
+            'install_asyncio_reactor(Settings())\n')
+        # a reactor installed by others is never replaced
+        self.assertNotEqual(code, 0)
+        self.assertIn('requires the asyncio reactor', error)
+
+    def test_other_reactor_setting(self):
+        code, _, error = self.run_python(
+            'install_asyncio_reactor(Settings({"TWISTED_REACTOR": "twisted.internet.pollreactor.PollReactor"}))\n')
+        self.assertNotEqual(code, 0)
+        self.assertIn('requires the asyncio reactor', error)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from gerapy_pyppeteer.limiter import RenderLimiter
+from gerapy_pyppeteer.throttle import RenderThrottle, process_tree_rss
+
+
+class RenderThrottleTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('gerapy_pyppeteer.throttle.memory_available_ratio', return_value=0.5)
+        self.memory_available_ratio = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_start_pages(self):
+        limiter = RenderLimiter()
+        RenderThrottle(limiter, min_pages=2, max_pages=8, start_pages=16)
+        self.assertEqual(limiter.max_pages, 8)
+        RenderThrottle(limiter, min_pages=2, max_pages=8, start_pages=1)
+        self.assertEqual(limiter.max_pages, 2)
+
+    def test_increase(self):
+        async def main():
+            limiter = RenderLimiter()
+            throttle = RenderThrottle(limiter, max_pages=3, start_pages=2)
+            for _ in range(2):
+                await limiter.acquire('example.com')
+            throttle.adjust()
+            # nothing is waiting
+            self.assertEqual(limiter.max_pages, 2)
+            waiters = [asyncio.ensure_future(limiter.acquire('example.com')) for _ in range(2)]
+            await asyncio.sleep(0)
+            throttle.adjust()
+            await asyncio.sleep(0)
+            self.assertEqual(limiter.max_pages, 3)
+            throttle.adjust()
+            await asyncio.sleep(0)
+            # never more than max pages
+            self.assertEqual(limiter.max_pages, 3)
+            for waiter in waiters:
+                waiter.cancel()
+
+        self.run_async(main())
+
+    def test_decrease_by_memory(self):
+        limiter = RenderLimiter()
+        throttle = RenderThrottle(limiter, min_pages=2, start_pages=8, min_free_memory=0.1)
+        self.memory_available_ratio.return_value = 0.05
+        throttle.adjust()
+        self.assertEqual(limiter.max_pages, 6)
+        for _ in range(5):
+            throttle.adjust()
+        self.assertEqual(limiter.max_pages, 2)
+
+    def test_decrease_by_loop_lag(self):
+        limiter = RenderLimiter()
+        throttle = RenderThrottle(limiter, start_pages=8, max_loop_lag=0.5)
+        throttle.adjust(0.1)
+        self.assertEqual(limiter.max_pages, 8)
+        throttle.adjust(1)
+        self.assertEqual(limiter.max_pages, 6)
+
+    def test_decrease_by_latency(self):
+        limiter = RenderLimiter()
+        throttle = RenderThrottle(limiter, start_pages=8, target_latency=10)
+        for latency in range(1, 21):
+            throttle.record(latency)
+        throttle.adjust()
+        self.assertEqual(limiter.max_pages, 6)
+
+    @unittest.skipUnless(os.path.isdir('/proc'), 'requires /proc')
+    def test_decrease_by_browser_rss(self):
+        limiter = RenderLimiter()
+        throttle = RenderThrottle(limiter, pids=lambda: [os.getpid()], start_pages=8, max_browser_rss=1)
+        throttle.adjust()
+        # this process takes more than 1MB
+        self.assertEqual(limiter.max_pages, 6)
+
+    @unittest.skipUnless(os.path.isdir('/proc'), 'requires /proc')
+    def test_process_tree_rss(self):
+        self.assertIsNone(process_tree_rss([]))
+        self.assertGreater(process_tree_rss([os.getpid()]), 0)
@@ -0,0 +1,71 @@
+import unittest
+
+from gerapy_pyppeteer.timing import RenderTimer, TimingStats
+
+
+class FakeStats(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+    def set_value(self, key, value):
+        self.values[key] = value
+
+    def max_value(self, key, value):
+        self.values[key] = max(self.values.get(key, value), value)
+
+
+class RenderTimerTest(unittest.TestCase):
+
+    def test_phases(self):
+        timer = RenderTimer()
+        with timer.phase('goto'):
+            pass
+        with self.assertRaises(RuntimeError):
+            with timer.phase('evaluate'):
+                raise RuntimeError()
+        timer.add('goto', 1)
+        timer.add('queue', 2)
+        self.assertEqual(list(timer.phases.keys()), ['goto', 'evaluate', 'queue'])
+        # time of repeated phases is summed up
+        self.assertGreaterEqual(timer.phases['goto'], 1)
+        self.assertLess(timer.phases['goto'], 2)
+        self.assertEqual(timer.phases['queue'], 2)
+
+
+class TimingStatsTest(unittest.TestCase):
+
+    def test_record(self):
+        stats = FakeStats()
+        timing = TimingStats(stats, update_interval=10)
+        for seconds in range(1, 10):
+            timing.record({'goto': seconds})
+        self.assertEqual(stats.values['pyppeteer/timing/goto/count'], 9)
+        self.assertEqual(stats.values['pyppeteer/timing/goto/sum'], 45)
+        self.assertEqual(stats.values['pyppeteer/timing/goto/max'], 9)
+        # percentiles are updated every update interval
+        self.assertNotIn('pyppeteer/timing/goto/p50', stats.values)
+        timing.record({'goto': 10})
+        self.assertEqual(stats.values['pyppeteer/timing/goto/p50'], 6)
+        self.assertEqual(stats.values['pyppeteer/timing/goto/p95'], 10)
+        self.assertEqual(stats.values['pyppeteer/timing/goto/p99'], 10)
+
+    def test_sample_size(self):
+        stats = FakeStats()
+        timing = TimingStats(stats, sample_size=10, update_interval=1)
+        for seconds in range(100):
+            timing.record({'goto': seconds})
+        # percentiles cover recent samples only
+        self.assertEqual(stats.values['pyppeteer/timing/goto/p50'], 95)
+        self.assertEqual(stats.values['pyppeteer/timing/goto/count'], 100)
+
+    def test_flush(self):
+        stats = FakeStats()
+        timing = TimingStats(stats)
+        timing.record({'goto': 1, 'content': 2})
+        timing.flush()
+        self.assertEqual(stats.values['pyppeteer/timing/goto/p50'], 1)
+        self.assertEqual(stats.values['pyppeteer/timing/content/p99'], 2)
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import time
+import unittest
+
+from gerapy_pyppeteer.watchdog import descendants, kill_process_tree, processes, reap_exited
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'requires /proc')
+class WatchdogTest(unittest.TestCase):
+
+    def spawn(self, code):
+        process = subprocess.Popen([sys.executable, '-c', code])
+        # cleanups are called in reverse order
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        return process
+
+    def test_kill_process_tree(self):
+        # child is alive until killed
+        process = self.spawn('import subprocess, sys, time\n'
+                             'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])\n'
+                             'time.sleep(30)')
+        for _ in range(50):
+            children = descendants(process.pid)
+            if children:
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(children), 1)
+        self.assertEqual(kill_process_tree(process), 2)
+        self.assertIsNotNone(process.poll())
+        table = processes()
+        self.assertTrue(children[0] not in table or table[children[0]][1] == 'Z')
+
+    def test_reap_exited(self):
+        running = self.spawn('import time; time.sleep(30)')
+        exited = self.spawn('pass')
+        exited.wait()
+        launched = {running.pid: running, exited.pid: exited}
+        self.assertEqual(reap_exited(launched), [exited.pid])